@@ -1,19 +1,16 @@
 # app.py
+import time
 import streamlit as st
-import pandas as pd
-import numpy as np
-from neo4j import GraphDatabase
-from services.search_service import SearchService
-from utils.embeddings import get_embeddings, analyze_semantic_similarity
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from services.resources import get_search_service
+from utils.query_cache import get_query_cache
+from utils.metrics import metrics
+from utils.summarizer import stream_paper_summary, analyze_papers_batch
+from config.settings import settings
 
 
 class StreamlitApp:
     def __init__(self):
-        self.search_service = SearchService()
+        self.search_service = get_search_service()
 
     def setup_page(self):
         st.set_page_config(
@@ -40,21 +37,30 @@ class StreamlitApp:
                 ["Векторный поиск", "Гибридный поиск"]
             )
             top_k = st.slider("Количество результатов:", 1, 20, 10)
+            year_from = st.number_input("Статьи не ранее года (0 - без фильтра):",
+                                        min_value=0, max_value=2100, value=0, step=1)
             show_analysis = st.checkbox("Показать детальный анализ", value=True)
 
         if st.button("🔍 Найти статьи", type="primary"):
             if query:
-                with st.spinner("Ищем статьи и анализируем схожесть..."):
-                    if search_type == "Векторный поиск":
-                        results = self.search_service.vector_search(query, top_k)
-                    else:
-                        results = self.search_service.hybrid_search(query, top_k)
-
-                    self.display_results(results, query, show_analysis)
+                filters = {"year_from": int(year_from)} if year_from else None
+                with st.spinner("Ищем статьи..."):
+                    results, query_embedding = self.search_service.rank(
+                        query, top_k, filters, hybrid=search_type == "Гибридный поиск"
+                    )
+                if settings.SUMMARY_MODE == "batch":
+                    self.fill_batch_summaries(results, query, query_embedding)
+                # Результаты переживают перезапуски скрипта (кнопки загрузки описаний)
+                st.session_state.search = {"query": query, "query_embedding": query_embedding, "results": results}
+                st.session_state.summaries = {}
             else:
                 st.warning("Пожалуйста, введите запрос для поиска")
 
-    def display_results(self, results, query, show_analysis):
+        search = st.session_state.get("search")
+        if search is not None:
+            self.display_results(search["results"], search["query"], show_analysis, search["query_embedding"])
+
+    def display_results(self, results, query, show_analysis, query_embedding=None):
         if not results:
             st.info("По вашему запросу ничего не найдено")
             return
@@ -62,13 +68,52 @@ class StreamlitApp:
         st.subheader(f"📊 Результаты поиска для: '{query}'")
         st.write(f"Найдено статей: {len(results)}")
 
+        # Сначала весь список, затем описания - в порядке ранжирования
+        pending = []
         for i, result in enumerate(results, 1):
             with st.expander(
                     f"📄 {result.get('title', 'Без названия')} | Схожесть: {result.get('similarity_percentage', '0%')}",
-                    expanded=i == 1):
-                self.display_paper_details(result, show_analysis, i)
+                    expanded=i <= settings.SUMMARY_EAGER_RESULTS):
+                placeholder = self.display_paper_details(result, show_analysis, i)
+            if placeholder is not None:
+                pending.append((result, placeholder))
+
+        for result, placeholder in pending:
+            self.stream_summary(result, query, query_embedding, placeholder)
+
+    def fill_batch_summaries(self, results, query, query_embedding):
+        """Описания и ключевые пункты всех результатов пакетным запросом (SUMMARY_MODE=batch).
+
+        Вызывается один раз на поиск; статьи, которых нет в ответе, загружаются по одной
+        как обычно (сразу для первых SUMMARY_EAGER_RESULTS, остальные по кнопке).
+        """
+        papers = [result for result in results if 'summary' not in result]
+        if not papers:
+            return
+        with st.spinner("Готовим описания..."):
+            analyses = analyze_papers_batch(papers, query, query_embedding, timeout=settings.SUMMARY_BATCH_TIMEOUT,
+                                            deadline=time.monotonic() + settings.SUMMARY_BATCH_TIMEOUT)
+
+        # Результаты хранятся в session_state: после перезапуска скрипта карточки покажут готовый анализ
+        for result in papers:
+            analysis = analyses.get(result.get('paper_id'))
+            if analysis is not None:
+                result['summary'] = analysis["summary"]
+                result['key_points'] = analysis.get("key_points", [])
+
+    def stream_summary(self, result, query, query_embedding, placeholder):
+        """Вывести краткое описание по мере генерации и запомнить его до нового поиска"""
+        summary = ""
+        for part in stream_paper_summary(result, query, query_embedding, timeout=settings.SUMMARY_TIMEOUT):
+            summary += part
+            placeholder.info(summary + " ▌")
+        placeholder.info(summary)
+        st.session_state.summaries[result.get('paper_id')] = summary
 
     def display_paper_details(self, result, show_analysis, index):
+        """Карточка статьи; возвращает место для описания, если его нужно загрузить сейчас"""
+        paper_id = result.get('paper_id', f'unknown_{index}')
+
         # Основная информация
         col1, col2 = st.columns([3, 1])
 
@@ -93,14 +138,29 @@ class StreamlitApp:
             if 'link' in result and result['link']:
                 st.markdown(f"[📎 Полный текст]({result['link']})")
 
-            if st.button("🔍 Граф связей", key=f"graph_{result.get('paper_id', f'unknown_{index}')}"):
+            # Связи уже получены вместе с результатами - кнопка нужна только без них
+            if 'connections' not in result and st.button("🔍 Граф связей", key=f"graph_{paper_id}"):
                 self.show_graph_connections(result.get('paper_id'))
 
-        # Краткое описание
-        if 'summary' in result:
+        # Краткое описание: готовое, загружаемое сразу (раскрытые карточки) или по кнопке
+        st.markdown("---")
+        st.markdown("#### 📝 Краткое описание")
+        placeholder = st.empty()
+        summary = result.get('summary') or st.session_state.get("summaries", {}).get(result.get('paper_id'))
+        stream_into = None
+        if summary is not None:
+            placeholder.info(summary)
+            for point in result.get('key_points', []):
+                st.markdown(f"- {point}")
+        elif index <= settings.SUMMARY_EAGER_RESULTS or placeholder.button("📝 Загрузить описание",
+                                                                         key=f"summary_{paper_id}"):
+            stream_into = placeholder
+
+        # Связанные статьи из графа
+        if result.get('connections'):
             st.markdown("---")
-            st.markdown("#### 📝 Краткое описание")
-            st.info(result['summary'])
+            st.markdown("#### 🔗 Связанные статьи")
+            self.display_connections(result['connections'])
 
         # Детальный анализ (если включен)
         if show_analysis and result.get('similarity', 0) > 0.3:
@@ -129,6 +189,7 @@ class StreamlitApp:
                     st.info("📚 Косвенная связь - для общего ознакомления")
 
         st.markdown("---")
+        return stream_into
 
     def show_graph_connections(self, paper_id):
         if paper_id:
@@ -137,17 +198,42 @@ class StreamlitApp:
 
             if connections:
                 st.subheader("🔗 Связанные статьи")
+                self.display_connections(connections)
+            else:
+                st.info("Связи с другими статьями не найдены")
 
-                for connection in connections:
-                    col_conn1, col_conn2 = st.columns([3, 1])
+    def display_connections(self, connections):
+        for connection in connections:
+            col_conn1, col_conn2 = st.columns([3, 1])
 
-                    with col_conn1:
-                        st.write(f"**{connection.get('title', 'Без названия')}**")
+            with col_conn1:
+                st.write(f"**{connection.get('title', 'Без названия')}**")
 
-                    with col_conn2:
-                        st.write(f"*{connection.get('connection_type', 'Связь')}*")
-            else:
-                st.info("Связи с другими статьями не найдены")
+            with col_conn2:
+                connection_type = connection.get('connection_type', 'Связь')
+                if connection.get('score') is not None:
+                    connection_type += f" ({connection['score']:.2f})"
+                st.write(f"*{connection_type}*")
+
+    def display_metrics(self):
+        """Задержки этапов и деградации с момента запуска процесса"""
+        stages = metrics.summary()
+        if not stages:
+            return
+
+        st.header("⏱️ Задержки")
+        st.dataframe(
+            [
+                {"Этап": stage, "N": data["count"], "p50, с": data["p50"], "p95, с": data["p95"],
+                 "Ошибки": data["errors"]}
+                for stage, data in sorted(stages.items())
+            ],
+            hide_index=True
+        )
+
+        fallbacks = metrics.counters().get("fallbacks_total", {})
+        for labels, value in sorted(fallbacks.items()):
+            st.caption(f"Деградация {labels}: {value:g}")
 
     def run(self):
         self.setup_page()
@@ -170,6 +256,15 @@ class StreamlitApp:
                 stats = self.search_service.get_database_stats()
                 st.metric("Статей в базе", stats.get('paper_count', 0))
 
+                query_cache = get_query_cache()
+                if query_cache is not None:
+                    cache_stats = query_cache.stats()
+                    st.metric("Попадания в кэш запросов", f"{cache_stats['hit_rate'] * 100:.0f}%",
+                              help=f"{cache_stats['hits']} из {cache_stats['hits'] + cache_stats['misses']}, "
+                                   f"порог схожести {cache_stats['threshold']}")
+
+                self.display_metrics()
+
                 # Информация о модели
                 st.header("🤖 Модель")
                 st.markdown("""
@@ -0,0 +1,75 @@
+# benchmarks/ann_recall.py
+import argparse
+import time
+import numpy as np
+from models.ann_index import IVFIndex
+from models.similarity import normalize_rows, blocked_top_k
+
+
+def synthetic_embeddings(n: int, dim: int, n_topics: int = 200, seed: int = 0) -> np.ndarray:
+    """Синтетические эмбеддинги с кластерной структурой (похожей на реальные темы статей)"""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32)
+    return normalize_rows(topics[labels] + 0.8 * noise)
+
+
+def recall_at_k(approx: list, exact: np.ndarray, paper_ids: list) -> float:
+    """Доля точных top-k, найденных приближённым поиском"""
+    hits = 0
+    for found, truth in zip(approx, exact):
+        truth_ids = {paper_ids[i] for i in truth}
+        hits += len(truth_ids & {paper_id for paper_id, _ in found})
+    return hits / exact.size
+
+
+def run(matrix: np.ndarray, paper_ids: list, n_queries: int, top_k: int, nlist: int, nprobes: list, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    queries = normalize_rows(
+        matrix[rng.choice(matrix.shape[0], n_queries, replace=False)]
+        + 0.3 * rng.standard_normal((n_queries, matrix.shape[1])).astype(np.float32) / np.sqrt(matrix.shape[1])
+    )
+
+    started = time.perf_counter()
+    exact_indices, _ = blocked_top_k(queries, matrix, top_k)
+    exact_ms = (time.perf_counter() - started) * 1000 / n_queries
+
+    started = time.perf_counter()
+    index = IVFIndex.build(paper_ids, matrix, nlist=nlist)
+    print(f"N={matrix.shape[0]} dim={matrix.shape[1]} nlist={index.centroids.shape[0]} "
+          f"build={time.perf_counter() - started:.1f}s exact={exact_ms:.2f} ms/query (batched)")
+
+    print(f"{'nprobe':>8} {'recall@' + str(top_k):>10} {'ms/query':>10}")
+    for nprobe in nprobes:
+        started = time.perf_counter()
+        approx = [index.search(query, top_k, nprobe=nprobe) for query in queries]
+        latency_ms = (time.perf_counter() - started) * 1000 / n_queries
+        print(f"{nprobe:>8} {recall_at_k(approx, exact_indices, paper_ids):>10.3f} {latency_ms:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k и задержка IVF-индекса относительно точного поиска")
+    parser.add_argument("--synthetic", type=int, default=0, help="Число синтетических статей (0 - хранилище эмбеддингов)")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        matrix = synthetic_embeddings(args.synthetic, args.dim)
+        paper_ids = [f"synthetic-{i}" for i in range(args.synthetic)]
+    else:
+        from config.settings import settings
+        from models.embedding_store import EmbeddingStore
+
+        store = EmbeddingStore.open(settings.EMBEDDING_STORE_PATH)
+        matrix, paper_ids = np.asarray(store.matrix), store.paper_ids
+
+    run(matrix, paper_ids, min(args.queries, matrix.shape[0]), args.top_k, args.nlist, args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
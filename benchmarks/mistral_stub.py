@@ -0,0 +1,163 @@
+# benchmarks/mistral_stub.py
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+STUB_SUMMARY = "Статья посвящена теме запроса и описывает основные методы и результаты."
+
+
+def word_vector(word: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def text_embedding(text: str, dim: int = 1024) -> list:
+    """Детерминированный эмбеддинг: нормированная сумма псевдослучайных векторов слов.
+
+    Тексты с общими словами получаются близкими, поэтому поиск по синтетическому
+    корпусу возвращает осмысленные результаты.
+    """
+    words = re.findall(r"\w+", text.lower())
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in words:
+        vector += word_vector(word, dim)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class StubConfig:
+    """Параметры имитации: задержка ответа (мс), её разброс, доля ошибок 503 и 429"""
+
+    def __init__(self, dim: int = 1024, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, token_delay_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.token_delay_ms = token_delay_ms
+
+
+class MistralStubHandler(BaseHTTPRequestHandler):
+    """Имитация /v1/embeddings и /v1/chat/completions (включая stream и json_object)"""
+
+    config = StubConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": "invalid JSON"})
+
+        config = self.config
+        delay = max(0.0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms))
+        time.sleep(delay / 1000)
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            return self._send_json(429, {"error": "rate limited"}, {"Retry-After": "0.1"})
+        if roll < config.rate_limit_rate + config.error_rate:
+            return self._send_json(503, {"error": "injected failure"})
+
+        if self.path.rstrip("/").endswith("/embeddings"):
+            inputs = payload.get("input") or []
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            data = [
+                {"object": "embedding", "index": i, "embedding": text_embedding(text, config.dim)}
+                for i, text in enumerate(inputs)
+            ]
+            return self._send_json(200, {"object": "list", "data": data, "model": payload.get("model")})
+
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            content = self._completion_content(payload)
+            if payload.get("stream"):
+                return self._send_stream(content)
+            return self._send_json(200, {
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}]
+            })
+
+        self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def _completion_content(self, payload: dict) -> str:
+        if (payload.get("response_format") or {}).get("type") != "json_object":
+            return STUB_SUMMARY
+        # Пакетный анализ: по элементу на каждую пронумерованную статью в запросе
+        prompt = payload["messages"][-1]["content"]
+        numbers = sorted({int(number) for number in re.findall(r"^\s*\[(\d+)\]", prompt, re.MULTILINE)})
+        return json.dumps({"papers": [
+            {"id": number, "summary": STUB_SUMMARY, "key_points": ["Общая тема", "Близкие методы"]}
+            for number in numbers
+        ]}, ensure_ascii=False)
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in content.split(" "):
+            event = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.config.token_delay_ms / 1000)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def start_stub(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Запустить заглушку в фоновом потоке (базовый URL API: http://host:server_port/v1)"""
+    handler = type("ConfiguredMistralStubHandler", (MistralStubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mistral-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная заглушка Mistral API для бенчмарков (MISTRAL_API_BASE=http://host:port/v1)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="Пауза между порциями потокового ответа")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 429")
+    args = parser.parse_args()
+
+    config = StubConfig(args.dim, args.latency_ms, args.jitter_ms, args.error_rate,
+                        args.rate_limit_rate, args.token_delay_ms)
+    server = start_stub(config, args.host, args.port)
+    print(f"Mistral stub listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
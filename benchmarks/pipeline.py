@@ -0,0 +1,187 @@
+# benchmarks/pipeline.py
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks.mistral_stub import StubConfig, start_stub
+from benchmarks import synthetic_corpus
+from config.settings import settings
+
+STAGES = ("embed", "retrieve", "connections", "enhance", "end_to_end")
+
+
+def configure(base_url: str, use_caches: bool, workdir: str):
+    """Направить клиентов Mistral на заглушку и изолировать файлы индексов и кэшей бенчмарка"""
+    settings.MISTRAL_API_BASE = base_url
+    settings.MISTRAL_API_KEY = "benchmark"
+    settings.MISTRAL_RATE_LIMIT = 0
+    settings.INDEX_SYNC_INTERVAL = 0
+
+    settings.EMBEDDING_STORE_PATH = os.path.join(workdir, "embeddings")
+    settings.ANN_INDEX_PATH = os.path.join(workdir, "ann_index")
+    settings.QUANTIZED_INDEX_PATH = os.path.join(workdir, "quantized_index")
+    settings.INDEX_SNAPSHOT_PATH = os.path.join(workdir, "index_snapshot.bin")
+    settings.BM25_INDEX_PATH = ""
+    if use_caches:
+        settings.EMBEDDING_CACHE_PATH = os.path.join(workdir, "embedding_cache.sqlite")
+        settings.SUMMARY_CACHE_PATH = os.path.join(workdir, "summary_cache.sqlite")
+    else:
+        settings.EMBEDDING_CACHE_SIZE = 0
+        settings.EMBEDDING_CACHE_PATH = ""
+        settings.SUMMARY_CACHE_PATH = ""
+        settings.QUERY_CACHE_SIZE = 0
+
+
+def prepare_backend(service, backend: str, store):
+    """Построить индекс бэкенда во временном каталоге и загрузить его в сервис"""
+    from models.ann_index import IVFIndex
+    from models.quantization import QuantizedIndex
+
+    settings.USE_VECTOR_INDEX = backend != "cypher"
+    settings.SEARCH_BACKEND = backend
+    if backend == "ann":
+        IVFIndex.from_store(store, nlist=settings.ANN_NLIST, nprobe=settings.ANN_NPROBE).save(settings.ANN_INDEX_PATH)
+    elif backend in ("float16", "int8", "pq"):
+        params = {"n_subspaces": settings.PQ_SUBSPACES} if backend == "pq" else {}
+        QuantizedIndex.build(store, backend, rerank_depth=settings.RERANK_DEPTH, **params).save(
+            settings.QUANTIZED_INDEX_PATH
+        )
+
+    if not settings.USE_VECTOR_INDEX:
+        return
+    if service.reload_vector_index() is None:
+        raise RuntimeError(f"Vector index for backend {backend} is empty")
+
+
+def run_query(service, query: str, top_k: int, summarize: bool) -> dict:
+    """Один запрос по этапам конвейера; длительности в секундах"""
+    from utils.embeddings import get_embeddings
+
+    timings = {}
+    started = time.perf_counter()
+
+    stage_started = time.perf_counter()
+    query_embedding = get_embeddings(query)
+    timings["embed"] = time.perf_counter() - stage_started
+
+    stage_started = time.perf_counter()
+    results = service.neo4j_client.find_similar_papers(query_embedding, top_k, index=service.get_vector_index())
+    timings["retrieve"] = time.perf_counter() - stage_started
+
+    stage_started = time.perf_counter()
+    service.attach_connections(results)
+    timings["connections"] = time.perf_counter() - stage_started
+
+    if summarize:
+        stage_started = time.perf_counter()
+        service.enhance_results(results, query, query_embedding)
+        timings["enhance"] = time.perf_counter() - stage_started
+
+    timings["end_to_end"] = time.perf_counter() - started
+    return timings
+
+
+def run_scenario(service, queries: list, top_k: int, concurrency: int, summarize: bool):
+    """Прогнать запросы с заданной конкурентностью: ({stage: [секунды]}, общее время, ошибки)"""
+    samples = {stage: [] for stage in STAGES}
+    errors = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for future in [executor.submit(run_query, service, query, top_k, summarize) for query in queries]:
+            try:
+                for stage, seconds in future.result().items():
+                    samples[stage].append(seconds)
+            except Exception as e:
+                print(f"Error in benchmark query: {e}")
+                errors += 1
+    return samples, time.perf_counter() - started, errors
+
+
+def print_report(backend: str, samples: dict, wall: float, errors: int):
+    completed = len(samples["end_to_end"])
+    print(f"\n== {backend}: {completed} queries in {wall:.2f}s, "
+          f"{completed / wall if wall else 0.0:.1f} queries/s, {errors} errors")
+    print(f"{'stage':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for stage in STAGES:
+        values = np.array(samples[stage]) * 1000
+        if not len(values):
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{stage:<14} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {values.mean():>9.1f}")
+
+
+def print_stage_metrics():
+    """Внутренние этапы из utils.metrics (границы корзин гистограмм)"""
+    from utils.metrics import metrics
+
+    print(f"{'internal stage':<40} {'count':>6} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'errors':>6}")
+    for name, stage in sorted(metrics.summary().items()):
+        print(f"{name:<40} {stage['count']:>6} {stage['p50']:>7g} {stage['p95']:>7g} "
+              f"{stage['p99']:>7g} {stage['errors']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка и пропускная способность этапов поиска без сети")
+    parser.add_argument("--backends", nargs="+", default=["exact", "ann", "int8"],
+                        choices=["cypher", "exact", "ann", "float16", "int8", "pq"])
+    parser.add_argument("--papers", type=int, default=10000, help="Размер синтетического корпуса")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=settings.SEARCH_SHARDS,
+                        help="Процессы-шарды точного поиска (SEARCH_SHARDS)")
+    parser.add_argument("--no-summaries", action="store_true", help="Не измерять этап enhance")
+    parser.add_argument("--caches", action="store_true", help="Включить кэши эмбеддингов, описаний и запросов")
+    parser.add_argument("--load", action="store_true", help="Загрузить синтетический корпус в Neo4j перед прогоном")
+    parser.add_argument("--clear", action="store_true", help="Удалить синтетический корпус из Neo4j после прогона")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Задержка ответа заглушки Mistral")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = start_stub(StubConfig(args.dim, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate))
+    workdir = tempfile.mkdtemp(prefix="rag-benchmark-")
+    configure(f"http://127.0.0.1:{stub.server_port}/v1", args.caches, workdir)
+    settings.SEARCH_SHARDS = args.shards
+
+    from services.search_service import SearchService
+    from utils.metrics import metrics
+
+    papers, edges, topics = synthetic_corpus.generate_corpus(args.papers, seed=args.seed)
+    queries = synthetic_corpus.generate_queries(topics, args.queries, seed=args.seed + 1)
+    service = SearchService()
+    try:
+        if args.load:
+            started = time.perf_counter()
+            synthetic_corpus.clear_neo4j(service.neo4j_client)
+            synthetic_corpus.load_into_neo4j(service.neo4j_client, synthetic_corpus.embed_papers(papers, args.dim), edges)
+            print(f"Loaded {len(papers)} papers and {len(edges)} citations in {time.perf_counter() - started:.1f}s")
+
+        store = service.load_embedding_store(rebuild=True)
+        if store is None:
+            raise RuntimeError("Embedding store could not be built from Neo4j")
+        print(f"Embedding store: {len(store.paper_ids)} papers, workdir {workdir}")
+
+        for backend in args.backends:
+            prepare_backend(service, backend, store)
+            service.graph_expander.invalidate()
+            metrics.reset()
+            samples, wall, errors = run_scenario(
+                service, queries, args.top_k, args.concurrency, not args.no_summaries
+            )
+            print_report(backend, samples, wall, errors)
+            print_stage_metrics()
+    finally:
+        if args.clear:
+            print(f"Deleted {synthetic_corpus.clear_neo4j(service.neo4j_client)} synthetic papers")
+        service.close()
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# benchmarks/synthetic_corpus.py
+import argparse
+import json
+import random
+from benchmarks.mistral_stub import text_embedding
+
+ID_PREFIX = "synthetic-"
+VENUES = ("NeurIPS", "ICML", "ICLR", "ACL", "EMNLP", "CVPR", "KDD", "SIGIR", "VLDB", "AAAI")
+SYLLABLES = ("ka", "ro", "mi", "te", "lu", "sa", "ne", "vo", "pi", "da", "zu", "fe", "gra", "tor", "len", "bis")
+GENERIC_WORDS = ("learning", "model", "neural", "efficient", "scalable", "towards", "analysis", "approach")
+
+
+def topic_vocabulary(n_topics: int, words_per_topic: int = 12, seed: int = 0) -> list:
+    """Словари тем: у каждой темы свои слова, поэтому эмбеддинги статей одной темы близки"""
+    rng = random.Random(seed)
+    topics, seen = [], set()
+    for _ in range(n_topics):
+        words = []
+        while len(words) < words_per_topic:
+            word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        topics.append(words)
+    return topics
+
+
+def make_title(rng: random.Random, words: list) -> str:
+    title = rng.sample(words, rng.randint(3, 5)) + rng.sample(GENERIC_WORDS, rng.randint(1, 2))
+    rng.shuffle(title)
+    return " ".join(title).capitalize()
+
+
+def generate_corpus(n_papers: int, n_topics: int = 100, citations: float = 5.0, seed: int = 0):
+    """Синтетические статьи и рёбра CITES (статья цитирует более ранние статьи своей темы).
+
+    Возвращает (papers, edges, topics); эмбеддинги добавляет embed_papers.
+    """
+    rng = random.Random(seed)
+    topics = topic_vocabulary(n_topics, seed=seed)
+    papers, edges = [], []
+    by_topic = [[] for _ in topics]
+
+    for i in range(n_papers):
+        topic = rng.randrange(n_topics)
+        paper_id = f"{ID_PREFIX}{i}"
+        title = make_title(rng, topics[topic])
+        year = rng.randint(1995, 2024)
+        venue = rng.choice(VENUES)
+        papers.append({
+            "paper_id": paper_id,
+            "title": title,
+            "bibtex": f"@article{{{paper_id},\n  title={{{title}}},\n  journal={{{venue}}},\n  year={{{year}}}\n}}",
+            "year": year,
+            "venue": venue,
+            "link": f"https://example.org/papers/{paper_id}"
+        })
+
+        earlier = by_topic[topic]
+        for cited in rng.sample(earlier, min(len(earlier), rng.randint(0, int(2 * citations)))):
+            edges.append((paper_id, cited))
+        earlier.append(paper_id)
+
+    return papers, edges, topics
+
+
+def generate_queries(topics: list, n_queries: int, seed: int = 1) -> list:
+    """Запросы из 2-4 слов одной темы"""
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(words, rng.randint(2, 4))) for words in (rng.choice(topics) for _ in range(n_queries))]
+
+
+def embed_papers(papers: list, dim: int = 1024) -> list:
+    """Эмбеддинги той же функцией, что отдаёт заглушка Mistral, - запросы к ней совпадают с корпусом"""
+    from services.ingestion_service import paper_text
+
+    for paper in papers:
+        paper["embedding"] = text_embedding(paper_text(paper), dim)
+    return papers
+
+
+def write_jsonl(papers: list, path: str):
+    """Корпус в формате ввода python -m services.ingestion_service (без эмбеддингов)"""
+    with open(path, "w", encoding="utf-8") as f:
+        for paper in papers:
+            f.write(json.dumps({k: v for k, v in paper.items() if k != "embedding"}, ensure_ascii=False) + "\n")
+
+
+def load_into_neo4j(neo4j_client, papers: list, edges: list, batch_size: int = 1000) -> int:
+    """Фикстура: записать корпус с эмбеддингами, venue и рёбрами CITES"""
+    neo4j_client.ensure_schema()
+    for start in range(0, len(papers), batch_size):
+        batch = papers[start:start + batch_size]
+        neo4j_client.upsert_papers(batch)
+        with neo4j_client.driver.session() as session:
+            session.run("""
+                UNWIND $papers AS paper
+                MATCH (p:Paper {paper_id: paper.paper_id})
+                SET p.venue = paper.venue
+            """, {"papers": [{"paper_id": p["paper_id"], "venue": p["venue"]} for p in batch]}).consume()
+
+    for start in range(0, len(edges), batch_size * 5):
+        batch = [{"source": source, "target": target} for source, target in edges[start:start + batch_size * 5]]
+        with neo4j_client.driver.session() as session:
+            session.run("""
+                UNWIND $edges AS edge
+                MATCH (a:Paper {paper_id: edge.source}), (b:Paper {paper_id: edge.target})
+                MERGE (a)-[:CITES]->(b)
+            """, {"edges": batch}).consume()
+    return len(papers)
+
+
+def clear_neo4j(neo4j_client, batch_size: int = 10000) -> int:
+    """Удалить синтетические статьи (paper_id с префиксом synthetic-)"""
+    deleted = 0
+    while True:
+        with neo4j_client.driver.session() as session:
+            count = session.run("""
+                MATCH (p:Paper) WHERE p.paper_id STARTS WITH $prefix
+                WITH p LIMIT $limit
+                DETACH DELETE p
+                RETURN count(*) AS deleted
+            """, {"prefix": ID_PREFIX, "limit": batch_size}).single()["deleted"]
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетический корпус :Paper для бенчмарков")
+    parser.add_argument("--papers", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--topics", type=int, default=100)
+    parser.add_argument("--citations", type=float, default=5.0, help="Среднее число цитирований на статью")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Записать корпус в JSONL")
+    parser.add_argument("--load", action="store_true", help="Загрузить корпус в Neo4j")
+    parser.add_argument("--clear", action="store_true", help="Удалить синтетический корпус из Neo4j")
+    args = parser.parse_args()
+
+    papers, edges, _ = generate_corpus(args.papers, args.topics, args.citations, args.seed)
+    print(f"Generated {len(papers)} papers, {len(edges)} citations")
+    if args.out:
+        write_jsonl(papers, args.out)
+        print(f"Corpus written to {args.out}")
+
+    if args.load or args.clear:
+        from database.neo4j_client import Neo4jClient
+
+        client = Neo4jClient()
+        try:
+            if args.clear:
+                print(f"Deleted {clear_neo4j(client)} synthetic papers")
+            if args.load:
+                print(f"Loaded {load_into_neo4j(client, embed_papers(papers, args.dim), edges)} papers into Neo4j")
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,12 +9,135 @@ class Settings:
     NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
     NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+    NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "50"))
+    NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+    NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT", "60"))
+    NEO4J_RECONNECT_INTERVAL = float(os.getenv("NEO4J_RECONNECT_INTERVAL", "30"))
 
     # Mistral AI
     MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+    MISTRAL_API_BASE = os.getenv("MISTRAL_API_BASE", "https://api.mistral.ai/v1")
+    MISTRAL_POOL_SIZE = int(os.getenv("MISTRAL_POOL_SIZE", "16"))
+    MISTRAL_CONNECT_TIMEOUT = float(os.getenv("MISTRAL_CONNECT_TIMEOUT", "5"))
+    MISTRAL_READ_TIMEOUT = float(os.getenv("MISTRAL_READ_TIMEOUT", "60"))
+    MISTRAL_MAX_RETRIES = int(os.getenv("MISTRAL_MAX_RETRIES", "3"))
+    MISTRAL_BACKOFF_BASE = float(os.getenv("MISTRAL_BACKOFF_BASE", "0.5"))
+    MISTRAL_BACKOFF_MAX = float(os.getenv("MISTRAL_BACKOFF_MAX", "20"))
+    # Запросов в секунду (0 - без ограничения) и допустимый всплеск
+    MISTRAL_RATE_LIMIT = float(os.getenv("MISTRAL_RATE_LIMIT", "5"))
+    MISTRAL_RATE_BURST = int(os.getenv("MISTRAL_RATE_BURST", "10"))
 
     # App
     SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
+    SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+    SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "20"))
+    # batch - одно обращение к LLM на все результаты, per_paper - по запросу на статью.
+    # В интерфейсе batch запрашивает анализ всех показанных результатов сразу после поиска;
+    # SUMMARY_EAGER_RESULTS и кнопки загрузки касаются только статей, которых нет в пакетном ответе
+    SUMMARY_MODE = os.getenv("SUMMARY_MODE", "batch")
+    # Ожидание пакетного ответа - порядка SUMMARY_TIMEOUT: после неудачи статьи ещё запрашиваются по одной
+    SUMMARY_BATCH_TIMEOUT = float(os.getenv("SUMMARY_BATCH_TIMEOUT", os.getenv("SUMMARY_TIMEOUT", "20")))
+    SUMMARY_BATCH_MAX_TOKENS = int(os.getenv("SUMMARY_BATCH_MAX_TOKENS", "4000"))
+    # Статей в одном пакетном запросе (пакеты запрашиваются параллельно) и бюджет токенов ответа на статью
+    SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "5"))
+    SUMMARY_BATCH_TOKENS_PER_PAPER = int(os.getenv("SUMMARY_BATCH_TOKENS_PER_PAPER", "600"))
+    # Число первых результатов, описания которых в интерфейсе загружаются сразу (остальные - по кнопке);
+    # при SUMMARY_MODE=batch - только для статей, не попавших в пакетный ответ
+    SUMMARY_EAGER_RESULTS = int(os.getenv("SUMMARY_EAGER_RESULTS", "1"))
+
+    # Summary cache
+    SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "data/summary_cache.sqlite")
+    SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+    SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "50000"))
+    SUMMARY_CACHE_MEMORY_SIZE = int(os.getenv("SUMMARY_CACHE_MEMORY_SIZE", "2048"))
+    SUMMARY_CACHE_LSH_BITS = int(os.getenv("SUMMARY_CACHE_LSH_BITS", "16"))
+    # Минимальный косинус эмбеддингов, при котором описание для другого запроса переиспользуется
+    SUMMARY_CACHE_QUERY_THRESHOLD = float(os.getenv("SUMMARY_CACHE_QUERY_THRESHOLD", "0.95"))
+    SUMMARY_PREFER_BASE_SUMMARY = os.getenv("SUMMARY_PREFER_BASE_SUMMARY", "true").lower() == "true"
+
+    # Query result cache
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    # Минимальная косинусная схожесть эмбеддингов, при которой запросы считаются одинаковыми
+    QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", "0.95"))
+    QUERY_CACHE_REUSE_SUMMARIES = os.getenv("QUERY_CACHE_REUSE_SUMMARIES", "true").lower() == "true"
+
+    # API server
+    API_HOST = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT = int(os.getenv("API_PORT", "8080"))
+    # Одновременно обрабатываемые запросы; остальные ждут не дольше API_QUEUE_TIMEOUT и получают 503
+    API_MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", "64"))
+    API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "5"))
+    # Одновременные обращения к LLM в рамках одного запроса
+    API_REQUEST_CONCURRENCY = int(os.getenv("API_REQUEST_CONCURRENCY", "4"))
+    API_MAX_TOP_K = int(os.getenv("API_MAX_TOP_K", "100"))
+
+    # Vector index
+    USE_VECTOR_INDEX = os.getenv("USE_VECTOR_INDEX", "true").lower() == "true"
+    EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "data/embeddings")
+    # exact - точный поиск по всей матрице, ann - IVF-индекс (python -m models.ann_index),
+    # float16 / int8 / pq - сжатые коды с переранжированием (python -m models.quantization)
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "exact")
+    ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", "data/ann_index")
+    ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+    ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+    QUANTIZED_INDEX_PATH = os.getenv("QUANTIZED_INDEX_PATH", "data/quantized_index")
+    PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", "64"))
+    RERANK_DEPTH = int(os.getenv("RERANK_DEPTH", "100"))
+    # Период фоновой синхронизации индекса с Neo4j в секундах (0 - выключена)
+    INDEX_SYNC_INTERVAL = float(os.getenv("INDEX_SYNC_INTERVAL", "60"))
+    # Запас перечитывания изменений до метки синхронизации, в секундах: updated_at - время начала
+    # транзакции, и долгая запись может зафиксироваться уже после того, как метка ушла дальше
+    INDEX_SYNC_OVERLAP = float(os.getenv("INDEX_SYNC_OVERLAP", "300"))
+    # Размер дельты (изменённые + удалённые статьи), после которого она сливается с базой
+    INDEX_COMPACT_THRESHOLD = int(os.getenv("INDEX_COMPACT_THRESHOLD", "10000"))
+    # Свойства :Paper (кроме year), по которым строятся битовые карты фильтров
+    FILTER_PROPERTIES = [prop for prop in os.getenv("FILTER_PROPERTIES", "venue").split(",") if prop]
+    # Снимок точного индекса (матрица, paper_id, фильтры) для быстрого запуска; пусто - выключен
+    INDEX_SNAPSHOT_PATH = os.getenv("INDEX_SNAPSHOT_PATH", "data/index_snapshot.bin")
+    # Число процессов-шардов точного поиска по общей памяти (0 или 1 - поиск в основном процессе)
+    SEARCH_SHARDS = int(os.getenv("SEARCH_SHARDS", "0"))
+    SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "30"))
+    # Падений шарда подряд (перезапуски с экспоненциальной задержкой), после которых поиск идёт в основном процессе
+    SHARD_MAX_RESTARTS = int(os.getenv("SHARD_MAX_RESTARTS", "5"))
+    BATCH_SEARCH_BLOCK_ROWS = int(os.getenv("BATCH_SEARCH_BLOCK_ROWS", "16384"))
+    BATCH_SEARCH_QUERY_BLOCK = int(os.getenv("BATCH_SEARCH_QUERY_BLOCK", "256"))
+
+    # Рёбра SIMILAR (python -m services.similarity_graph): число соседей, минимальная схожесть,
+    # статей на транзакцию записи
+    SIMILAR_K = int(os.getenv("SIMILAR_K", "10"))
+    SIMILAR_MIN_SCORE = float(os.getenv("SIMILAR_MIN_SCORE", "0.5"))
+    SIMILAR_WRITE_BATCH = int(os.getenv("SIMILAR_WRITE_BATCH", "500"))
+
+    # Hybrid search
+    BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "data/bm25_index.json")
+    BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+    BM25_B = float(os.getenv("BM25_B", "0.75"))
+    HYBRID_CANDIDATE_DEPTH = int(os.getenv("HYBRID_CANDIDATE_DEPTH", "50"))
+    HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+    HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+    # Graph expansion
+    GRAPH_EXPANSION_ENABLED = os.getenv("GRAPH_EXPANSION_ENABLED", "true").lower() == "true"
+    GRAPH_EXPANSION_DEPTH = int(os.getenv("GRAPH_EXPANSION_DEPTH", "1"))
+    GRAPH_FAN_OUT = int(os.getenv("GRAPH_FAN_OUT", "10"))
+    GRAPH_CACHE_SIZE = int(os.getenv("GRAPH_CACHE_SIZE", "10000"))
+    # Срок жизни списка соседей в кэше (секунды, 0 - без ограничения): новые статьи и рёбра,
+    # которые нельзя сбросить по id, появляются в связях не позже чем через это время
+    GRAPH_CACHE_TTL = float(os.getenv("GRAPH_CACHE_TTL", "600"))
+
+    # Embedding cache
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+
+    # Batch embeddings / ingestion
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "8000"))
+    EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "128"))
+    INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+    INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+    INGEST_WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "1000"))
 
 
 settings = Settings()
\ No newline at end of file
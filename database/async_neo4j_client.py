@@ -0,0 +1,93 @@
+# database/async_neo4j_client.py
+import asyncio
+from database.neo4j_client import (
+    SIMILARITY_QUERY, PAPERS_BY_IDS_QUERY, ADJACENCY_QUERY, STATS_QUERY,
+    similarity_query_params, search_index, merge_hits, refetch_depth, INDEX_REFETCH_ROUNDS, collect_adjacency
+)
+from utils.metrics import metrics
+from config.settings import settings
+
+
+class AsyncNeo4jClient:
+    """Асинхронный клиент Neo4j для API-сервера: запросы на чтение через пул сессий асинхронного драйвера"""
+
+    def __init__(self):
+        self.uri = settings.NEO4J_URI
+        self.user = settings.NEO4J_USER
+        self.password = settings.NEO4J_PASSWORD
+        self._driver = None
+        self._lock = asyncio.Lock()
+
+    async def get_driver(self):
+        """Драйвер создаётся в цикле событий сервера при первом обращении"""
+        if self._driver is None:
+            async with self._lock:
+                if self._driver is None:
+                    from neo4j import AsyncGraphDatabase
+
+                    driver = AsyncGraphDatabase.driver(
+                        self.uri,
+                        auth=(self.user, self.password),
+                        max_connection_pool_size=settings.NEO4J_POOL_SIZE,
+                        connection_acquisition_timeout=settings.NEO4J_ACQUISITION_TIMEOUT,
+                        liveness_check_timeout=settings.NEO4J_LIVENESS_CHECK_TIMEOUT
+                    )
+                    try:
+                        await driver.verify_connectivity()
+                    except Exception:
+                        await driver.close()
+                        raise
+                    self._driver = driver
+        return self._driver
+
+    async def _read(self, query: str, params: dict = None, stage: str = "neo4j_query") -> list:
+        driver = await self.get_driver()
+        with metrics.timed(stage):
+            async with driver.session() as session:
+                result = await session.run(query, params or {})
+                return [record async for record in result]
+
+    async def find_similar_papers(self, query_embedding: list, top_k: int = 10, index=None, filters: dict = None):
+        """То же, что Neo4jClient.find_similar_papers; поиск по индексу идёт в пуле потоков"""
+        if index is not None:
+            try:
+                with metrics.timed("index_search"):
+                    depth, papers = top_k, {}
+                    for _ in range(INDEX_REFETCH_ROUNDS + 1):
+                        hits = await asyncio.to_thread(search_index, index, query_embedding, depth, filters)
+                        papers.update(await self.get_papers_by_ids(
+                            [paper_id for paper_id, _ in hits if paper_id not in papers]
+                        ))
+                        depth = refetch_depth(hits, papers, top_k, depth)
+                        if depth is None:
+                            break
+                    return merge_hits(hits, papers, top_k)
+            except Exception as e:
+                print(f"Error in index search, falling back to Cypher: {e}")
+                metrics.inc("fallbacks_total", {"kind": "cypher_scan"})
+
+        params = similarity_query_params(query_embedding, top_k, filters)
+        if params is None:
+            return []
+        return [dict(record) for record in await self._read(SIMILARITY_QUERY, params, "cypher_scan")]
+
+    async def get_papers_by_ids(self, paper_ids: list) -> dict:
+        if not paper_ids:
+            return {}
+        records = await self._read(PAPERS_BY_IDS_QUERY, {"paper_ids": paper_ids}, "neo4j_papers")
+        return {record["paper_id"]: dict(record) for record in records}
+
+    async def get_adjacency(self, paper_ids: list, fan_out: int = 10) -> dict:
+        if not paper_ids:
+            return {}
+        records = await self._read(ADJACENCY_QUERY, {"paper_ids": paper_ids, "fan_out": fan_out}, "neo4j_adjacency")
+        return collect_adjacency(paper_ids, records)
+
+    async def get_stats(self) -> dict:
+        records = await self._read(STATS_QUERY)
+        return dict(records[0]) if records else {"paper_count": 0}
+
+    async def close(self):
+        if self._driver is not None:
+            await self._driver.close()
+            self._driver = None
@@ -1,75 +1,584 @@
 # database/neo4j_client.py
-from neo4j import GraphDatabase
-import os
-from dotenv import load_dotenv
+import threading
+import time
 import numpy as np
+from models.filter_index import filter_value
+from utils.metrics import metrics
+from config.settings import settings
 
-load_dotenv()
+
+# Запросы, общие для синхронного и асинхронного клиентов
+SIMILARITY_QUERY = """
+    MATCH (p:Paper)
+    WHERE p.embedding IS NOT NULL
+      AND ($year_from IS NULL OR toInteger(p.year) >= $year_from)
+      AND ($year_to IS NULL OR toInteger(p.year) <= $year_to)
+      // Как в AttributeIndex: значение-список проверяется на вхождение, сравниваются строки
+      AND ALL(f IN $equals WHERE ANY(v IN [] + coalesce(p[f.key], []) WHERE toString(v) = f.value))
+    WITH p,
+         p.embedding AS emb1,
+         $query_embedding AS emb2
+    WITH p,
+         reduce(s = 0.0, i IN range(0, size(emb1)-1) |
+            s + emb1[i] * emb2[i]) AS dotProduct,
+         sqrt(reduce(s1 = 0.0, x IN emb1 | s1 + x * x)) AS norm1
+    WHERE norm1 > 0
+    WITH p, dotProduct / (norm1 * $query_norm) AS similarity
+    ORDER BY similarity DESC
+    LIMIT $top_k
+    RETURN p.title AS title,
+           p.bibtex AS bibtex,
+           p.year AS year,
+           p.link AS link,
+           p.paper_id AS paper_id,
+           p.base_summary AS base_summary,
+           similarity
+"""
+
+PAPERS_BY_IDS_QUERY = """
+    UNWIND $paper_ids AS paper_id
+    MATCH (p:Paper {paper_id: paper_id})
+    RETURN p.title AS title,
+           p.bibtex AS bibtex,
+           p.year AS year,
+           p.link AS link,
+           p.paper_id AS paper_id,
+           p.base_summary AS base_summary
+"""
+
+# Соседи каждого типа связи упорядочены по весу ребра (score у SIMILAR), не более $fan_out
+ADJACENCY_QUERY = """
+    UNWIND $paper_ids AS paper_id
+    MATCH (p:Paper {paper_id: paper_id})-[r]-(connected:Paper)
+    WITH paper_id, type(r) AS relationship_type, connected, max(r.score) AS score
+    ORDER BY score IS NULL, score DESC
+    WITH paper_id, relationship_type,
+         collect({node: connected, score: score})[..$fan_out] AS neighbors
+    UNWIND neighbors AS neighbor
+    RETURN paper_id,
+           neighbor.node.title AS title,
+           neighbor.node.paper_id AS connected_id,
+           relationship_type,
+           neighbor.score AS score
+"""
+
+STATS_QUERY = "MATCH (p:Paper) RETURN count(p) AS paper_count"
+
+
+def similarity_query_params(query_embedding: list, top_k: int, filters: dict = None):
+    """Параметры SIMILARITY_QUERY (None для пустого или нулевого вектора запроса)"""
+    query_norm = float(np.linalg.norm(query_embedding)) if len(query_embedding) else 0.0
+    if query_norm == 0:
+        return None
+    filters = filters or {}
+    return {
+        "query_embedding": query_embedding,
+        "query_norm": query_norm,
+        "top_k": top_k,
+        "year_from": filters.get("year_from"),
+        "year_to": filters.get("year_to"),
+        "equals": [
+            {"key": key, "value": filter_value(value)} for key, value in filters.items()
+            if key not in ("year_from", "year_to") and value is not None
+        ]
+    }
+
+
+def search_index(index, query_embedding: list, top_k: int, filters: dict = None) -> list:
+    """Top-k (paper_id, схожесть) по векторному индексу с учётом фильтров"""
+    rows = None
+    if filters:
+        if index.attributes is None:
+            raise ValueError("vector index has no attribute filters")
+        rows = index.attributes.rows(filters)
+        if not len(rows):
+            return []
+    return index.search(query_embedding, top_k, rows=rows)
+
+
+def merge_hits(hits: list, papers: dict, top_k: int = None) -> list:
+    """Метаданные статей со схожестью в порядке ранжирования (не более top_k).
+
+    Статьи из индекса, которых уже нет в Neo4j (удалены до синхронизации), пропускаются
+    и считаются в fallbacks_total{kind="missing_paper"}.
+    """
+    results = []
+    for paper_id, similarity in hits:
+        if paper_id in papers:
+            result = papers[paper_id]
+            result['similarity'] = similarity
+            results.append(result)
+    missing = len(hits) - len(results)
+    if missing:
+        metrics.inc("fallbacks_total", {"kind": "missing_paper"}, missing)
+    return results[:top_k] if top_k is not None else results
+
+
+# Повторных поисков по индексу с увеличенной глубиной, если часть найденных статей отсутствует в Neo4j
+INDEX_REFETCH_ROUNDS = 2
+
+
+def refetch_depth(hits: list, papers: dict, top_k: int, depth: int):
+    """Глубина повторного поиска, покрывающая отсутствующие в Neo4j статьи (None - повтор не нужен)"""
+    found = sum(1 for paper_id, _ in hits if paper_id in papers)
+    if found >= top_k or len(hits) < depth:
+        return None
+    return depth + (len(hits) - found)
+
+
+def collect_adjacency(paper_ids: list, records) -> dict:
+    """Результат ADJACENCY_QUERY: {paper_id: [соседи]}"""
+    adjacency = {paper_id: [] for paper_id in paper_ids}
+    for record in records:
+        neighbor = {
+            "title": record["title"],
+            "paper_id": record["connected_id"],
+            "relationship_type": record["relationship_type"]
+        }
+        if record["score"] is not None:
+            neighbor["score"] = record["score"]
+        adjacency[record["paper_id"]].append(neighbor)
+    return adjacency
 
 
 class Neo4jClient:
     def __init__(self):
-        self.uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
-        self.user = os.getenv("NEO4J_USER", "neo4j")
-        self.password = os.getenv("NEO4J_PASSWORD", "password")
-        self.driver = None
-        self._connect()
+        self.uri = settings.NEO4J_URI
+        self.user = settings.NEO4J_USER
+        self.password = settings.NEO4J_PASSWORD
+        self._driver = None
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def driver(self):
+        """Драйвер Neo4j; соединение устанавливается при первом обращении"""
+        if self._driver is None:
+            with self._lock:
+                # После неудачи не блокируем каждый запрос повторным подключением
+                retry_due = time.monotonic() - self._last_attempt >= settings.NEO4J_RECONNECT_INTERVAL
+                if self._driver is None and (not self._last_attempt or retry_due):
+                    self._connect()
+        return self._driver
 
     def _connect(self):
         """Установить соединение с Neo4j"""
+        # Драйвер импортируется при первом подключении, а не при запуске приложения
+        from neo4j import GraphDatabase
+
+        self._last_attempt = time.monotonic()
+        driver = None
         try:
-            self.driver = GraphDatabase.driver(
+            driver = GraphDatabase.driver(
                 self.uri,
-                auth=(self.user, self.password)
+                auth=(self.user, self.password),
+                max_connection_pool_size=settings.NEO4J_POOL_SIZE,
+                connection_acquisition_timeout=settings.NEO4J_ACQUISITION_TIMEOUT,
+                # Соединения, простаивавшие дольше этого времени, проверяются перед использованием
+                liveness_check_timeout=settings.NEO4J_LIVENESS_CHECK_TIMEOUT
             )
             # Проверка соединения
-            with self.driver.session() as session:
-                session.run("RETURN 1")
+            driver.verify_connectivity()
+            self._driver = driver
             print("Connected to Neo4j successfully")
         except Exception as e:
             print(f"Error connecting to Neo4j: {e}")
-            self.driver = None
+            if driver is not None:
+                driver.close()
+            self._driver = None
+
+    def is_alive(self) -> bool:
+        """Проверить доступность базы"""
+        try:
+            driver = self.driver
+            if driver is None:
+                return False
+            driver.verify_connectivity()
+            return True
+        except Exception as e:
+            print(f"Neo4j liveness check failed: {e}")
+            return False
+
+    def find_similar_papers(self, query_embedding: list, top_k: int = 10, index=None, filters: dict = None):
+        """Найти схожие статьи по косинусной схожести.
 
-    def find_similar_papers(self, query_embedding: list, top_k: int = 10):
-        """Найти схожие статьи по косинусной схожести"""
+        filters: {"year_from": ..., "year_to": ..., свойство: значение} - применяются до оценки схожести
+        """
         if not self.driver:
             return []
 
+        if index is not None:
+            try:
+                with metrics.timed("index_search"):
+                    return self._find_similar_with_index(query_embedding, top_k, index, filters)
+            except Exception as e:
+                print(f"Error in index search, falling back to Cypher: {e}")
+                metrics.inc("fallbacks_total", {"kind": "cypher_scan"})
+
+        params = similarity_query_params(query_embedding, top_k, filters)
+        if params is None:
+            return []
+
         try:
-            with self.driver.session() as session:
-                result = session.run("""
-                    MATCH (p:Paper)
-                    WHERE p.embedding IS NOT NULL
-                    WITH p, 
-                         p.embedding AS emb1,
-                         $query_embedding AS emb2
-                    WITH p, 
-                         reduce(s = 0.0, i IN range(0, size(emb1)-1) | 
-                            s + emb1[i] * emb2[i]) AS dotProduct,
-                         sqrt(reduce(s1 = 0.0, x IN emb1 | s1 + x * x)) AS norm1,
-                         sqrt(reduce(s2 = 0.0, x IN emb2 | s2 + x * x)) AS norm2
-                    WHERE norm1 > 0 AND norm2 > 0
-                    WITH p, dotProduct / (norm1 * norm2) AS similarity
-                    ORDER BY similarity DESC
-                    LIMIT $top_k
-                    RETURN p.title AS title,
-                           p.bibtex AS bibtex,
-                           p.year AS year,
-                           p.link AS link,
-                           p.paper_id AS paper_id,
-                           similarity
-                """, {
-                    "query_embedding": query_embedding,
-                    "top_k": top_k
-                })
+            with metrics.timed("cypher_scan"), self.driver.session() as session:
+                result = session.run(SIMILARITY_QUERY, params)
 
                 return [dict(record) for record in result]
         except Exception as e:
             print(f"Error in similarity search: {e}")
             return []
 
-    def get_connected_papers(self, paper_id: str):
-        """Получить связанные статьи"""
+    def _find_similar_with_index(self, query_embedding: list, top_k: int, index, filters: dict = None):
+        """Поиск через векторный индекс: Neo4j используется только для метаданных"""
+        depth, papers = top_k, {}
+        for _ in range(INDEX_REFETCH_ROUNDS + 1):
+            hits = search_index(index, query_embedding, depth, filters)
+            papers.update(self.get_papers_by_ids([paper_id for paper_id, _ in hits if paper_id not in papers]))
+            depth = refetch_depth(hits, papers, top_k, depth)
+            if depth is None:
+                break
+        return merge_hits(hits, papers, top_k)
+
+    def get_papers_by_ids(self, paper_ids: list) -> dict:
+        """Получить метаданные статей по списку paper_id"""
+        if not self.driver or not paper_ids:
+            return {}
+
+        with metrics.timed("neo4j_papers"), self.driver.session() as session:
+            result = session.run(PAPERS_BY_IDS_QUERY, {"paper_ids": paper_ids})
+
+            return {record["paper_id"]: dict(record) for record in result}
+
+    def iter_embeddings(self):
+        """Потоково выгрузить эмбеддинги всех статей: пары (paper_id, embedding)"""
+        if not self.driver:
+            return
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.embedding IS NOT NULL AND p.paper_id IS NOT NULL
+                RETURN p.paper_id AS paper_id, p.embedding AS embedding
+            """)
+            for record in result:
+                yield record["paper_id"], record["embedding"]
+
+    def get_paper_attributes(self, properties: list) -> dict:
+        """Год и заданные свойства всех статей: {paper_id: {"year": ..., свойство: ...}}"""
+        if not self.driver:
+            return {}
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.paper_id IS NOT NULL
+                RETURN p.paper_id AS paper_id,
+                       p.year AS year,
+                       [prop IN $properties | p[prop]] AS values
+            """, {"properties": properties})
+            return {
+                record["paper_id"]: dict(zip(properties, record["values"]), year=record["year"])
+                for record in result
+            }
+
+    def get_all_paper_ids(self) -> list:
+        """paper_id всех статей"""
+        if not self.driver:
+            return []
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.paper_id IS NOT NULL
+                RETURN p.paper_id AS paper_id
+            """)
+            return [record["paper_id"] for record in result]
+
+    def iter_paper_texts(self, paper_ids: list, batch_size: int = 5000):
+        """Потоково выгрузить title и bibtex для списка статей"""
+        if not self.driver:
+            return
+
+        for start in range(0, len(paper_ids), batch_size):
+            with self.driver.session() as session:
+                result = session.run("""
+                    UNWIND $paper_ids AS paper_id
+                    MATCH (p:Paper {paper_id: paper_id})
+                    RETURN p.paper_id AS paper_id, p.title AS title, p.bibtex AS bibtex
+                """, {"paper_ids": paper_ids[start:start + batch_size]})
+                for record in result:
+                    yield dict(record)
+
+    def get_all_embeddings(self):
+        """Выгрузить эмбеддинги всех статей: (список paper_id, матрица float32)"""
+        paper_ids = []
+        embeddings = []
+        for paper_id, embedding in self.iter_embeddings():
+            paper_ids.append(paper_id)
+            embeddings.append(np.asarray(embedding, dtype=np.float32))
+
+        if not embeddings:
+            return [], np.empty((0, 0), dtype=np.float32)
+        return paper_ids, np.vstack(embeddings)
+
+    def ensure_schema(self):
+        """Создать ограничение уникальности paper_id (нужно для быстрого MERGE при загрузке)"""
+        if not self.driver:
+            return
+
+        with self.driver.session() as session:
+            session.run("""
+                CREATE CONSTRAINT paper_id_unique IF NOT EXISTS
+                FOR (p:Paper) REQUIRE p.paper_id IS UNIQUE
+            """)
+            # Индексы для инкрементальной синхронизации по меткам изменений
+            session.run("""
+                CREATE INDEX paper_updated_at IF NOT EXISTS
+                FOR (p:Paper) ON (p.updated_at)
+            """)
+            session.run("""
+                CREATE INDEX deleted_paper_deleted_at IF NOT EXISTS
+                FOR (d:DeletedPaper) ON (d.deleted_at)
+            """)
+
+    def get_embedded_paper_ids(self) -> set:
+        """paper_id статей, у которых уже есть эмбеддинг"""
+        if not self.driver:
+            return set()
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.embedding IS NOT NULL AND p.paper_id IS NOT NULL
+                RETURN p.paper_id AS paper_id
+            """)
+            return {record["paper_id"] for record in result}
+
+    def upsert_papers(self, papers: list) -> int:
+        """Записать пачку статей с эмбеддингами одной транзакцией через UNWIND"""
+        if not self.driver or not papers:
+            return 0
+
+        def write(tx):
+            tx.run("""
+                UNWIND $papers AS paper
+                MERGE (p:Paper {paper_id: paper.paper_id})
+                SET p.title = paper.title,
+                    p.bibtex = paper.bibtex,
+                    p.year = paper.year,
+                    p.link = paper.link,
+                    p.embedding = paper.embedding,
+                    p.updated_at = timestamp()
+            """, {"papers": papers}).consume()
+
+        with self.driver.session() as session:
+            session.execute_write(write)
+        return len(papers)
+
+    def delete_papers(self, paper_ids: list) -> int:
+        """Удалить статьи, оставив отметки :DeletedPaper для инкрементальной синхронизации индексов"""
+        if not self.driver or not paper_ids:
+            return 0
+
+        def write(tx):
+            return tx.run("""
+                UNWIND $paper_ids AS paper_id
+                MATCH (p:Paper {paper_id: paper_id})
+                DETACH DELETE p
+                MERGE (d:DeletedPaper {paper_id: paper_id})
+                SET d.deleted_at = timestamp()
+                RETURN count(*) AS deleted
+            """, {"paper_ids": paper_ids}).single()["deleted"]
+
+        with self.driver.session() as session:
+            return session.execute_write(write)
+
+    def get_sync_watermark(self) -> int:
+        """Текущая метка изменений: максимум updated_at статей и deleted_at удалений"""
+        if not self.driver:
+            return 0
+
+        with self.driver.session() as session:
+            record = session.run("""
+                CALL {
+                    MATCH (p:Paper) RETURN max(p.updated_at) AS value
+                    UNION ALL
+                    MATCH (d:DeletedPaper) RETURN max(d.deleted_at) AS value
+                }
+                RETURN coalesce(max(value), 0) AS watermark
+            """).single()
+            return record["watermark"]
+
+    def get_changes_since(self, watermark: int, properties: list = None) -> dict:
+        """Изменения с метки watermark (включительно, повторное применение безопасно).
+
+        Изменения перечитываются с запасом INDEX_SYNC_OVERLAP секунд до метки: updated_at -
+        timestamp() транзакции, и долгая пакетная запись может зафиксироваться после того,
+        как более поздняя транзакция уже сдвинула метку дальше её времени.
+        Возвращает {"changed": [{paper_id, embedding, ..., updated_at}],
+        "deleted": [{paper_id, deleted_at}], "watermark": новая метка}.
+        """
+        properties = properties or []
+        if not self.driver:
+            return {"changed": [], "deleted": [], "watermark": watermark}
+        since = watermark - int(settings.INDEX_SYNC_OVERLAP * 1000)
+
+        with self.driver.session() as session:
+            changed = [dict(record) for record in session.run("""
+                MATCH (p:Paper)
+                WHERE p.updated_at >= $since AND p.embedding IS NOT NULL
+                RETURN p.paper_id AS paper_id,
+                       p.embedding AS embedding,
+                       p.title AS title,
+                       p.bibtex AS bibtex,
+                       p.year AS year,
+                       [prop IN $properties | p[prop]] AS values,
+                       p.updated_at AS updated_at
+            """, {"since": since, "properties": properties})]
+
+            deleted = [dict(record) for record in session.run("""
+                MATCH (d:DeletedPaper)
+                WHERE d.deleted_at >= $since
+                  AND NOT EXISTS { MATCH (:Paper {paper_id: d.paper_id}) }
+                RETURN d.paper_id AS paper_id, d.deleted_at AS deleted_at
+            """, {"since": since})]
+
+        for paper in changed:
+            paper.update(zip(properties, paper.pop("values")))
+
+        new_watermark = max(
+            [watermark] + [p["updated_at"] for p in changed] + [d["deleted_at"] for d in deleted]
+        )
+        return {
+            "changed": changed,
+            "deleted": deleted,
+            "watermark": new_watermark
+        }
+
+    def get_changed_paper_ids(self, watermark: int) -> list:
+        """paper_id статей, изменённых с метки watermark (с тем же запасом INDEX_SYNC_OVERLAP)"""
+        if not self.driver:
+            return []
+        since = watermark - int(settings.INDEX_SYNC_OVERLAP * 1000)
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.updated_at >= $since
+                RETURN p.paper_id AS paper_id
+            """, {"since": since})
+            return [record["paper_id"] for record in result]
+
+    def get_similarity_pending_ids(self) -> list:
+        """Статьи, для которых рёбра SIMILAR ещё не рассчитаны или устарели после изменения статьи"""
+        if not self.driver:
+            return []
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.embedding IS NOT NULL
+                  AND (p.similar_updated_at IS NULL OR p.updated_at > p.similar_updated_at)
+                RETURN p.paper_id AS paper_id
+            """)
+            return [record["paper_id"] for record in result]
+
+    def get_similarity_thresholds(self) -> dict:
+        """Схожесть k-го соседа каждой статьи с рассчитанными рёбрами SIMILAR: {paper_id: score}"""
+        if not self.driver:
+            return {}
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.similar_min_score IS NOT NULL
+                RETURN p.paper_id AS paper_id, p.similar_min_score AS min_score
+            """)
+            return {record["paper_id"]: record["min_score"] for record in result}
+
+    def write_similar_edges(self, rows: list, computed_at: int) -> int:
+        """Заменить исходящие рёбра SIMILAR статей одной транзакцией через UNWIND.
+
+        rows: [{paper_id, min_score, neighbors: [{paper_id, score}]}]; min_score -
+        порог, выше которого новая статья должна попасть в соседи (см. services.similarity_graph).
+        computed_at - метка изменений, на которую рассчитаны соседи; updated_at не меняется,
+        чтобы запись рёбер не считалась изменением статьи. Вместо этого в той же транзакции
+        обновляется версия рёбер (get_similar_edges_version) - по ней процессы сбрасывают кэш связей.
+        """
+        if not self.driver or not rows:
+            return 0
+
+        def write(tx):
+            tx.run("""
+                UNWIND $rows AS row
+                MATCH (p:Paper {paper_id: row.paper_id})
+                OPTIONAL MATCH (p)-[old:SIMILAR]->()
+                DELETE old
+                WITH DISTINCT p, row
+                SET p.similar_min_score = row.min_score,
+                    p.similar_updated_at = $computed_at
+                WITH p, row
+                UNWIND row.neighbors AS neighbor
+                MATCH (n:Paper {paper_id: neighbor.paper_id})
+                MERGE (p)-[r:SIMILAR]->(n)
+                SET r.score = neighbor.score
+            """, {"rows": rows, "computed_at": computed_at}).consume()
+            tx.run("""
+                MERGE (v:GraphVersion {name: 'similar'})
+                SET v.updated_at = timestamp()
+            """).consume()
+
+        with self.driver.session() as session:
+            session.execute_write(write)
+        return len(rows)
+
+    def get_similar_edges_version(self):
+        """Время последней записи рёбер SIMILAR (None, если рёбра ещё не записывались)"""
+        if not self.driver:
+            return None
+
+        with self.driver.session() as session:
+            record = session.run("""
+                MATCH (v:GraphVersion {name: 'similar'})
+                RETURN v.updated_at AS version
+            """).single()
+            return record["version"] if record else None
+
+    def get_papers_without_base_summary(self, limit: int = 100) -> list:
+        """Статьи, для которых ещё не сгенерировано базовое описание"""
+        if not self.driver:
+            return []
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (p:Paper)
+                WHERE p.base_summary IS NULL AND p.paper_id IS NOT NULL
+                RETURN p.title AS title,
+                       p.bibtex AS bibtex,
+                       p.year AS year,
+                       p.paper_id AS paper_id
+                LIMIT $limit
+            """, {"limit": limit})
+            return [dict(record) for record in result]
+
+    def set_base_summaries(self, summaries: list) -> int:
+        """Сохранить базовые описания: список {paper_id, base_summary}"""
+        if not self.driver or not summaries:
+            return 0
+
+        def write(tx):
+            tx.run("""
+                UNWIND $summaries AS row
+                MATCH (p:Paper {paper_id: row.paper_id})
+                SET p.base_summary = row.base_summary
+            """, {"summaries": summaries}).consume()
+
+        with self.driver.session() as session:
+            session.execute_write(write)
+        return len(summaries)
+
+    def get_connected_papers(self, paper_id: str, limit: int = 10):
+        """Получить связанные статьи: сначала похожие (SIMILAR) по убыванию схожести, затем остальные связи"""
         if not self.driver:
             return []
 
@@ -77,17 +586,29 @@ class Neo4jClient:
             with self.driver.session() as session:
                 result = session.run("""
                     MATCH (p:Paper {paper_id: $paper_id})-[r]-(connected:Paper)
+                    WITH connected, type(r) AS relationship_type, max(r.score) AS score
                     RETURN connected.title AS title,
                            connected.paper_id AS paper_id,
-                           type(r) AS relationship_type
-                    LIMIT 10
-                """, {"paper_id": paper_id})
+                           relationship_type,
+                           score
+                    ORDER BY score IS NULL, score DESC
+                    LIMIT $limit
+                """, {"paper_id": paper_id, "limit": limit})
 
                 return [dict(record) for record in result]
         except Exception as e:
             print(f"Error getting connections: {e}")
             return []
 
+    def get_adjacency(self, paper_ids: list, fan_out: int = 10) -> dict:
+        """Соседи статей одним запросом через UNWIND, не более fan_out на каждый тип связи"""
+        if not self.driver or not paper_ids:
+            return {}
+
+        with metrics.timed("neo4j_adjacency"), self.driver.session() as session:
+            result = session.run(ADJACENCY_QUERY, {"paper_ids": paper_ids, "fan_out": fan_out})
+            return collect_adjacency(paper_ids, result)
+
     def get_stats(self):
         """Получить статистику базы данных"""
         if not self.driver:
@@ -95,7 +616,7 @@ class Neo4jClient:
 
         try:
             with self.driver.session() as session:
-                result = session.run("MATCH (p:Paper) RETURN count(p) AS paper_count")
+                result = session.run(STATS_QUERY)
                 return result.single().data()
         except Exception as e:
             print(f"Error getting stats: {e}")
@@ -103,5 +624,7 @@ class Neo4jClient:
 
     def close(self):
         """Закрыть соединение"""
-        if self.driver:
-            self.driver.close()
\ No newline at end of file
+        with self._lock:
+            if self._driver:
+                self._driver.close()
+                self._driver = None
\ No newline at end of file
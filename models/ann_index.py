@@ -0,0 +1,201 @@
+# models/ann_index.py
+import argparse
+import json
+import math
+import os
+import numpy as np
+from models.similarity import normalize_vector, normalize_rows, top_k_indices
+from models.index_files import save_arrays, array_files, read_meta, replace_meta
+
+ANN_VERSION = 1
+ARRAY_NAMES = ("centroids", "vectors", "offsets")
+
+
+def spherical_kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 20,
+                     sample_size: int = 100000, seed: int = 42) -> np.ndarray:
+    """Центроиды сферического k-means (по косинусу) для нормализованных строк"""
+    rng = np.random.default_rng(seed)
+    n = data.shape[0]
+    sample = data[np.sort(rng.choice(n, min(n, sample_size), replace=False))] if n > sample_size else data
+    sample = np.asarray(sample, dtype=np.float32)
+
+    centroids = sample[rng.choice(sample.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = ~sums.any(axis=1)
+        # Пустые кластеры заново инициализируем случайными точками
+        sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_clusters(data, centroids: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    """Номер ближайшего центроида для каждой строки (поблочно)"""
+    assignment = np.empty(data.shape[0], dtype=np.int32)
+    for start in range(0, data.shape[0], block_rows):
+        block = np.asarray(data[start:start + block_rows], dtype=np.float32)
+        assignment[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """Приближённый поиск IVF-flat: векторы разбиты на кластеры, при поиске просматриваются nprobe ближайших.
+
+    Векторы хранятся переупорядоченными по кластерам, поэтому каждый список -
+    непрерывный срез матрицы между offsets[c] и offsets[c + 1].
+    """
+
+    def __init__(self, paper_ids: list, vectors, centroids: np.ndarray, offsets: np.ndarray, nprobe: int = 16):
+        self.paper_ids = paper_ids
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.nprobe = nprobe
+        self.dim = centroids.shape[1]
+        self._rows = None
+        self.attributes = None
+
+    @classmethod
+    def build(cls, paper_ids: list, matrix, nlist: int = 0, nprobe: int = 16, n_iter: int = 20):
+        """Построить индекс по нормализованной матрице эмбеддингов"""
+        n = matrix.shape[0]
+        if not nlist:
+            # Обычная эвристика: порядка sqrt(N) списков
+            nlist = max(1, int(4 * math.sqrt(n)))
+        nlist = min(nlist, n)
+
+        centroids = spherical_kmeans(matrix, nlist, n_iter=n_iter)
+        assignment = assign_clusters(matrix, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        vectors = np.ascontiguousarray(np.asarray(matrix, dtype=np.float32)[order])
+        ordered_ids = [paper_ids[i] for i in order]
+        return cls(ordered_ids, vectors, centroids, offsets, nprobe=nprobe)
+
+    @classmethod
+    def from_store(cls, store, nlist: int = 0, nprobe: int = 16):
+        return cls.build(store.paper_ids, store.matrix, nlist=nlist, nprobe=nprobe)
+
+    def save(self, path: str):
+        """Сохранить индекс в каталог (.npy-файлы открываются через mmap при загрузке).
+
+        Массивы пишутся в новые файлы, каталог переключается записью meta.json последней:
+        поиск по загруженному индексу не видит частично записанных файлов.
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = read_meta(path)
+        files = save_arrays(path, {
+            "centroids": self.centroids,
+            "vectors": np.asarray(self.vectors),
+            "offsets": self.offsets
+        })
+        replace_meta(path, {
+            "version": ANN_VERSION,
+            "type": "ivf_flat",
+            "dim": self.dim,
+            "nlist": int(self.centroids.shape[0]),
+            "files": files,
+            "paper_ids": self.paper_ids
+        }, array_files(previous, ARRAY_NAMES) if previous else None)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 16):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != ANN_VERSION:
+            raise ValueError(f"Unsupported ANN index version: {meta.get('version')}")
+
+        files = array_files(meta, ARRAY_NAMES)
+        return cls(
+            meta["paper_ids"],
+            np.load(os.path.join(path, files["vectors"]), mmap_mode="r"),
+            np.load(os.path.join(path, files["centroids"])),
+            np.load(os.path.join(path, files["offsets"])),
+            nprobe=nprobe
+        )
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def search(self, query_embedding, top_k: int = 10, nprobe: int = None, rows=None) -> list:
+        """Найти приблизительный top-k: список пар (paper_id, similarity).
+
+        При фильтре (rows) подмножество оценивается точно: его размер и так меньше корпуса.
+        """
+        query = normalize_vector(query_embedding)
+        if not len(self) or query.shape[0] != self.dim or not query.any():
+            return []
+
+        if rows is not None:
+            scores = np.asarray(self.vectors[rows]) @ query
+            return [(self.paper_ids[rows[i]], float(scores[i])) for i in top_k_indices(scores, top_k)]
+
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        probes = top_k_indices(self.centroids @ query, nprobe)
+        rows = np.concatenate([
+            np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes
+        ])
+        if not rows.size:
+            return []
+
+        scores = np.asarray(self.vectors[rows]) @ query
+        best = top_k_indices(scores, top_k)
+        return [(self.paper_ids[rows[i]], float(scores[i])) for i in best]
+
+    def row_vectors(self, rows) -> np.ndarray:
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def search_batch(self, query_embeddings: list, top_k: int = 10, **kwargs) -> list:
+        return [
+            self.search(embedding, top_k) if embedding is not None else []
+            for embedding in query_embeddings
+        ]
+
+    def similarity_for(self, query_embedding, paper_ids: list) -> dict:
+        """Точная косинусная схожесть запроса с заданными статьями: {paper_id: similarity}"""
+        if self._rows is None:
+            self._rows = {paper_id: i for i, paper_id in enumerate(self.paper_ids)}
+
+        query = normalize_vector(query_embedding)
+        found = [(paper_id, self._rows[paper_id]) for paper_id in paper_ids if paper_id in self._rows]
+        if not found or query.shape[0] != self.dim:
+            return {}
+        scores = np.asarray(self.vectors[np.array([row for _, row in found])]) @ query
+        return {paper_id: float(score) for (paper_id, _), score in zip(found, scores)}
+
+
+def main():
+    from config.settings import settings
+    from database.neo4j_client import Neo4jClient
+    from models.embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(description="Построение IVF-индекса по хранилищу эмбеддингов")
+    parser.add_argument("--nlist", type=int, default=settings.ANN_NLIST, help="Число кластеров (0 - 4*sqrt(N))")
+    parser.add_argument("--rebuild-store", action="store_true", help="Заново выгрузить эмбеддинги из Neo4j")
+    args = parser.parse_args()
+
+    path = settings.EMBEDDING_STORE_PATH
+    if args.rebuild_store or not EmbeddingStore.exists(path):
+        client = Neo4jClient()
+        try:
+            store = EmbeddingStore.build(client, path)
+        finally:
+            client.close()
+    else:
+        store = EmbeddingStore.open(path)
+
+    index = IVFIndex.from_store(store, nlist=args.nlist, nprobe=settings.ANN_NPROBE)
+    index.save(settings.ANN_INDEX_PATH)
+    print(f"IVF index built: {len(index)} papers, nlist={index.centroids.shape[0]}, path={settings.ANN_INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
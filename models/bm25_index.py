@@ -0,0 +1,210 @@
+# models/bm25_index.py
+import json
+import math
+import os
+import re
+import numpy as np
+from models.index_files import temp_path, remove_quietly
+from models.similarity import top_k_indices
+
+BM25_VERSION = 1
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list:
+    """Разбить текст на термы: нижний регистр, буквенно-цифровые последовательности"""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1 or token.isdigit()]
+
+
+class BM25Index:
+    """Инвертированный индекс по title и bibtex со скорингом BM25"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.paper_ids = []
+        self.doc_lengths = []
+        # term -> [[номера документов], [частоты терма]]
+        self.postings = {}
+        self._docs = {}
+        self._deleted = set()
+        self._total_length = 0
+        # Метка изменений Neo4j, с которой согласовано содержимое индекса (None - неизвестна)
+        self.watermark = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, paper_id):
+        return paper_id in self._docs
+
+    def add_document(self, paper_id: str, text: str):
+        """Добавить или обновить документ (старая версия помечается удалённой)"""
+        if paper_id in self._docs:
+            self.remove_document(paper_id)
+
+        tokens = tokenize(text)
+        doc = len(self.paper_ids)
+        self.paper_ids.append(paper_id)
+        self.doc_lengths.append(len(tokens))
+        self._docs[paper_id] = doc
+        self._total_length += len(tokens)
+
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            docs, tfs = self.postings.setdefault(term, [[], []])
+            docs.append(doc)
+            tfs.append(tf)
+
+    def remove_document(self, paper_id: str):
+        doc = self._docs.pop(paper_id, None)
+        if doc is not None:
+            # Новое множество вместо изменения на месте: поиск в другом потоке читает старое
+            self._deleted = self._deleted | {doc}
+            self._total_length -= self.doc_lengths[doc]
+
+    def search(self, query: str, top_k: int = 10) -> list:
+        """Найти top-k документов: список пар (paper_id, bm25_score)"""
+        terms = set(tokenize(query))
+        if not terms or not self._docs:
+            return []
+
+        n_docs = len(self._docs)
+        avg_length = self._total_length / n_docs if n_docs else 1.0
+        # Документы, добавляемые параллельно с поиском, в этот поиск не попадают
+        size = len(self.paper_ids)
+        lengths = np.asarray(self.doc_lengths[:size], dtype=np.float32)
+        scores = np.zeros(size, dtype=np.float32)
+
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            count = min(len(posting[0]), len(posting[1]))
+            docs = np.asarray(posting[0][:count], dtype=np.int64)
+            tfs = np.asarray(posting[1][:count], dtype=np.float32)
+            visible = docs < size
+            docs, tfs = docs[visible], tfs[visible]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avg_length)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        deleted = self._deleted
+        if deleted:
+            scores[[doc for doc in deleted if doc < size]] = 0.0
+
+        return [
+            (self.paper_ids[i], float(scores[i]))
+            for i in top_k_indices(scores, top_k) if scores[i] > 0
+        ]
+
+    def save(self, path: str):
+        """Сохранить индекс в JSON без помеченных удалёнными документов.
+
+        Индекс в памяти не перенумеровывается: сохранение вызывается и из потока
+        синхронизации, пока другие потоки ищут по тем же спискам.
+        """
+        paper_ids, doc_lengths, postings = self._compacted()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = temp_path(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": BM25_VERSION,
+                    "k1": self.k1,
+                    "b": self.b,
+                    "watermark": self.watermark,
+                    "paper_ids": paper_ids,
+                    "doc_lengths": doc_lengths,
+                    "postings": postings
+                }, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            remove_quietly(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("version") != BM25_VERSION:
+            raise ValueError(f"Unsupported BM25 index version: {data.get('version')}")
+
+        index = cls(k1=data["k1"], b=data["b"])
+        index.paper_ids = data["paper_ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = data["postings"]
+        index._docs = {paper_id: i for i, paper_id in enumerate(index.paper_ids)}
+        index._total_length = sum(index.doc_lengths)
+        index.watermark = data.get("watermark")
+        return index
+
+    def compact(self):
+        """Физически удалить помеченные документы и перенумеровать оставшиеся"""
+        if not self._deleted:
+            return
+
+        self.paper_ids, self.doc_lengths, self.postings = self._compacted()
+        self._docs = {paper_id: i for i, paper_id in enumerate(self.paper_ids)}
+        self._deleted = set()
+
+    def _compacted(self):
+        """paper_ids, длины и списки вхождений без помеченных документов (индекс не меняется)"""
+        deleted = self._deleted
+        if not deleted:
+            return self.paper_ids, self.doc_lengths, self.postings
+
+        remap = {}
+        paper_ids, doc_lengths = [], []
+        for doc, paper_id in enumerate(self.paper_ids):
+            if doc in deleted:
+                continue
+            remap[doc] = len(paper_ids)
+            paper_ids.append(paper_id)
+            doc_lengths.append(self.doc_lengths[doc])
+
+        postings = {}
+        for term, (docs, tfs) in self.postings.items():
+            kept = [(remap[d], tf) for d, tf in zip(docs, tfs) if d in remap]
+            if kept:
+                postings[term] = [[d for d, _ in kept], [tf for _, tf in kept]]
+        return paper_ids, doc_lengths, postings
+
+    def sync_with_neo4j(self, neo4j_client) -> int:
+        """Согласовать индекс с Neo4j; вернуть число добавленных, обновлённых и удалённых статей.
+
+        Удаляются статьи, которых больше нет в графе; добавляются отсутствующие и
+        переиндексируются изменённые после сохранённой метки (без метки - все).
+        """
+        # Метка берётся до чтения: изменения во время согласования попадут в следующее
+        watermark = neo4j_client.get_sync_watermark()
+        paper_ids = neo4j_client.get_all_paper_ids()
+        known = set(paper_ids)
+
+        removed = [paper_id for paper_id in self._docs if paper_id not in known]
+        for paper_id in removed:
+            self.remove_document(paper_id)
+
+        if self.watermark is None:
+            refresh = paper_ids
+        else:
+            changed = set(neo4j_client.get_changed_paper_ids(self.watermark))
+            refresh = [paper_id for paper_id in paper_ids if paper_id not in self._docs or paper_id in changed]
+        for paper in neo4j_client.iter_paper_texts(refresh):
+            self.add_document(paper["paper_id"], paper_document_text(paper))
+
+        self.watermark = watermark
+        return len(refresh) + len(removed)
+
+
+def paper_document_text(paper: dict) -> str:
+    """Текст статьи для лексического индекса"""
+    return " ".join(str(part) for part in (paper.get("title"), paper.get("bibtex")) if part)
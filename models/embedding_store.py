@@ -0,0 +1,140 @@
+# models/embedding_store.py
+import json
+import os
+import uuid
+import numpy as np
+from models.index_files import read_meta, replace_meta, remove_quietly
+from models.similarity import normalize_vector
+
+STORE_VERSION = 1
+MATRIX_FILE = "embeddings.f32"
+IDS_FILE = "ids.json"
+
+
+class EmbeddingStore:
+    """Хранилище эмбеддингов на диске: матрица float32 (np.memmap) и таблица paper_id -> строка.
+
+    Формат каталога:
+    - embeddings-<token>.f32 - нормализованные строки float32 подряд, строка i начинается со смещения i * dim * 4
+    - ids.json - версия формата, размерность, число строк, метка синхронизации, paper_id в порядке строк
+      и имя файла матрицы (files.matrix; в каталогах старого формата - embeddings.f32)
+
+    ids.json - единственный указатель на версию хранилища: таблица id и матрица публикуются вместе.
+    """
+
+    def __init__(self, path: str, paper_ids: list, matrix, watermark: int = None):
+        self.path = path
+        self.paper_ids = paper_ids
+        self.matrix = matrix
+        self.dim = matrix.shape[1]
+        # Метка времени изменений Neo4j, на момент которой выгружены эмбеддинги
+        self.watermark = watermark
+        self._rows = None
+
+    @staticmethod
+    def matrix_file(meta: dict) -> str:
+        return meta.get("files", {}).get("matrix", MATRIX_FILE)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        meta = read_meta(path, IDS_FILE)
+        return meta is not None and os.path.exists(os.path.join(path, cls.matrix_file(meta)))
+
+    @classmethod
+    def open(cls, path: str):
+        """Открыть хранилище через np.memmap без чтения матрицы в память"""
+        with open(os.path.join(path, IDS_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported embedding store version: {meta.get('version')}")
+
+        count, dim = meta["count"], meta["dim"]
+        matrix_path = os.path.join(path, cls.matrix_file(meta))
+        expected_size = count * dim * np.dtype(np.float32).itemsize
+        if os.path.getsize(matrix_path) != expected_size:
+            raise ValueError(f"Embedding store is corrupted: {matrix_path} size mismatch")
+
+        if count == 0:
+            matrix = np.empty((0, dim), dtype=np.float32)
+        else:
+            matrix = np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(count, dim))
+        return cls(path, meta["paper_ids"], matrix, meta.get("watermark"))
+
+    @classmethod
+    def build(cls, neo4j_client, path: str):
+        """Выгрузить эмбеддинги из Neo4j в хранилище (построчно, без загрузки всего графа в память)"""
+        # Метка берётся до выгрузки: изменения во время выгрузки подхватит инкрементальная синхронизация
+        watermark = neo4j_client.get_sync_watermark()
+        store = cls.write(path, neo4j_client.iter_embeddings(), watermark=watermark)
+        print(f"Embedding store built: {len(store)} papers, dim={store.dim}, path={path}")
+        return store
+
+    @classmethod
+    def write(cls, path: str, rows, watermark: int = None):
+        """Записать хранилище из пар (paper_id, embedding) и открыть его.
+
+        Матрица пишется в новый файл с уникальным именем, затем ids.json со ссылкой на него
+        атомарно заменяется одним os.replace: читатель видит либо старую пару файлов, либо новую.
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = read_meta(path, IDS_FILE)
+        matrix_name = f"embeddings-{uuid.uuid4().hex[:12]}.f32"
+        matrix_path = os.path.join(path, matrix_name)
+        try:
+            paper_ids = []
+            dim = 0
+            with open(matrix_path, "wb") as f:
+                for paper_id, embedding in rows:
+                    vector = normalize_vector(embedding)
+                    if not dim:
+                        dim = vector.shape[0]
+                    if vector.shape[0] != dim or not vector.any():
+                        continue
+                    f.write(vector.tobytes())
+                    paper_ids.append(paper_id)
+
+            if not paper_ids:
+                raise ValueError("No paper embeddings found, embedding store not built")
+
+            # Уже открытые np.memmap продолжают видеть прежнюю матрицу до закрытия
+            replace_meta(path, {
+                "version": STORE_VERSION,
+                "dtype": "float32",
+                "dim": dim,
+                "count": len(paper_ids),
+                "watermark": watermark,
+                "files": {"matrix": matrix_name},
+                "paper_ids": paper_ids
+            }, {"matrix": cls.matrix_file(previous)} if previous else None, name=IDS_FILE)
+        except BaseException:
+            remove_quietly(matrix_path)
+            raise
+        return cls.open(path)
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def row_of(self, paper_id: str):
+        """Номер строки матрицы для paper_id (None, если статьи нет)"""
+        if self._rows is None:
+            self._rows = {pid: i for i, pid in enumerate(self.paper_ids)}
+        return self._rows.get(paper_id)
+
+    def get_embedding(self, paper_id: str):
+        """Нормализованный эмбеддинг статьи (копия одной строки)"""
+        row = self.row_of(paper_id)
+        if row is None:
+            return None
+        return np.array(self.matrix[row])
+
+
+if __name__ == "__main__":
+    from config.settings import settings
+    from database.neo4j_client import Neo4jClient
+
+    client = Neo4jClient()
+    try:
+        EmbeddingStore.build(client, settings.EMBEDDING_STORE_PATH)
+    finally:
+        client.close()
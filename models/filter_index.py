@@ -0,0 +1,126 @@
+# models/filter_index.py
+import numpy as np
+
+MISSING_YEAR = -1
+RANGE_KEYS = ("year_from", "year_to")
+
+
+def filter_value(value) -> str:
+    """Значение свойства как ключ фильтра: строка, как её даёт toString() в Cypher"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def parse_year(value) -> int:
+    try:
+        return int(str(value).strip()[:4])
+    except (TypeError, ValueError):
+        return MISSING_YEAR
+
+
+class AttributeIndex:
+    """Предрассчитанные фильтры по атрибутам статей, выровненные по строкам векторного индекса.
+
+    Год хранится отсортированным (диапазон - два бинарных поиска), остальные свойства -
+    упакованными битовыми картами по каждому значению. Фильтр возвращает номера строк,
+    и оценивается только прошедшее фильтр подмножество.
+    """
+
+    def __init__(self, paper_ids: list, years: np.ndarray, bitmaps: dict):
+        self.paper_ids = paper_ids
+        self.years = years
+        self.year_order = np.argsort(years, kind="stable")
+        self.sorted_years = years[self.year_order]
+        self.bitmaps = bitmaps
+        self._rows = {paper_id: i for i, paper_id in enumerate(paper_ids)}
+
+    @classmethod
+    def build(cls, paper_ids: list, attributes: dict, properties: list):
+        """attributes: {paper_id: {"year": ..., свойство: значение или список значений}}"""
+        n = len(paper_ids)
+        years = np.full(n, MISSING_YEAR, dtype=np.int32)
+        masks = {prop: {} for prop in properties}
+
+        for row, paper_id in enumerate(paper_ids):
+            paper = attributes.get(paper_id) or {}
+            years[row] = parse_year(paper.get("year"))
+            for prop in properties:
+                values = paper.get(prop)
+                if values is None:
+                    continue
+                for value in values if isinstance(values, list) else [values]:
+                    mask = masks[prop].get(filter_value(value))
+                    if mask is None:
+                        mask = masks[prop][filter_value(value)] = np.zeros(n, dtype=bool)
+                    mask[row] = True
+
+        bitmaps = {
+            prop: {value: np.packbits(mask) for value, mask in values.items()}
+            for prop, values in masks.items()
+        }
+        return cls(paper_ids, years, bitmaps)
+
+    def __contains__(self, paper_id):
+        return paper_id in self._rows
+
+    def validate(self, filters: dict):
+        unknown = [key for key in filters if key not in RANGE_KEYS and key not in self.bitmaps]
+        if unknown:
+            raise ValueError(f"Unsupported filters: {', '.join(unknown)}")
+
+    def rows(self, filters: dict) -> np.ndarray:
+        """Номера строк, удовлетворяющих фильтрам (по возрастанию)"""
+        self.validate(filters)
+
+        year_from = filters.get("year_from")
+        year_to = filters.get("year_to")
+        if year_from is not None or year_to is not None:
+            low = MISSING_YEAR + 1 if year_from is None else int(year_from)
+            start = np.searchsorted(self.sorted_years, low, side="left")
+            stop = (len(self.sorted_years) if year_to is None
+                    else np.searchsorted(self.sorted_years, int(year_to), side="right"))
+            rows = self.year_order[start:stop]
+        else:
+            rows = None
+
+        for prop, value in filters.items():
+            if prop in RANGE_KEYS or value is None:
+                continue
+            bitmap = self.bitmaps[prop].get(filter_value(value))
+            if bitmap is None:
+                return np.empty(0, dtype=np.int64)
+            if rows is None:
+                rows = np.flatnonzero(np.unpackbits(bitmap, count=len(self.paper_ids)))
+            else:
+                # Проверка битов только для уже отобранных строк
+                rows = rows[(bitmap[rows >> 3] >> (7 - (rows & 7))) & 1 == 1]
+
+        if rows is None:
+            return np.arange(len(self.paper_ids))
+        return np.sort(rows)
+
+    def matches(self, paper_id: str, filters: dict) -> bool:
+        """Проверить одну статью (для кандидатов, найденных не векторным поиском)"""
+        self.validate(filters)
+        row = self._rows.get(paper_id)
+        if row is None:
+            return False
+
+        year = self.years[row]
+        year_from = filters.get("year_from")
+        year_to = filters.get("year_to")
+        if (year_from is not None or year_to is not None) and year == MISSING_YEAR:
+            return False
+        if year_from is not None and year < int(year_from):
+            return False
+        if year_to is not None and year > int(year_to):
+            return False
+
+        for prop, value in filters.items():
+            if prop in RANGE_KEYS or value is None:
+                continue
+            bitmap = self.bitmaps[prop].get(filter_value(value))
+            if bitmap is None or not (bitmap[row >> 3] >> (7 - (row & 7))) & 1:
+                return False
+        return True
@@ -0,0 +1,72 @@
+# models/index_files.py
+import json
+import os
+import tempfile
+import uuid
+import numpy as np
+
+
+def temp_path(path: str) -> str:
+    """Уникальный временный файл рядом с path для последующего os.replace: у каждого писателя свой"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp")
+    os.close(fd)
+    return tmp_path
+
+
+def remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_json(path: str, data: dict):
+    """Атомарно заменить JSON-файл"""
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+
+def save_arrays(path: str, arrays: dict) -> dict:
+    """Записать массивы в новые .npy с уникальным суффиксом: {имя: файл}.
+
+    Файлы прежней версии не перезаписываются: открытые через mmap массивы
+    работающего индекса остаются целыми, пока meta.json не переключён на новые.
+    """
+    token = uuid.uuid4().hex[:12]
+    files = {}
+    for name, array in arrays.items():
+        files[name] = f"{name}-{token}.npy"
+        np.save(os.path.join(path, files[name]), array)
+    return files
+
+
+def array_files(meta: dict, names) -> dict:
+    """Файлы массивов из meta.json (в каталогах старого формата - {имя}.npy)"""
+    return meta.get("files") or {name: f"{name}.npy" for name in names}
+
+
+def read_meta(path: str, name: str = "meta.json"):
+    try:
+        with open(os.path.join(path, name), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def replace_meta(path: str, meta: dict, previous: dict = None, name: str = "meta.json"):
+    """Переключить каталог на новые файлы записью meta.json (name), затем удалить файлы прежней версии.
+
+    Удаление безопасно для уже открытых mmap: данные остаются доступны до закрытия отображения.
+    """
+    write_json(os.path.join(path, name), meta)
+    keep = set(meta.get("files", {}).values())
+    for file_name in (previous or {}).values():
+        if file_name not in keep:
+            remove_quietly(os.path.join(path, file_name))
@@ -0,0 +1,151 @@
+# models/index_snapshot.py
+import json
+import os
+import time
+import zlib
+import numpy as np
+from models.vector_index import VectorIndex
+from models.filter_index import AttributeIndex
+from models.index_files import temp_path, remove_quietly
+
+MAGIC = b"RAGSNAP\0"
+# 3 - ключи битовых карт через filter_value (логические значения как в Cypher)
+SNAPSHOT_FORMAT = 3
+ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(path: str, index, watermark: int, properties: list):
+    """Записать снимок точного индекса (матрица, paper_id, фильтры, метка синхронизации) одним файлом.
+
+    Формат: MAGIC, длина заголовка (uint64), JSON-заголовок, выравнивание до 64 байт,
+    матрица float32, годы int32, упакованные битовые карты, paper_id через перевод строки.
+    В заголовке - CRC32 всего, что идёт после выравнивания. Файл пишется во временный файл
+    с уникальным именем и заменяет снимок через os.replace: процессы с общим каталогом
+    данных не пишут в один и тот же файл.
+    """
+    paper_ids = list(index.paper_ids)
+    if any("\n" in paper_id for paper_id in paper_ids):
+        raise ValueError("paper_id with a line break cannot be stored in a snapshot")
+
+    count, dim = len(paper_ids), index.dim
+    attributes = index.attributes
+    bitmaps = []
+    if attributes is not None:
+        bitmaps = [(prop, value, bitmap) for prop, values in attributes.bitmaps.items()
+                   for value, bitmap in values.items()]
+    ids_blob = "\n".join(paper_ids).encode("utf-8")
+
+    header_fields = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": time.time(),
+        "watermark": watermark,
+        "count": count,
+        "dim": dim,
+        "properties": list(properties),
+        "has_attributes": attributes is not None,
+        "bitmaps": [[prop, value] for prop, value, _ in bitmaps],
+        "ids_bytes": len(ids_blob)
+    }
+
+    def encode_header(checksum: int) -> bytes:
+        # Контрольная сумма фиксированной ширины: заголовок переписывается на месте той же длины
+        return json.dumps(dict(header_fields, checksum=f"{checksum:08x}")).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            header = encode_header(0)
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+
+            checksum = 0
+            for start in range(0, count, 65536):
+                chunk = np.ascontiguousarray(index.matrix[start:start + 65536], dtype=np.float32).tobytes()
+                checksum = zlib.crc32(chunk, checksum)
+                f.write(chunk)
+            tail = [ids_blob]
+            if attributes is not None:
+                tail = ([np.ascontiguousarray(attributes.years, dtype=np.int32).tobytes()]
+                        + [np.asarray(bitmap, dtype=np.uint8).tobytes() for _, _, bitmap in bitmaps] + tail)
+            for chunk in tail:
+                checksum = zlib.crc32(chunk, checksum)
+                f.write(chunk)
+
+            f.seek(len(MAGIC) + 8)
+            f.write(encode_header(checksum))
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+
+def load_snapshot(path: str, properties: list):
+    """Загрузить снимок одним чтением файла: (VectorIndex с фильтрами, метка синхронизации).
+
+    Массивы индекса - представления прочитанного буфера, без копирования.
+    ValueError, если формат или набор свойств фильтров не совпадает либо не сходится контрольная сумма.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an index snapshot")
+    header_size = int.from_bytes(data[len(MAGIC):len(MAGIC) + 8], "little")
+    offset = len(MAGIC) + 8
+    header = json.loads(data[offset:offset + header_size])
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported index snapshot format: {header.get('format')}")
+    if header["properties"] != list(properties):
+        raise ValueError("Index snapshot was built for other filter properties")
+
+    count, dim = header["count"], header["dim"]
+    bitmap_bytes = (count + 7) // 8
+    offset = _aligned(offset + header_size)
+    expected = (offset + count * dim * 4 + header["ids_bytes"]
+                + (count * 4 + len(header["bitmaps"]) * bitmap_bytes if header["has_attributes"] else 0))
+    if len(data) != expected:
+        raise ValueError(f"Index snapshot is corrupted: {path} size mismatch")
+    if f"{zlib.crc32(memoryview(data)[offset:]):08x}" != header["checksum"]:
+        raise ValueError(f"Index snapshot is corrupted: {path} checksum mismatch")
+
+    matrix = np.frombuffer(data, dtype=np.float32, count=count * dim, offset=offset).reshape(count, dim)
+    offset += count * dim * 4
+
+    years = bitmaps = None
+    if header["has_attributes"]:
+        years = np.frombuffer(data, dtype=np.int32, count=count, offset=offset)
+        offset += count * 4
+        bitmaps = {prop: {} for prop in properties}
+        for prop, value in header["bitmaps"]:
+            bitmaps[prop][value] = np.frombuffer(data, dtype=np.uint8, count=bitmap_bytes, offset=offset)
+            offset += bitmap_bytes
+
+    ids_blob = data[offset:offset + header["ids_bytes"]].decode("utf-8")
+    paper_ids = ids_blob.split("\n") if count else []
+
+    index = VectorIndex(paper_ids, matrix, normalized=True)
+    if years is not None:
+        index.attributes = AttributeIndex(index.paper_ids, years, bitmaps)
+    return index, header["watermark"]
+
+
+if __name__ == "__main__":
+    from config.settings import settings
+    from services.search_service import SearchService
+
+    # Снимок строится тем же путём, что и при запуске без него (хранилище эмбеддингов или Neo4j)
+    service = SearchService()
+    try:
+        if os.path.exists(settings.INDEX_SNAPSHOT_PATH):
+            os.remove(settings.INDEX_SNAPSHOT_PATH)
+        if service.reload_vector_index() is None:
+            print("No paper embeddings found, index snapshot not written")
+    finally:
+        service.close()
@@ -0,0 +1,270 @@
+# models/quantization.py
+import argparse
+import json
+import os
+import numpy as np
+from models.similarity import normalize_vector, top_k_indices
+from models.index_files import save_arrays, array_files, read_meta, replace_meta
+
+QUANTIZED_VERSION = 1
+
+
+def kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 15, seed: int = 42) -> np.ndarray:
+    """Центроиды k-means (евклидово расстояние)"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, data.shape[0])
+    centroids = data[rng.choice(data.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        distances = (
+            (data ** 2).sum(axis=1, keepdims=True)
+            - 2 * data @ centroids.T
+            + (centroids ** 2).sum(axis=1)
+        )
+        assignment = np.argmin(distances, axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class Float16Codec:
+    """float16: вдвое меньше float32"""
+    name = "float16"
+    # Массивы, строки которых соответствуют векторам (остальные - общие параметры)
+    row_arrays = ("codes",)
+
+    def encode(self, matrix, block_rows: int = 65536) -> dict:
+        return {"codes": np.asarray(matrix, dtype=np.float16)}
+
+    def score(self, data: dict, query: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        codes = data["codes"]
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], block_rows):
+            block = np.asarray(codes[start:start + block_rows], dtype=np.float32)
+            scores[start:start + block.shape[0]] = block @ query
+        return scores
+
+    def params(self) -> dict:
+        return {}
+
+
+class Int8Codec:
+    """Скалярное int8-квантование с масштабом на каждый вектор: вчетверо меньше float32"""
+    name = "int8"
+    row_arrays = ("codes", "scales")
+
+    def encode(self, matrix, block_rows: int = 65536) -> dict:
+        n = matrix.shape[0]
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        scales = np.empty(n, dtype=np.float32)
+        for start in range(0, n, block_rows):
+            block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+            block_scales = np.abs(block).max(axis=1) / 127.0
+            block_scales[block_scales == 0] = 1.0
+            codes[start:start + block.shape[0]] = np.round(block / block_scales[:, None])
+            scales[start:start + block.shape[0]] = block_scales
+        return {"codes": codes, "scales": scales}
+
+    def score(self, data: dict, query: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        codes, scales = data["codes"], data["scales"]
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], block_rows):
+            block = np.asarray(codes[start:start + block_rows], dtype=np.float32)
+            scores[start:start + block.shape[0]] = block @ query
+        return scores * scales
+
+    def params(self) -> dict:
+        return {}
+
+
+class PQCodec:
+    """Product quantization: вектор делится на m подвекторов, каждый кодируется номером центроида (1 байт)"""
+    name = "pq"
+    row_arrays = ("codes",)
+
+    def __init__(self, n_subspaces: int = 64, codebook_size: int = 256):
+        self.n_subspaces = n_subspaces
+        self.codebook_size = codebook_size
+
+    def encode(self, matrix, block_rows: int = 65536, sample_size: int = 50000) -> dict:
+        n, dim = matrix.shape
+        if dim % self.n_subspaces:
+            raise ValueError(f"Dimension {dim} is not divisible by {self.n_subspaces} PQ subspaces")
+        sub_dim = dim // self.n_subspaces
+
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(n, min(n, sample_size), replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        codebooks = np.stack([
+            kmeans(sample[:, j * sub_dim:(j + 1) * sub_dim], self.codebook_size)
+            for j in range(self.n_subspaces)
+        ])
+
+        codes = np.empty((n, self.n_subspaces), dtype=np.uint8)
+        for start in range(0, n, block_rows):
+            block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+            for j in range(self.n_subspaces):
+                sub = block[:, j * sub_dim:(j + 1) * sub_dim]
+                distances = -2 * sub @ codebooks[j].T + (codebooks[j] ** 2).sum(axis=1)
+                codes[start:start + block.shape[0], j] = np.argmin(distances, axis=1)
+        return {"codes": codes, "codebooks": codebooks}
+
+    def score(self, data: dict, query: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        """Асимметричная оценка: таблица скалярных произведений подзапроса с центроидами"""
+        codes, codebooks = data["codes"], data["codebooks"]
+        sub_dim = codebooks.shape[2]
+        table = np.einsum("mkd,md->mk", codebooks, query.reshape(self.n_subspaces, sub_dim))
+        scores = np.zeros(codes.shape[0], dtype=np.float32)
+        subspaces = np.arange(self.n_subspaces)
+        for start in range(0, codes.shape[0], block_rows):
+            block = np.asarray(codes[start:start + block_rows])
+            scores[start:start + block.shape[0]] = table[subspaces, block].sum(axis=1)
+        return scores
+
+    def params(self) -> dict:
+        return {"n_subspaces": self.n_subspaces, "codebook_size": self.codebook_size}
+
+
+CODECS = {"float16": Float16Codec, "int8": Int8Codec, "pq": PQCodec}
+
+
+class QuantizedIndex:
+    """Поиск по сжатым кодам с точным переранжированием лучших кандидатов по полным векторам.
+
+    Полные векторы (обычно np.memmap из EmbeddingStore) читаются только для
+    rerank_depth кандидатов, поэтому в памяти постоянно находятся лишь коды.
+    """
+
+    def __init__(self, paper_ids: list, codec, data: dict, full_vectors=None, rerank_depth: int = 100):
+        self.paper_ids = paper_ids
+        self.codec = codec
+        self.data = data
+        self.full_vectors = full_vectors
+        self.rerank_depth = rerank_depth
+        self.dim = full_vectors.shape[1] if full_vectors is not None else None
+        self._rows = None
+        self.attributes = None
+
+    @classmethod
+    def build(cls, store, codec_name: str, rerank_depth: int = 100, **codec_params):
+        codec = CODECS[codec_name](**codec_params)
+        return cls(store.paper_ids, codec, codec.encode(store.matrix), store.matrix, rerank_depth)
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def memory_bytes(self) -> int:
+        """Объём сжатого представления в байтах"""
+        return sum(array.nbytes for array in self.data.values())
+
+    def search(self, query_embedding, top_k: int = 10, rows=None) -> list:
+        """Найти top-k: оценка по кодам, затем точное переранжирование; rows - подмножество после фильтра"""
+        query = normalize_vector(query_embedding)
+        if not len(self) or not query.any() or (self.dim and query.shape[0] != self.dim):
+            return []
+
+        if rows is None:
+            rows = np.arange(len(self))
+            data = self.data
+        else:
+            data = {
+                name: array[rows] if name in self.codec.row_arrays else array
+                for name, array in self.data.items()
+            }
+
+        approx_scores = self.codec.score(data, query)
+        if self.full_vectors is None:
+            best = top_k_indices(approx_scores, top_k)
+            return [(self.paper_ids[rows[i]], float(approx_scores[i])) for i in best]
+
+        candidates = rows[np.sort(top_k_indices(approx_scores, max(top_k, self.rerank_depth)))]
+        exact_scores = np.asarray(self.full_vectors[candidates], dtype=np.float32) @ query
+        best = top_k_indices(exact_scores, top_k)
+        return [(self.paper_ids[candidates[i]], float(exact_scores[i])) for i in best]
+
+    def row_vectors(self, rows) -> np.ndarray:
+        if self.full_vectors is None:
+            raise ValueError("Quantized index has no full-precision vectors")
+        return np.asarray(self.full_vectors[rows], dtype=np.float32)
+
+    def search_batch(self, query_embeddings: list, top_k: int = 10, **kwargs) -> list:
+        return [
+            self.search(embedding, top_k) if embedding is not None else []
+            for embedding in query_embeddings
+        ]
+
+    def similarity_for(self, query_embedding, paper_ids: list) -> dict:
+        """Точная косинусная схожесть запроса с заданными статьями: {paper_id: similarity}"""
+        if self.full_vectors is None:
+            return {}
+        if self._rows is None:
+            self._rows = {paper_id: i for i, paper_id in enumerate(self.paper_ids)}
+
+        query = normalize_vector(query_embedding)
+        found = [(paper_id, self._rows[paper_id]) for paper_id in paper_ids if paper_id in self._rows]
+        if not found or query.shape[0] != self.dim:
+            return {}
+        rows = np.array([row for _, row in found])
+        scores = np.asarray(self.full_vectors[rows], dtype=np.float32) @ query
+        return {paper_id: float(score) for (paper_id, _), score in zip(found, scores)}
+
+    def save(self, path: str):
+        """Сохранить коды в каталог; полные векторы остаются в хранилище эмбеддингов.
+
+        Массивы пишутся в новые файлы, meta.json переключается последним.
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = read_meta(path)
+        files = save_arrays(path, self.data)
+        replace_meta(path, {
+            "version": QUANTIZED_VERSION,
+            "codec": self.codec.name,
+            "codec_params": self.codec.params(),
+            "arrays": list(self.data),
+            "files": files,
+            "paper_ids": self.paper_ids
+        }, array_files(previous, previous.get("arrays", [])) if previous else None)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path: str, store=None, rerank_depth: int = 100):
+        """Загрузить коды в память; store - EmbeddingStore для переранжирования"""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != QUANTIZED_VERSION:
+            raise ValueError(f"Unsupported quantized index version: {meta.get('version')}")
+        if store is not None and store.paper_ids != meta["paper_ids"]:
+            raise ValueError("Quantized index does not match the embedding store, rebuild it")
+
+        codec = CODECS[meta["codec"]](**meta["codec_params"])
+        files = array_files(meta, meta["arrays"])
+        data = {name: np.load(os.path.join(path, files[name])) for name in meta["arrays"]}
+        full_vectors = store.matrix if store is not None else None
+        return cls(meta["paper_ids"], codec, data, full_vectors, rerank_depth)
+
+
+def main():
+    from config.settings import settings
+    from models.embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(description="Построение сжатого индекса по хранилищу эмбеддингов")
+    parser.add_argument("--codec", choices=sorted(CODECS), default="int8")
+    parser.add_argument("--pq-subspaces", type=int, default=settings.PQ_SUBSPACES)
+    args = parser.parse_args()
+
+    store = EmbeddingStore.open(settings.EMBEDDING_STORE_PATH)
+    params = {"n_subspaces": args.pq_subspaces} if args.codec == "pq" else {}
+    index = QuantizedIndex.build(store, args.codec, rerank_depth=settings.RERANK_DEPTH, **params)
+    index.save(settings.QUANTIZED_INDEX_PATH)
+    full_bytes = store.matrix.shape[0] * store.matrix.shape[1] * 4
+    print(f"Quantized index built: codec={args.codec}, {len(index)} papers, "
+          f"{index.memory_bytes() / 2 ** 20:.1f} MiB ({full_bytes / max(1, index.memory_bytes()):.1f}x smaller than float32)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# models/segmented_index.py
+import heapq
+from collections import namedtuple
+import numpy as np
+from models.vector_index import VectorIndex
+from models.filter_index import AttributeIndex
+from models.sharded_index import release_index, close_index
+
+# Неизменяемое состояние индекса: поиск читает ссылку один раз и не берёт блокировок
+SegmentState = namedtuple("SegmentState", ["base", "delta", "tombstones", "version"])
+
+
+class SegmentRows:
+    """Строки базы и дельты, прошедшие фильтр; len - общее число"""
+
+    def __init__(self, base, delta):
+        self.base = base
+        self.delta = delta
+
+    def __len__(self):
+        return len(self.base) + len(self.delta)
+
+
+class SegmentedIndex:
+    """Базовый индекс и дельта-сегмент изменений из Neo4j.
+
+    Изменённые и удалённые статьи базового сегмента помечаются в tombstones,
+    новые и изменённые векторы попадают в дельту (точный VectorIndex).
+    Обновления строят новое состояние и подменяют ссылку целиком, поэтому
+    поиск идёт без блокировок и не видит частично применённых изменений.
+    """
+
+    def __init__(self, base, filter_properties: list = None):
+        self.filter_properties = filter_properties or []
+        self._state = SegmentState(base, None, frozenset(), 0)
+        # Меняются только в потоке синхронизации
+        self._base_ids = set(base.paper_ids)
+        self._delta_records = {}
+
+    @property
+    def base(self):
+        return self._state.base
+
+    @property
+    def version(self) -> int:
+        """Номер версии корпуса (растёт при каждом применении изменений)"""
+        return self._state.version
+
+    @property
+    def attributes(self):
+        # Фильтры разрешаются отдельно для базы и дельты (см. rows)
+        return self if self._state.base.attributes is not None else None
+
+    @property
+    def paper_ids(self) -> list:
+        state = self._state
+        ids = [paper_id for paper_id in state.base.paper_ids if paper_id not in state.tombstones]
+        if state.delta is not None:
+            ids.extend(state.delta.paper_ids)
+        return ids
+
+    def __len__(self):
+        state = self._state
+        return len(state.base) - len(state.tombstones) + (len(state.delta) if state.delta else 0)
+
+    def delta_size(self) -> int:
+        state = self._state
+        return len(state.tombstones) + (len(state.delta) if state.delta else 0)
+
+    def apply_changes(self, changed: list, deleted: list):
+        """Применить изменения: changed - записи {paper_id, embedding, year, ...}, deleted - paper_id"""
+        state = self._state
+        base_ids = self._base_ids
+
+        records = dict(self._delta_records)
+        tombstones = set(state.tombstones)
+        for paper_id in deleted:
+            records.pop(paper_id, None)
+            if paper_id in base_ids:
+                tombstones.add(paper_id)
+        for paper in changed:
+            paper_id = paper["paper_id"]
+            records[paper_id] = paper
+            if paper_id in base_ids:
+                tombstones.add(paper_id)
+
+        delta = None
+        if records:
+            paper_ids = list(records)
+            delta = VectorIndex(paper_ids, np.array([records[pid]["embedding"] for pid in paper_ids],
+                                                    dtype=np.float32))
+            delta.attributes = AttributeIndex.build(delta.paper_ids, records, self.filter_properties)
+
+        self._delta_records = records
+        self._state = SegmentState(state.base, delta, frozenset(tombstones), state.version + 1)
+
+    def replace_base(self, base):
+        """Подменить базу после компактизации (новая база уже содержит дельту)"""
+        self._base_ids = set(base.paper_ids)
+        self._delta_records = {}
+        self._state = SegmentState(base, None, frozenset(), self._state.version + 1)
+
+    def merged_rows(self):
+        """Итератор (paper_id, вектор) по актуальному содержимому для компактизации"""
+        state = self._state
+        base = state.base
+        keep = [i for i, paper_id in enumerate(base.paper_ids) if paper_id not in state.tombstones]
+        for start in range(0, len(keep), 65536):
+            rows = np.array(keep[start:start + 65536])
+            for row, vector in zip(rows, base.row_vectors(rows)):
+                yield base.paper_ids[row], vector
+        if state.delta is not None:
+            for row, paper_id in enumerate(state.delta.paper_ids):
+                yield paper_id, state.delta.matrix[row]
+
+    def rows(self, filters: dict) -> SegmentRows:
+        """Строки базы и дельты, прошедшие фильтры"""
+        state = self._state
+        base_rows = state.base.attributes.rows(filters)
+        delta_rows = state.delta.attributes.rows(filters) if state.delta is not None else np.empty(0, dtype=np.int64)
+        return SegmentRows(base_rows, delta_rows)
+
+    def matches(self, paper_id: str, filters: dict) -> bool:
+        state = self._state
+        if state.delta is not None and paper_id in state.delta.attributes:
+            return state.delta.attributes.matches(paper_id, filters)
+        if paper_id in state.tombstones:
+            return False
+        return state.base.attributes.matches(paper_id, filters)
+
+    def search(self, query_embedding, top_k: int = 10, rows=None) -> list:
+        """Top-k по базе (без удалённых) и дельте, слияние по схожести"""
+        state = self._state
+        base_rows = rows.base if rows is not None else None
+        delta_rows = rows.delta if rows is not None else None
+
+        # Запрашиваем из базы с запасом на статьи, помеченные удалёнными
+        base_hits = state.base.search(query_embedding, top_k + len(state.tombstones), rows=base_rows)
+        hits = [(paper_id, score) for paper_id, score in base_hits if paper_id not in state.tombstones]
+        if state.delta is not None:
+            hits.extend(state.delta.search(query_embedding, top_k, rows=delta_rows))
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit[1])
+
+    def search_batch(self, query_embeddings: list, top_k: int = 10, **kwargs) -> list:
+        return [
+            self.search(embedding, top_k) if embedding is not None else []
+            for embedding in query_embeddings
+        ]
+
+    def similarity_for(self, query_embedding, paper_ids: list) -> dict:
+        state = self._state
+        similarities = {}
+        if state.delta is not None:
+            similarities.update(state.delta.similarity_for(query_embedding, paper_ids))
+        rest = [pid for pid in paper_ids if pid not in similarities and pid not in state.tombstones]
+        similarities.update(state.base.similarity_for(query_embedding, rest))
+        return similarities
+
+    def release(self):
+        release_index(self._state.base)
+
+    def close(self):
+        close_index(self._state.base)
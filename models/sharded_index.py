@@ -0,0 +1,427 @@
+# models/sharded_index.py
+import heapq
+import itertools
+import multiprocessing as mp
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
+from models.similarity import normalize_vector, normalize_rows, score_matrix, top_k_indices, blocked_top_k
+from utils.metrics import metrics
+
+
+def shard_worker(shm_name: str, shape: tuple, start: int, stop: int, conn):
+    """Процесс шарда: строки [start, stop) общей матрицы, локальный top-k с глобальными номерами строк"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)[start:stop]
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+
+            request_id, (kind, payload) = message
+            try:
+                if kind == "search":
+                    query, top_k, rows = payload
+                    if rows is None:
+                        scores = score_matrix(query, matrix)
+                        indices = top_k_indices(scores, top_k)
+                        result = (indices + start, scores[indices])
+                    else:
+                        scores = matrix[rows - start] @ query
+                        indices = top_k_indices(scores, top_k)
+                        result = (rows[indices], scores[indices])
+                else:
+                    queries, top_k, block_rows, query_block = payload
+                    indices, scores = blocked_top_k(queries, matrix, top_k, block_rows, query_block)
+                    result = (indices + start, scores)
+                conn.send((request_id, result, None))
+            except Exception as e:
+                conn.send((request_id, None, repr(e)))
+    finally:
+        del matrix
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+
+
+class ShardFailure(RuntimeError):
+    """Шарды недоступны: процессы падают снова после перезапусков"""
+
+
+class _Request:
+    def __init__(self, request_id: int, tasks: dict):
+        self.id = request_id
+        self.tasks = tasks
+        self.results = {}
+        self.error = None
+        self.done = threading.Event()
+
+
+class ShardedIndex:
+    """Точный поиск по шардам в пуле процессов.
+
+    Нормализованная матрица лежит в одном блоке multiprocessing.shared_memory,
+    каждый процесс-шард подключается к нему без копирования и считает top-k по
+    своему диапазону строк; координатор сливает отсортированные списки шардов
+    через кучу. Упавший процесс перезапускается с экспоненциальной задержкой, его
+    незавершённые задачи отправляются заново; после max_restarts падений подряд
+    индекс считает в основном процессе по той же общей матрице.
+    """
+
+    def __init__(self, paper_ids: list, embeddings, n_shards: int, timeout: float = 30.0,
+                 max_restarts: int = 5, restart_backoff: float = 0.5):
+        self.paper_ids = list(paper_ids)
+        n = len(self.paper_ids)
+        self.dim = embeddings.shape[1] if n else 0
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.attributes = None
+        self._rows = None
+        self._failure = None
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, n * self.dim * 4))
+        self.matrix = np.ndarray((n, self.dim), dtype=np.float32, buffer=self._shm.buf)
+        for start in range(0, n, 65536):
+            self.matrix[start:start + 65536] = embeddings[start:start + 65536]
+
+        bounds = np.linspace(0, n, max(1, n_shards) + 1).astype(np.int64)
+        self._bounds = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        self._context = mp.get_context("spawn")
+        self._workers = [None] * len(self._bounds)
+        # Упавшие шарды: время следующего перезапуска; число падений подряд (сбрасывается ответом шарда)
+        self._dead = {}
+        self._crashes = [0] * len(self._bounds)
+        # Поиски, идущие по индексу: закрытие после замены индекса ждёт их завершения
+        self._active = 0
+        self._idle = threading.Condition()
+        self._closing = False
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closed = threading.Event()
+
+        for shard in range(len(self._bounds)):
+            self._start_worker(shard)
+        self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+        self._collector.start()
+
+    @classmethod
+    def from_index(cls, index, n_shards: int, timeout: float = 30.0, max_restarts: int = 5):
+        """Разложить нормализованную матрицу VectorIndex по шардам"""
+        return cls(index.paper_ids, index.matrix, n_shards, timeout, max_restarts)
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    @property
+    def n_shards(self) -> int:
+        return len(self._bounds)
+
+    def _start_worker(self, shard: int):
+        start, stop = self._bounds[shard]
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=shard_worker,
+            args=(self._shm.name, self.matrix.shape, start, stop, child_conn),
+            name=f"search-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self._workers[shard] = _Worker(process, parent_conn)
+
+    def _worker_exited(self, shard: int):
+        """Запланировать перезапуск упавшего шарда с экспоненциальной задержкой или отказаться от шардов"""
+        old = self._workers[shard]
+        old.process.join(timeout=1)
+        old.conn.close()
+        self._crashes[shard] += 1
+        crashes = self._crashes[shard]
+        if crashes > self.max_restarts:
+            self._fail(f"search shard {shard} exited {crashes} times in a row (code {old.process.exitcode})")
+            return
+
+        delay = min(30.0, self.restart_backoff * 2 ** (crashes - 1))
+        print(f"Search shard {shard} exited (code {old.process.exitcode}), restarting in {delay:.1f}s")
+        self._dead[shard] = time.monotonic() + delay
+
+    def _fail(self, reason: str):
+        """Остановить перезапуски: дальнейшие поиски идут в основном процессе"""
+        print(f"Sharded search disabled, searching in the main process: {reason}")
+        metrics.inc("fallbacks_total", {"kind": "shards_failed"})
+        self._failure = reason
+        self._dead.clear()
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        with self._lock:
+            for request in self._pending.values():
+                request.error = reason
+                request.done.set()
+
+    def _restart_worker(self, shard: int):
+        """Перезапустить упавший шард и повторить его незавершённые задачи"""
+        metrics.inc("shard_restarts_total", {"shard": str(shard)})
+        self._start_worker(shard)
+
+        with self._lock:
+            retry = [(request.id, request.tasks[shard]) for request in self._pending.values()
+                     if shard in request.tasks and shard not in request.results]
+        for request_id, task in retry:
+            self._send(shard, request_id, task)
+
+    def _send(self, shard: int, request_id: int, task: tuple):
+        worker = self._workers[shard]
+        with worker.send_lock:
+            try:
+                worker.conn.send((request_id, task))
+            except OSError:
+                # Процесс упал: задача уйдёт повторно после перезапуска
+                pass
+
+    def _collect(self):
+        """Поток координатора: результаты шардов, обнаружение и перезапуск упавших процессов"""
+        while not self._closed.is_set() and self._failure is None:
+            now = time.monotonic()
+            for shard, restart_at in list(self._dead.items()):
+                if restart_at <= now:
+                    del self._dead[shard]
+                    try:
+                        self._restart_worker(shard)
+                    except Exception as e:
+                        print(f"Error restarting search shard {shard}: {e}")
+                        self._worker_exited(shard)
+
+            conns = {worker.conn: shard for shard, worker in enumerate(self._workers) if shard not in self._dead}
+            if not conns:
+                self._closed.wait(0.5)
+                continue
+            for conn in wait(list(conns), timeout=0.5):
+                shard = conns[conn]
+                try:
+                    request_id, result, error = conn.recv()
+                except (EOFError, OSError):
+                    if not self._closed.is_set():
+                        self._worker_exited(shard)
+                    continue
+
+                self._crashes[shard] = 0
+                with self._lock:
+                    request = self._pending.get(request_id)
+                    if request is None:
+                        continue
+                    if error is not None:
+                        request.error = error
+                    else:
+                        request.results[shard] = result
+                    if error is not None or len(request.results) == len(request.tasks):
+                        request.done.set()
+
+    def _run(self, tasks: dict) -> dict:
+        """Разослать задачи шардам и дождаться всех ответов: {shard: результат}"""
+        if self._closed.is_set():
+            raise RuntimeError("Sharded index is closed")
+        if self._failure is not None:
+            raise ShardFailure(self._failure)
+        if not tasks:
+            return {}
+
+        with self._lock:
+            request = _Request(next(self._ids), tasks)
+            self._pending[request.id] = request
+        try:
+            for shard, task in tasks.items():
+                self._send(shard, request.id, task)
+            if not request.done.wait(self.timeout):
+                raise TimeoutError(f"Shard search timed out after {self.timeout}s")
+            if request.error is not None:
+                if self._failure is not None:
+                    raise ShardFailure(self._failure)
+                raise RuntimeError(f"Shard search failed: {request.error}")
+            return request.results
+        finally:
+            with self._lock:
+                self._pending.pop(request.id, None)
+
+    def _merge(self, shard_hits: list, top_k: int) -> list:
+        """Слияние отсортированных по убыванию списков шардов через кучу"""
+        merged = heapq.merge(*(zip(scores.tolist(), indices.tolist()) for indices, scores in shard_hits),
+                             key=lambda hit: -hit[0])
+        return [(self.paper_ids[row], score) for score, row in islice(merged, top_k)]
+
+    @contextmanager
+    def _use(self):
+        """Учёт идущих поисков: release() закрывает индекс только после их завершения"""
+        with self._idle:
+            if self._closing:
+                raise RuntimeError("Sharded index is closed")
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def search(self, query_embedding, top_k: int = 10, rows=None) -> list:
+        """Найти top-k статей: список пар (paper_id, similarity); rows - подмножество строк после фильтра"""
+        if not len(self) or top_k <= 0:
+            return []
+
+        query = normalize_vector(query_embedding)
+        if query.shape[0] != self.dim or not query.any():
+            return []
+
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+
+        with self._use(), metrics.timed("shard_search"):
+            if self._failure is None:
+                tasks = {}
+                for shard, (start, stop) in enumerate(self._bounds):
+                    shard_rows = None
+                    if rows is not None:
+                        shard_rows = rows[(rows >= start) & (rows < stop)]
+                        if not len(shard_rows):
+                            continue
+                    tasks[shard] = ("search", (query, top_k, shard_rows))
+                try:
+                    results = self._run(tasks)
+                    return self._merge([results[shard] for shard in sorted(results)], top_k)
+                except ShardFailure:
+                    pass
+            return self._search_local(query, top_k, rows)
+
+    def _search_local(self, query: np.ndarray, top_k: int, rows=None) -> list:
+        """Точный поиск в основном процессе по общей матрице (шарды недоступны)"""
+        if rows is None:
+            scores = score_matrix(query, self.matrix)
+            return [(self.paper_ids[i], float(scores[i])) for i in top_k_indices(scores, top_k)]
+        scores = self.matrix[rows] @ query
+        return [(self.paper_ids[rows[i]], float(scores[i])) for i in top_k_indices(scores, top_k)]
+
+    def search_batch(self, query_embeddings: list, top_k: int = 10,
+                     block_rows: int = 16384, query_block: int = 256) -> list:
+        """Top-k для многих запросов: каждый шард считает свой блок, затем слияние по запросам"""
+        results = [[] for _ in query_embeddings]
+        valid = [
+            i for i, embedding in enumerate(query_embeddings)
+            if embedding is not None and len(embedding) == self.dim and any(embedding)
+        ]
+        if not len(self) or not valid or top_k <= 0:
+            return results
+
+        queries = normalize_rows([query_embeddings[i] for i in valid])
+        with self._use(), metrics.timed("shard_search", batch="true"):
+            ordered = None
+            if self._failure is None:
+                task = ("batch", (queries, top_k, block_rows, query_block))
+                try:
+                    shard_results = self._run({shard: task for shard in range(self.n_shards)})
+                    ordered = [shard_results[shard] for shard in range(self.n_shards)]
+                except ShardFailure:
+                    pass
+            if ordered is None:
+                ordered = [blocked_top_k(queries, self.matrix, top_k, block_rows, query_block)]
+            for row, i in enumerate(valid):
+                results[i] = self._merge([(indices[row], scores[row]) for indices, scores in ordered], top_k)
+        return results
+
+    def row_vectors(self, rows) -> np.ndarray:
+        """Нормализованные векторы заданных строк"""
+        with self._use():
+            return np.array(self.matrix[rows], dtype=np.float32)
+
+    def similarity_for(self, query_embedding, paper_ids: list) -> dict:
+        """Косинусная схожесть запроса с заданными статьями: {paper_id: similarity}"""
+        if self._rows is None:
+            self._rows = {paper_id: i for i, paper_id in enumerate(self.paper_ids)}
+
+        query = normalize_vector(query_embedding)
+        if query.shape[0] != self.dim or not query.any():
+            return {}
+
+        found = [(paper_id, self._rows[paper_id]) for paper_id in paper_ids if paper_id in self._rows]
+        if not found:
+            return {}
+        with self._use():
+            scores = self.matrix[np.array([row for _, row in found])] @ query
+        return {paper_id: float(score) for (paper_id, _), score in zip(found, scores)}
+
+    def release(self, grace: float = 5.0):
+        """Закрыть заменённый индекс в фоне: через grace секунд и после завершения начатых на нём поисков"""
+        threading.Thread(target=self._close_when_idle, args=(grace,), name="shard-release", daemon=True).start()
+
+    def _close_when_idle(self, grace: float):
+        # Ссылку на старый индекс поток мог взять до замены - даём ему время начать поиск
+        if self._closed.wait(grace):
+            return
+        with self._idle:
+            if not self._idle.wait_for(lambda: self._active == 0, timeout=self.timeout):
+                print(f"Closing sharded index with {self._active} searches still running")
+        self.close()
+
+    def close(self):
+        """Остановить процессы шардов и освободить общую память"""
+        with self._idle:
+            if self._closing:
+                return
+            self._closing = True
+            # Поиски, начатые до закрытия, дочитывают матрицу до конца
+            self._idle.wait_for(lambda: self._active == 0, timeout=self.timeout)
+        self._closed.set()
+        self._collector.join(timeout=5)
+
+        for worker in self._workers:
+            with worker.send_lock:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+
+        with self._lock:
+            for request in self._pending.values():
+                request.error = "index closed"
+                request.done.set()
+
+        # Представления буфера должны быть освобождены до закрытия блока
+        self.matrix = np.empty((0, self.dim), dtype=np.float32)
+        try:
+            self._shm.close()
+        except BufferError as e:
+            print(f"Error closing shared memory of sharded index: {e}")
+        self._shm.unlink()
+
+
+def release_index(index):
+    """Освободить ресурсы заменённого индекса (процессы шардов), когда завершатся начатые на нём поиски;
+    обычным индексам в памяти это не нужно"""
+    release = getattr(index, "release", None) or getattr(index, "close", None)
+    if release is not None:
+        release()
+
+
+def close_index(index):
+    """Сразу освободить ресурсы индекса (завершение работы сервиса)"""
+    close = getattr(index, "close", None)
+    if close is not None:
+        close()
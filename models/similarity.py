@@ -17,4 +17,119 @@ def calculate_cosine_similarity(vec1: list, vec2: list) -> float:
     if norm1 == 0 or norm2 == 0:
         return 0.0
 
-    return dot_product / (norm1 * norm2)
\ No newline at end of file
+    return dot_product / (norm1 * norm2)
+
+
+def normalize_vector(vec) -> np.ndarray:
+    """Нормализовать вектор к единичной длине (float32); нулевой вектор возвращается как есть"""
+    v = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    if norm == 0:
+        return v
+    return v / norm
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Нормализовать строки матрицы к единичной длине (float32)"""
+    m = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def score_matrix(query: np.ndarray, matrix, block_rows: int = 65536) -> np.ndarray:
+    """Скалярные произведения запроса со строками матрицы (в т.ч. np.memmap) поблочно"""
+    n = matrix.shape[0]
+    scores = np.empty(n, dtype=np.float32)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        np.dot(matrix[start:stop], query, out=scores[start:stop])
+    return scores
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Индексы top-k наибольших значений в порядке убывания (argpartition + сортировка кандидатов)"""
+    n = scores.shape[0]
+    if top_k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k >= n:
+        return np.argsort(-scores)
+
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def cosine_similarity_matrix(vectors1, vectors2) -> np.ndarray:
+    """Матрица косинусных схожестей «многие ко многим»: [len(vectors1), len(vectors2)]"""
+    m1 = normalize_rows(np.atleast_2d(np.asarray(vectors1, dtype=np.float32)))
+    m2 = normalize_rows(np.atleast_2d(np.asarray(vectors2, dtype=np.float32)))
+    return m1 @ m2.T
+
+
+def blocked_top_k(queries: np.ndarray, matrix, top_k: int,
+                  block_rows: int = 16384, query_block: int = 256):
+    """Top-k строк матрицы для каждого запроса поблочным умножением матриц.
+
+    queries и matrix должны быть нормализованы. Память ограничена блоком
+    query_block x block_rows оценок. Возвращает (индексы, оценки) формы [n_queries, k].
+    """
+    n_queries, n_rows = queries.shape[0], matrix.shape[0]
+    k = min(top_k, n_rows)
+    all_indices = np.empty((n_queries, k), dtype=np.int64)
+    all_scores = np.empty((n_queries, k), dtype=np.float32)
+    if k <= 0:
+        return all_indices, all_scores
+
+    for q_start in range(0, n_queries, query_block):
+        q_block = queries[q_start:q_start + query_block]
+        best_indices = np.empty((q_block.shape[0], 0), dtype=np.int64)
+        best_scores = np.empty((q_block.shape[0], 0), dtype=np.float32)
+
+        for start in range(0, n_rows, block_rows):
+            block_scores = q_block @ np.asarray(matrix[start:start + block_rows]).T
+            block_indices = np.broadcast_to(
+                np.arange(start, start + block_scores.shape[1]), block_scores.shape
+            )
+            # Слияние с текущими лучшими: оставляем k максимальных в каждой строке
+            scores = np.concatenate([best_scores, block_scores], axis=1)
+            indices = np.concatenate([best_indices, block_indices], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                indices = np.take_along_axis(indices, keep, axis=1)
+            best_scores, best_indices = scores, indices
+
+        order = np.argsort(-best_scores, axis=1)
+        all_scores[q_start:q_start + q_block.shape[0]] = np.take_along_axis(best_scores, order, axis=1)
+        all_indices[q_start:q_start + q_block.shape[0]] = np.take_along_axis(best_indices, order, axis=1)
+
+    return all_indices, all_scores
+
+
+_hyperplanes = {}
+
+
+def lsh_bucket(vec, bits: int = 16, seed: int = 42) -> str:
+    """Корзина вектора по знакам проекций на случайные гиперплоскости (SimHash).
+
+    Близкие по косинусу векторы с высокой вероятностью попадают в одну корзину.
+    """
+    v = np.asarray(vec, dtype=np.float32)
+    key = (v.shape[0], bits, seed)
+    planes = _hyperplanes.get(key)
+    if planes is None:
+        planes = np.random.default_rng(seed).standard_normal((bits, v.shape[0])).astype(np.float32)
+        _hyperplanes[key] = planes
+
+    signs = (planes @ v) >= 0
+    return format(int("".join("1" if s else "0" for s in signs), 2), f"0{(bits + 3) // 4}x")
+
+
+def reciprocal_rank_fusion(rankings: list, weights: list = None, k: int = 60) -> list:
+    """Объединить ранжированные списки id методом reciprocal rank fusion: [(id, score), ...]"""
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item_id in enumerate(ranking, 1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
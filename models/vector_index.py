@@ -0,0 +1,102 @@
+# models/vector_index.py
+import numpy as np
+from models.similarity import normalize_vector, normalize_rows, score_matrix, top_k_indices, blocked_top_k
+
+
+class VectorIndex:
+    """Векторный индекс в памяти: нормализованная матрица float32 и top-k одним умножением"""
+
+    def __init__(self, paper_ids: list, embeddings, normalized: bool = False):
+        if normalized:
+            # Строки уже нормализованы (например, np.memmap из EmbeddingStore) - без копирования
+            self.paper_ids = list(paper_ids)
+            self.matrix = embeddings
+            self.dim = embeddings.shape[1]
+            self._rows = None
+            self.attributes = None
+            return
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(paper_ids), -1)
+
+        # Статьи с нулевым эмбеддингом не участвуют в поиске (как norm1 > 0 в Cypher)
+        norms = np.linalg.norm(matrix, axis=1)
+        keep = norms > 0
+
+        self.paper_ids = [pid for pid, k in zip(paper_ids, keep) if k]
+        self.matrix = np.ascontiguousarray(normalize_rows(matrix[keep]))
+        self.dim = self.matrix.shape[1] if self.matrix.size else 0
+        self._rows = None
+        # AttributeIndex для фильтров по метаданным (выровнен по строкам матрицы)
+        self.attributes = None
+
+    @classmethod
+    def from_neo4j(cls, neo4j_client):
+        """Построить индекс по эмбеддингам из Neo4j"""
+        paper_ids, embeddings = neo4j_client.get_all_embeddings()
+        if not paper_ids:
+            return cls([], np.empty((0, 0), dtype=np.float32))
+        return cls(paper_ids, embeddings)
+
+    @classmethod
+    def from_store(cls, store):
+        """Индекс поверх EmbeddingStore: матрица остаётся отображённой в память"""
+        return cls(store.paper_ids, store.matrix, normalized=True)
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def search(self, query_embedding, top_k: int = 10, rows=None) -> list:
+        """Найти top-k статей: список пар (paper_id, similarity); rows - подмножество строк после фильтра"""
+        if not len(self):
+            return []
+
+        query = normalize_vector(query_embedding)
+        if query.shape[0] != self.dim or not query.any():
+            return []
+
+        if rows is not None:
+            scores = np.asarray(self.matrix[rows]) @ query
+            return [(self.paper_ids[rows[i]], float(scores[i])) for i in top_k_indices(scores, top_k)]
+
+        scores = score_matrix(query, self.matrix)
+        indices = top_k_indices(scores, top_k)
+        return [(self.paper_ids[i], float(scores[i])) for i in indices]
+
+    def row_vectors(self, rows) -> np.ndarray:
+        """Нормализованные векторы заданных строк"""
+        return np.asarray(self.matrix[rows], dtype=np.float32)
+
+    def search_batch(self, query_embeddings: list, top_k: int = 10,
+                     block_rows: int = 16384, query_block: int = 256) -> list:
+        """Top-k для многих запросов одним поблочным умножением матриц"""
+        results = [[] for _ in query_embeddings]
+        valid = [
+            i for i, embedding in enumerate(query_embeddings)
+            if embedding is not None and len(embedding) == self.dim and any(embedding)
+        ]
+        if not len(self) or not valid:
+            return results
+
+        queries = normalize_rows([query_embeddings[i] for i in valid])
+        indices, scores = blocked_top_k(queries, self.matrix, top_k, block_rows, query_block)
+        for row, i in enumerate(valid):
+            results[i] = [(self.paper_ids[j], float(score)) for j, score in zip(indices[row], scores[row])]
+        return results
+
+    def similarity_for(self, query_embedding, paper_ids: list) -> dict:
+        """Косинусная схожесть запроса с заданными статьями: {paper_id: similarity}"""
+        if self._rows is None:
+            self._rows = {paper_id: i for i, paper_id in enumerate(self.paper_ids)}
+
+        query = normalize_vector(query_embedding)
+        if query.shape[0] != self.dim or not query.any():
+            return {}
+
+        found = [(paper_id, self._rows[paper_id]) for paper_id in paper_ids if paper_id in self._rows]
+        if not found:
+            return {}
+        rows = np.array([row for _, row in found])
+        scores = self.matrix[rows] @ query
+        return {paper_id: float(score) for (paper_id, _), score in zip(found, scores)}
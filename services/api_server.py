@@ -0,0 +1,269 @@
+# services/api_server.py
+import argparse
+import asyncio
+import json
+import time
+from functools import partial
+from aiohttp import web
+from database.async_neo4j_client import AsyncNeo4jClient
+from services.resources import get_search_service
+from utils.async_llm import AsyncLLM
+from utils.query_cache import get_query_cache
+from utils.metrics import metrics
+from config.settings import settings
+
+json_response = partial(web.json_response, dumps=partial(json.dumps, ensure_ascii=False, default=str))
+
+
+class SearchAPI:
+    """Асинхронные операции поиска для API-сервера.
+
+    Индексы (векторный, BM25) и кэши берутся из общего SearchService,
+    ввод-вывод идёт через асинхронные клиенты Neo4j и Mistral,
+    вычисления по индексам - в пуле потоков.
+    """
+
+    def __init__(self, search_service, neo4j_client: AsyncNeo4jClient = None, llm: AsyncLLM = None):
+        self.search_service = search_service
+        self.neo4j_client = neo4j_client or AsyncNeo4jClient()
+        self.llm = llm or AsyncLLM()
+
+    async def vector_search(self, query: str, top_k: int = 10, filters: dict = None, summarize: bool = True) -> list:
+        with metrics.timed("search", mode="vector", server="api"):
+            return await self._vector_search(query, top_k, filters, summarize)
+
+    async def _vector_search(self, query: str, top_k: int = 10, filters: dict = None, summarize: bool = True) -> list:
+        query_embedding = await self.llm.embed(query)
+
+        # Кэш близких запросов - numpy по слотам и deepcopy под блокировкой: вне цикла событий
+        query_cache = get_query_cache()
+        cached = await asyncio.to_thread(query_cache.get, query_embedding, top_k, filters) if query_cache else None
+        if cached is not None:
+            results = await asyncio.to_thread(self.search_service.rescore_cached, cached, query_embedding)
+        else:
+            vector_index = await asyncio.to_thread(self.search_service.get_vector_index)
+            results = await self.neo4j_client.find_similar_papers(
+                query_embedding, top_k, index=vector_index, filters=filters
+            )
+            await self.attach_connections(results)
+            self.search_service.annotate_similarity(results)
+            if query_cache is not None:
+                await asyncio.to_thread(query_cache.put, query_embedding, top_k, filters, results)
+
+        if summarize:
+            return await self.enhance_results(results, query, query_embedding)
+        return results
+
+    async def hybrid_search(self, query: str, top_k: int = 10, filters: dict = None, summarize: bool = True) -> list:
+        with metrics.timed("search", mode="hybrid", server="api"):
+            return await self._hybrid_search(query, top_k, filters, summarize)
+
+    async def _hybrid_search(self, query: str, top_k: int = 10, filters: dict = None, summarize: bool = True) -> list:
+        bm25_index = await asyncio.to_thread(self.search_service.get_bm25_index)
+        if bm25_index is None:
+            return await self._vector_search(query, top_k, filters, summarize)
+
+        service = self.search_service
+        query_embedding = await self.llm.embed(query)
+        depth = max(top_k, settings.HYBRID_CANDIDATE_DEPTH)
+        vector_index = await asyncio.to_thread(service.get_vector_index)
+
+        vector_results, lexical_hits = await asyncio.gather(
+            self.neo4j_client.find_similar_papers(query_embedding, depth, index=vector_index, filters=filters),
+            asyncio.to_thread(service.lexical_search, bm25_index, query, depth, filters)
+        )
+        fused = service.fuse_rankings(vector_results, lexical_hits, top_k)
+        papers = {r['paper_id']: r for r in vector_results}
+        lexical_only = [paper_id for paper_id, _ in fused if paper_id not in papers]
+        if lexical_only:
+            papers.update(await self.neo4j_client.get_papers_by_ids(lexical_only))
+        results = service.assemble_hybrid(fused, papers, lexical_only, lexical_hits, query_embedding)
+
+        await self.attach_connections(results)
+        service.annotate_similarity(results)
+        if summarize:
+            return await self.enhance_results(results, query, query_embedding)
+        return results
+
+    async def attach_connections(self, results: list):
+        if not settings.GRAPH_EXPANSION_ENABLED or not results:
+            return
+        try:
+            expanded = await self.search_service.graph_expander.expand_async(
+                self.neo4j_client, [r['paper_id'] for r in results if r.get('paper_id')]
+            )
+        except Exception as e:
+            print(f"Error expanding graph: {e}")
+            return
+
+        for result in results:
+            if result.get('paper_id') in expanded:
+                result['connections'] = self.search_service.enhance_connections(expanded[result['paper_id']])
+
+    async def get_connections(self, paper_id: str) -> list:
+        expanded = await self.search_service.graph_expander.expand_async(self.neo4j_client, [paper_id])
+        return self.search_service.enhance_connections(expanded.get(paper_id, []))
+
+    async def enhance_results(self, results: list, query: str, query_embedding: list) -> list:
+        """Описания: пакетный анализ, затем по одной статье для пропущенных (не более
+        API_REQUEST_CONCURRENCY одновременных обращений к LLM на запрос)"""
+        service = self.search_service
+        analyses = {}
+        if settings.SUMMARY_MODE == "batch":
+            analyses = await self.llm.analyze_papers(
+                results, query, query_embedding, timeout=settings.SUMMARY_BATCH_TIMEOUT,
+                deadline=time.monotonic() + settings.SUMMARY_BATCH_TIMEOUT
+            )
+
+        limit = asyncio.Semaphore(max(1, settings.API_REQUEST_CONCURRENCY))
+
+        async def enhance(result: dict) -> dict:
+            if 'summary' in result:
+                return result
+            analysis = analyses.get(result.get('paper_id'))
+            if analysis is not None:
+                return service.apply_analysis(dict(result), analysis)
+
+            async with limit:
+                try:
+                    summary = await asyncio.wait_for(
+                        self.llm.paper_summary(result, query, query_embedding, timeout=settings.SUMMARY_TIMEOUT,
+                                               deadline=time.monotonic() + settings.SUMMARY_TIMEOUT),
+                        settings.SUMMARY_TIMEOUT
+                    )
+                except Exception as e:
+                    print(f"Summary for {result.get('paper_id')} not ready: {e!r}")
+                    metrics.inc("fallbacks_total", {"kind": "summary_timeout"})
+                    return service.fallback_enhancement(result)
+            return dict(result, summary=summary)
+
+        return list(await asyncio.gather(*(enhance(result) for result in results)))
+
+    async def get_stats(self) -> dict:
+        try:
+            stats = await self.neo4j_client.get_stats()
+        except Exception as e:
+            print(f"Error getting stats: {e}")
+            stats = {"paper_count": 0}
+
+        query_cache = get_query_cache()
+        if query_cache is not None:
+            stats["query_cache"] = query_cache.stats()
+        stats["coalescing"] = self.llm.flights.stats()
+        return stats
+
+    async def close(self):
+        await self.neo4j_client.close()
+        await self.llm.close()
+
+
+def parse_search_request(body: dict) -> tuple:
+    """Проверить тело запроса поиска: (query, top_k, filters, summarize); ValueError при ошибке"""
+    if not isinstance(body, dict):
+        raise ValueError("request body must be a JSON object")
+    query = body.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("'query' must be a non-empty string")
+    top_k = body.get("top_k", 10)
+    # bool - подкласс int: {"top_k": true} не должен превращаться в top_k=1
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= settings.API_MAX_TOP_K:
+        raise ValueError(f"'top_k' must be an integer between 1 and {settings.API_MAX_TOP_K}")
+    filters = body.get("filters")
+    if filters is not None and not isinstance(filters, dict):
+        raise ValueError("'filters' must be an object")
+    return query, top_k, filters or None, bool(body.get("summarize", True))
+
+
+# Пробы живости и сбор метрик не занимают слоты: под нагрузкой они нужнее всего
+UNLIMITED_PATHS = {"/health", "/metrics"}
+
+
+@web.middleware
+async def concurrency_limit(request, handler):
+    """Глобальный лимит одновременных запросов: ожидание слота ограничено API_QUEUE_TIMEOUT"""
+    if request.path in UNLIMITED_PATHS:
+        return await handler(request)
+    slots = request.app["slots"]
+    try:
+        await asyncio.wait_for(slots.acquire(), settings.API_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return json_response({"error": "server is busy"}, status=503)
+    try:
+        return await handler(request)
+    finally:
+        slots.release()
+
+
+async def handle_search(request):
+    try:
+        query, top_k, filters, summarize = parse_search_request(await request.json())
+    except ValueError as e:
+        return json_response({"error": str(e)}, status=400)
+
+    api = request.app["api"]
+    search = api.hybrid_search if request.match_info["mode"] == "hybrid" else api.vector_search
+    try:
+        results = await search(query, top_k, filters, summarize)
+    except Exception as e:
+        print(f"Error in API search: {e}")
+        return json_response({"error": "search failed"}, status=500)
+    return json_response({"query": query, "results": results})
+
+
+async def handle_connections(request):
+    try:
+        connections = await request.app["api"].get_connections(request.match_info["paper_id"])
+    except Exception as e:
+        print(f"Error getting connections: {e}")
+        return json_response({"error": "connections unavailable"}, status=500)
+    return json_response({"paper_id": request.match_info["paper_id"], "connections": connections})
+
+
+async def handle_stats(request):
+    return json_response(await request.app["api"].get_stats())
+
+
+async def handle_metrics(request):
+    return web.Response(body=metrics.render_prometheus().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def handle_health(request):
+    return json_response({"status": "ok"})
+
+
+async def on_startup(app):
+    # Индексы загружаются до приёма запросов, чтобы первые запросы не ждали загрузки
+    await asyncio.to_thread(app["api"].search_service.get_vector_index)
+    await asyncio.to_thread(app["api"].search_service.get_bm25_index)
+
+
+async def on_cleanup(app):
+    await app["api"].close()
+
+
+def create_app(api: SearchAPI = None) -> web.Application:
+    app = web.Application(middlewares=[concurrency_limit])
+    app["api"] = api or SearchAPI(get_search_service())
+    app["slots"] = asyncio.Semaphore(max(1, settings.API_MAX_CONCURRENT_REQUESTS))
+    app.router.add_post("/search/{mode:vector|hybrid}", handle_search)
+    app.router.add_get("/papers/{paper_id}/connections", handle_connections)
+    app.router.add_get("/stats", handle_stats)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API поиска статей")
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    args = parser.parse_args()
+
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# services/graph_expansion.py
+from utils.cache import LRUCache
+from config.settings import settings
+
+
+class GraphExpander:
+    """Расширение результатов поиска соседями в графе: один запрос к Neo4j на уровень глубины"""
+
+    def __init__(self, neo4j_client, cache_size: int = None, cache_ttl: float = None):
+        self.neo4j_client = neo4j_client
+        cache_size = settings.GRAPH_CACHE_SIZE if cache_size is None else cache_size
+        cache_ttl = settings.GRAPH_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.cache = LRUCache(cache_size, ttl=cache_ttl)
+
+    def get_adjacency(self, paper_ids: list, fan_out: int) -> dict:
+        """Соседи статей: из кэша, недостающие - одним UNWIND-запросом"""
+        adjacency, missing = self._cached_adjacency(paper_ids, fan_out)
+        if missing:
+            self._store_adjacency(adjacency, missing, self.neo4j_client.get_adjacency(missing, fan_out), fan_out)
+        return adjacency
+
+    async def get_adjacency_async(self, async_client, paper_ids: list, fan_out: int) -> dict:
+        """То же через асинхронный клиент (кэш общий с синхронным путём)"""
+        adjacency, missing = self._cached_adjacency(paper_ids, fan_out)
+        if missing:
+            self._store_adjacency(adjacency, missing, await async_client.get_adjacency(missing, fan_out), fan_out)
+        return adjacency
+
+    def _cached_adjacency(self, paper_ids: list, fan_out: int):
+        adjacency = {}
+        missing = []
+        for paper_id in dict.fromkeys(paper_ids):
+            neighbors = self.cache.get((paper_id, fan_out))
+            if neighbors is None:
+                missing.append(paper_id)
+            else:
+                adjacency[paper_id] = neighbors
+        return adjacency, missing
+
+    def _store_adjacency(self, adjacency: dict, missing: list, fetched: dict, fan_out: int):
+        for paper_id in missing:
+            neighbors = fetched.get(paper_id, [])
+            self.cache.put((paper_id, fan_out), neighbors)
+            adjacency[paper_id] = neighbors
+
+    def expand(self, paper_ids: list, depth: int = None, fan_out: int = None) -> dict:
+        """Окрестности статей до заданной глубины: {paper_id: [связанные статьи]}"""
+        fan_out = settings.GRAPH_FAN_OUT if fan_out is None else fan_out
+        steps = self._expand_steps(paper_ids, depth, fan_out)
+        try:
+            nodes = next(steps)
+            while True:
+                nodes = steps.send(self.get_adjacency(nodes, fan_out))
+        except StopIteration as done:
+            return done.value
+
+    async def expand_async(self, async_client, paper_ids: list, depth: int = None, fan_out: int = None) -> dict:
+        """То же, что expand, с запросами через асинхронный клиент"""
+        fan_out = settings.GRAPH_FAN_OUT if fan_out is None else fan_out
+        steps = self._expand_steps(paper_ids, depth, fan_out)
+        try:
+            nodes = next(steps)
+            while True:
+                nodes = steps.send(await self.get_adjacency_async(async_client, nodes, fan_out))
+        except StopIteration as done:
+            return done.value
+
+    def _expand_steps(self, paper_ids: list, depth: int, fan_out: int):
+        """Обход в ширину без ввода-вывода: отдаёт узлы уровня, получает их смежность, возвращает окрестности"""
+        depth = settings.GRAPH_EXPANSION_DEPTH if depth is None else depth
+
+        connections = {paper_id: [] for paper_id in paper_ids}
+        visited = {paper_id: {paper_id} for paper_id in paper_ids}
+        frontier = {paper_id: [paper_id] for paper_id in paper_ids}
+
+        for hops in range(1, depth + 1):
+            nodes = [node for seed_nodes in frontier.values() for node in seed_nodes]
+            if not nodes:
+                break
+
+            adjacency = yield nodes
+            next_frontier = {}
+            for seed, seed_nodes in frontier.items():
+                for node in seed_nodes:
+                    for neighbor in adjacency.get(node, []):
+                        if neighbor["paper_id"] in visited[seed]:
+                            continue
+                        visited[seed].add(neighbor["paper_id"])
+                        connection = dict(neighbor, hops=hops)
+                        if hops > 1:
+                            connection["via"] = node
+                        connections[seed].append(connection)
+                        next_frontier.setdefault(seed, []).append(neighbor["paper_id"])
+            frontier = next_frontier
+
+        return connections
+
+    def invalidate(self, paper_ids: list = None):
+        """Сбросить кэш смежности: целиком или для указанных статей и статей, в чьих соседях они есть.
+
+        Соседей новой статьи, ещё не попавшей ни в один список, по id не найти - их обновит GRAPH_CACHE_TTL.
+        """
+        if paper_ids is None:
+            self.cache.clear()
+            return
+        changed = set(paper_ids)
+        self.cache.remove_if(lambda key, neighbors: key[0] in changed
+                             or any(neighbor["paper_id"] in changed for neighbor in neighbors))
@@ -0,0 +1,89 @@
+# services/index_sync.py
+import threading
+from models.sharded_index import release_index
+from config.settings import settings
+
+
+class IndexSyncer:
+    """Фоновая инкрементальная синхронизация индекса с Neo4j по меткам изменений"""
+
+    def __init__(self, search_service, index, watermark: int, interval: float = None):
+        self.search_service = search_service
+        self.index = index
+        self.watermark = watermark or 0
+        self.interval = settings.INDEX_SYNC_INTERVAL if interval is None else interval
+        # Применённые изменения в окне перечитывания (запрос изменений захватывает INDEX_SYNC_OVERLAP до метки)
+        self._applied = set()
+        # Версия рёбер SIMILAR: их запись не меняет updated_at, поэтому отслеживается отдельно
+        self._edges_version = self._read_edges_version()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="index-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync_once()
+            except Exception as e:
+                print(f"Error syncing index: {e}")
+
+    def _read_edges_version(self):
+        try:
+            return self.search_service.neo4j_client.get_similar_edges_version()
+        except Exception as e:
+            print(f"Error reading similar edges version: {e}")
+            return None
+
+    def sync_edges(self) -> bool:
+        """Сбросить кэш связей, если задание расчёта SIMILAR записало новые рёбра"""
+        version = self._read_edges_version()
+        if version is None or version == self._edges_version:
+            return False
+        self._edges_version = version
+        self.search_service.graph_expander.invalidate()
+        print("Similar edges changed, graph cache cleared")
+        return True
+
+    def sync_once(self) -> int:
+        """Применить изменения с последней метки; вернуть число изменённых и удалённых статей"""
+        self.sync_edges()
+        changes = self.search_service.neo4j_client.get_changes_since(self.watermark, settings.FILTER_PROPERTIES)
+        events = [("u", paper["paper_id"], paper["updated_at"], paper) for paper in changes["changed"]]
+        events += [("d", record["paper_id"], record["deleted_at"], record) for record in changes["deleted"]]
+
+        fresh = [event for event in events if event[:3] not in self._applied]
+        self.watermark = changes["watermark"]
+        window_start = self.watermark - int(settings.INDEX_SYNC_OVERLAP * 1000)
+        self._applied = {event[:3] for event in events if event[2] >= window_start}
+
+        changed = [event[3] for event in fresh if event[0] == "u"]
+        deleted = [event[1] for event in fresh if event[0] == "d"]
+        if not changed and not deleted:
+            return 0
+
+        self.index.apply_changes(changed, deleted)
+        self.search_service.on_corpus_changed(changed, deleted, self.watermark)
+        print(f"Index synced: {len(changed)} changed, {len(deleted)} deleted, "
+              f"delta size {self.index.delta_size()}")
+
+        if self.index.delta_size() >= settings.INDEX_COMPACT_THRESHOLD:
+            self.compact()
+        return len(changed) + len(deleted)
+
+    def compact(self):
+        """Слить дельту с базой в новый базовый сегмент"""
+        base = self.search_service.build_compacted_index(self.index.merged_rows(), self.watermark)
+        previous = self.index.base
+        self.index.replace_base(base)
+        release_index(previous)
+        print(f"Index compacted: {len(base)} papers")
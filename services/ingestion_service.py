@@ -0,0 +1,174 @@
+# services/ingestion_service.py
+import argparse
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.embeddings import get_embeddings_batch
+from utils.summarizer import generate_base_summary
+from database.neo4j_client import Neo4jClient
+from config.settings import settings
+
+PAPER_FIELDS = ("paper_id", "title", "bibtex", "year", "link")
+
+
+def iter_papers(path: str, file_format: str = None):
+    """Потоково прочитать статьи из JSONL или CSV"""
+    file_format = file_format or os.path.splitext(path)[1].lstrip(".").lower()
+
+    with open(path, encoding="utf-8", newline="") as f:
+        if file_format == "csv":
+            rows = csv.DictReader(f)
+        elif file_format in ("jsonl", "json", "ndjson"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            raise ValueError(f"Unsupported input format: {file_format}")
+
+        for row in rows:
+            paper = normalize_paper(row)
+            if paper is not None:
+                yield paper
+
+
+def normalize_paper(row: dict):
+    """Привести запись к полям :Paper; записи без paper_id или заголовка пропускаются"""
+    paper = {field: row.get(field) for field in PAPER_FIELDS}
+    if not paper["paper_id"] or not paper["title"]:
+        return None
+
+    paper["paper_id"] = str(paper["paper_id"]).strip()
+    year = paper["year"]
+    if isinstance(year, str):
+        year = year.strip()
+        paper["year"] = int(year) if year.isdigit() else (year or None)
+    return paper
+
+
+def paper_text(paper: dict) -> str:
+    """Текст статьи, по которому строится эмбеддинг"""
+    return "\n".join(part for part in (paper["title"], paper.get("bibtex")) if part)
+
+
+class IngestionService:
+    def __init__(self, neo4j_client: Neo4jClient = None):
+        self.neo4j_client = neo4j_client or Neo4jClient()
+
+    def ingest(self, path: str, file_format: str = None, resume: bool = True) -> dict:
+        """Загрузить статьи из файла в Neo4j: эмбеддинги пачками, запись через UNWIND"""
+        stats = {"read": 0, "skipped": 0, "failed": 0, "written": 0}
+
+        self.neo4j_client.ensure_schema()
+        done = self.neo4j_client.get_embedded_paper_ids() if resume else set()
+        if done:
+            print(f"Resuming ingestion: {len(done)} papers already embedded")
+
+        buffer = []
+        in_flight = deque()
+        max_in_flight = settings.INGEST_CONCURRENCY * 2
+
+        with ThreadPoolExecutor(max_workers=settings.INGEST_CONCURRENCY) as executor:
+            for batch in self._iter_batches(path, file_format, done, stats):
+                in_flight.append(executor.submit(self._embed_batch, batch))
+                # Ограничиваем число пачек в работе, чтобы не читать весь файл в память
+                while len(in_flight) >= max_in_flight:
+                    buffer = self._collect(in_flight.popleft(), buffer, stats)
+
+            while in_flight:
+                buffer = self._collect(in_flight.popleft(), buffer, stats)
+
+        self._flush(buffer, stats)
+        print(f"Ingestion finished: {stats}")
+        return stats
+
+    def _iter_batches(self, path: str, file_format: str, done: set, stats: dict):
+        batch = []
+        seen = set()
+        for paper in iter_papers(path, file_format):
+            stats["read"] += 1
+            if paper["paper_id"] in done or paper["paper_id"] in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(paper["paper_id"])
+            batch.append(paper)
+            if len(batch) >= settings.INGEST_EMBED_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: list) -> list:
+        embeddings = get_embeddings_batch([paper_text(paper) for paper in batch], use_cache=False)
+        for paper, embedding in zip(batch, embeddings):
+            paper["embedding"] = embedding
+        return batch
+
+    def _collect(self, future, buffer: list, stats: dict) -> list:
+        for paper in future.result():
+            if paper["embedding"] is None:
+                # Без эмбеддинга статья не пишется и будет взята при повторном запуске
+                stats["failed"] += 1
+                continue
+            buffer.append(paper)
+
+        if len(buffer) >= settings.INGEST_WRITE_BATCH_SIZE:
+            self._flush(buffer, stats)
+            return []
+        return buffer
+
+    def _flush(self, buffer: list, stats: dict):
+        if buffer:
+            stats["written"] += self.neo4j_client.upsert_papers(buffer)
+            print(f"Written {stats['written']} papers")
+
+    def precompute_base_summaries(self, batch_size: int = 100) -> int:
+        """Сгенерировать базовые описания для статей, у которых их ещё нет"""
+        written = 0
+        with ThreadPoolExecutor(max_workers=settings.INGEST_CONCURRENCY) as executor:
+            while True:
+                papers = self.neo4j_client.get_papers_without_base_summary(batch_size)
+                if not papers:
+                    break
+
+                summaries = list(executor.map(
+                    lambda paper: generate_base_summary(paper["title"], paper.get("bibtex"), paper.get("year")),
+                    papers
+                ))
+                rows = [
+                    {"paper_id": paper["paper_id"], "base_summary": summary}
+                    for paper, summary in zip(papers, summaries) if summary
+                ]
+                if not rows:
+                    # Вся пачка завершилась ошибкой - прекращаем, чтобы не выбирать её повторно
+                    print("Base summary generation failed for a whole batch, stopping")
+                    break
+
+                written += self.neo4j_client.set_base_summaries(rows)
+                print(f"Base summaries written: {written}")
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка статей в Neo4j с эмбеддингами")
+    parser.add_argument("path", nargs="?", help="Файл со статьями (JSONL или CSV)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Формат файла (по умолчанию - по расширению)")
+    parser.add_argument("--no-resume", action="store_true", help="Не пропускать статьи с эмбеддингами")
+    parser.add_argument("--base-summaries", action="store_true",
+                        help="Сгенерировать базовые описания для статей без них")
+    args = parser.parse_args()
+    if not args.path and not args.base_summaries:
+        parser.error("укажите файл со статьями и/или --base-summaries")
+
+    client = Neo4jClient()
+    try:
+        service = IngestionService(client)
+        if args.path:
+            service.ingest(args.path, args.format, resume=not args.no_resume)
+        if args.base_summaries:
+            service.precompute_base_summaries()
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# services/resources.py
+import atexit
+import threading
+from services.search_service import SearchService
+
+_search_service = None
+_lock = threading.Lock()
+
+
+def get_search_service() -> SearchService:
+    """Общий для процесса SearchService (создаётся при первом обращении).
+
+    Streamlit перезапускает только основной скрипт, поэтому сервис, драйвер Neo4j
+    и загруженные индексы переживают перезапуски и разделяются между сессиями.
+    """
+    global _search_service
+    if _search_service is None:
+        with _lock:
+            if _search_service is None:
+                _search_service = SearchService()
+                # Индексы загружаются в фоне: страница отрисовывается сразу, первый запрос дождётся загрузки
+                threading.Thread(target=_search_service.warm_up, name="search-warm-up", daemon=True).start()
+    return _search_service
+
+
+def shutdown():
+    """Закрыть общие ресурсы процесса"""
+    global _search_service
+    with _lock:
+        if _search_service is not None:
+            _search_service.close()
+            _search_service = None
+
+
+atexit.register(shutdown)
@@ -1,48 +1,480 @@
 # services/search_service.py
+import os
+import threading
+import time
 import numpy as np
-from utils.embeddings import get_embeddings
-from utils.summarizer import generate_summary
+from utils.embeddings import get_embeddings, get_embeddings_batch
+from utils.summarizer import (
+    get_paper_summary, analyze_papers_batch, is_fallback_summary, get_summary_executor, shutdown_summary_executor
+)
+from utils.query_cache import get_query_cache
+from utils.metrics import metrics
 from database.neo4j_client import Neo4jClient
-from models.similarity import calculate_cosine_similarity
+from models.similarity import calculate_cosine_similarity, reciprocal_rank_fusion
+from models.bm25_index import BM25Index, paper_document_text
+from services.graph_expansion import GraphExpander
+from models.vector_index import VectorIndex
+from models.embedding_store import EmbeddingStore
+from models.ann_index import IVFIndex
+from models.quantization import QuantizedIndex, CODECS
+from models.filter_index import AttributeIndex
+from models.segmented_index import SegmentedIndex
+from models.sharded_index import ShardedIndex, release_index, close_index
+from models.index_snapshot import load_snapshot, write_snapshot
+from services.index_sync import IndexSyncer
+from config.settings import settings
+
+SUMMARY_UNAVAILABLE = "Краткое описание недоступно"
 
 
 class SearchService:
     def __init__(self):
         self.neo4j_client = Neo4jClient()
+        self.vector_index = None
+        self.index_syncer = None
+        self.bm25_index = None
+        self.graph_expander = GraphExpander(self.neo4j_client)
+        self._index_lock = threading.Lock()
+
+    def get_vector_index(self):
+        """Получить векторный индекс (загружается при первом обращении)"""
+        if not settings.USE_VECTOR_INDEX:
+            return None
+
+        if self.vector_index is None:
+            with self._index_lock:
+                if self.vector_index is None:
+                    self.reload_vector_index()
+        return self.vector_index
+
+    def reload_vector_index(self, rebuild_store: bool = False):
+        """Загрузить векторный индекс: снимок с диска, иначе хранилище эмбеддингов или выгрузка из Neo4j"""
+        started = time.perf_counter()
+        sync_enabled = settings.INDEX_SYNC_INTERVAL > 0
+        snapshot = None if rebuild_store else self.load_index_snapshot()
+        try:
+            if snapshot is not None:
+                index, watermark = snapshot
+            else:
+                # Метка до выгрузки: всё, что изменится позже, подхватит синхронизация
+                watermark = self.neo4j_client.get_sync_watermark() if sync_enabled else 0
+
+                store = self.load_embedding_store(rebuild=rebuild_store)
+                if store is not None:
+                    watermark = store.watermark or 0
+                index = self.load_backend_index(store)
+            source = "snapshot" if snapshot is not None else "store"
+            print(f"Vector index loaded: {len(index)} papers ({type(index).__name__}, {source}) "
+                  f"in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"Error loading vector index: {e}")
+            return None
+
+        # Пустой индекс не сохраняем, чтобы повторить загрузку позже
+        if not len(index):
+            self.vector_index = None
+            return None
+
+        if snapshot is None:
+            self.attach_attributes(index)
+            self.save_index_snapshot(index, watermark)
+        self.invalidate_query_cache()
+        if sync_enabled:
+            index = SegmentedIndex(index, settings.FILTER_PROPERTIES)
+            self.start_index_sync(index, watermark)
+        previous, self.vector_index = self.vector_index, index
+        if previous is not None:
+            release_index(previous)
+        return self.vector_index
+
+    def load_backend_index(self, store):
+        """Индекс выбранного SEARCH_BACKEND; при его отсутствии - точный поиск"""
+        index = None
+        if settings.SEARCH_BACKEND == "ann":
+            index = self.load_ann_index()
+        elif store is not None and settings.SEARCH_BACKEND in CODECS:
+            index = self.load_quantized_index(store)
+
+        if index is None and store is not None:
+            index = VectorIndex.from_store(store)
+        if index is None:
+            index = VectorIndex.from_neo4j(self.neo4j_client)
+        return self.shard_index(index)
+
+    def shard_index(self, index):
+        """Точный индекс - в процессы-шарды по общей памяти, если задан SEARCH_SHARDS"""
+        if settings.SEARCH_SHARDS <= 1 or type(index) is not VectorIndex or not len(index):
+            return index
+        sharded = ShardedIndex.from_index(index, settings.SEARCH_SHARDS, timeout=settings.SHARD_TIMEOUT,
+                                          max_restarts=settings.SHARD_MAX_RESTARTS)
+        print(f"Vector index sharded: {sharded.n_shards} worker processes")
+        return sharded
+
+    def load_index_snapshot(self):
+        """Снимок точного индекса с фильтрами и меткой синхронизации: (индекс, метка) или None"""
+        path = settings.INDEX_SNAPSHOT_PATH
+        if not path or settings.SEARCH_BACKEND != "exact" or not os.path.exists(path):
+            return None
+
+        try:
+            index, watermark = load_snapshot(path, settings.FILTER_PROPERTIES)
+        except Exception as e:
+            print(f"Error loading index snapshot, rebuilding: {e}")
+            return None
+
+        attributes = index.attributes
+        index = self.shard_index(index)
+        index.attributes = attributes
+        return index, watermark
+
+    def save_index_snapshot(self, index, watermark: int):
+        """Сохранить снимок точного индекса, чтобы следующий запуск прочитал его одним файлом"""
+        path = settings.INDEX_SNAPSHOT_PATH
+        if not path or settings.SEARCH_BACKEND != "exact" or type(index) not in (VectorIndex, ShardedIndex):
+            return
+
+        try:
+            write_snapshot(path, index, watermark, settings.FILTER_PROPERTIES)
+            print(f"Index snapshot written: {len(index)} papers, watermark {watermark}")
+        except Exception as e:
+            print(f"Error writing index snapshot: {e}")
+
+    def warm_up(self):
+        """Загрузить индексы до первого запроса; время прогрева - в лог"""
+        started = time.perf_counter()
+        self.get_vector_index()
+        self.get_bm25_index()
+        print(f"Search service warmed up in {time.perf_counter() - started:.2f}s")
+
+    def start_index_sync(self, index, watermark: int):
+        if self.index_syncer is not None:
+            self.index_syncer.stop()
+        self.index_syncer = IndexSyncer(self, index, watermark)
+        self.index_syncer.start()
+
+    def build_compacted_index(self, rows, watermark: int):
+        """Новый базовый сегмент из актуальных векторов (вызывается из потока синхронизации)"""
+        base = self.vector_index.base if isinstance(self.vector_index, SegmentedIndex) else None
+        path = settings.EMBEDDING_STORE_PATH
+
+        if not path:
+            paper_ids, vectors = [], []
+            for paper_id, vector in rows:
+                paper_ids.append(paper_id)
+                vectors.append(vector)
+            index = VectorIndex(paper_ids, np.array(vectors, dtype=np.float32), normalized=True)
+        else:
+            store = EmbeddingStore.write(path, rows, watermark=watermark)
+            if isinstance(base, IVFIndex):
+                index = IVFIndex.from_store(store, nlist=settings.ANN_NLIST, nprobe=settings.ANN_NPROBE)
+                index.save(settings.ANN_INDEX_PATH)
+            elif isinstance(base, QuantizedIndex):
+                index = QuantizedIndex.build(store, base.codec.name, rerank_depth=settings.RERANK_DEPTH,
+                                             **base.codec.params())
+                index.save(settings.QUANTIZED_INDEX_PATH)
+            else:
+                index = VectorIndex.from_store(store)
+
+        index = self.shard_index(index)
+        self.attach_attributes(index)
+        self.save_index_snapshot(index, watermark)
+        return index
+
+    def on_corpus_changed(self, changed: list, deleted: list, watermark: int = None):
+        """Обновить зависящие от корпуса структуры после синхронизации индекса"""
+        bm25_index = self.bm25_index
+        if bm25_index is not None:
+            for paper_id in deleted:
+                bm25_index.remove_document(paper_id)
+            for paper in changed:
+                bm25_index.add_document(paper["paper_id"], paper_document_text(paper))
+            # Без сохранения удалённые статьи вернулись бы в лексический поиск после перезапуска
+            if watermark is not None:
+                bm25_index.watermark = watermark
+            self.save_bm25_index(bm25_index)
+
+        self.graph_expander.invalidate([paper["paper_id"] for paper in changed] + list(deleted))
+        self.invalidate_query_cache()
+
+    def invalidate_query_cache(self):
+        query_cache = get_query_cache()
+        if query_cache is not None:
+            query_cache.invalidate()
+
+    def attach_attributes(self, index):
+        """Построить фильтры по метаданным, выровненные по строкам индекса"""
+        try:
+            attributes = self.neo4j_client.get_paper_attributes(settings.FILTER_PROPERTIES)
+            index.attributes = AttributeIndex.build(index.paper_ids, attributes, settings.FILTER_PROPERTIES)
+        except Exception as e:
+            # Без них фильтры применяются в Cypher-поиске
+            print(f"Error building attribute filters: {e}")
+            index.attributes = None
+
+    def load_ann_index(self):
+        """Загрузить IVF-индекс с диска (None, если он не построен)"""
+        path = settings.ANN_INDEX_PATH
+        if not IVFIndex.exists(path):
+            print(f"ANN index not found at {path}, using exact search")
+            return None
 
-    def vector_search(self, query: str, top_k: int = 10):
-        """Векторный поиск по косинусной схожести"""
+        try:
+            index = IVFIndex.load(path, nprobe=settings.ANN_NPROBE)
+            print(f"ANN index loaded: {len(index)} papers, nprobe={index.nprobe}")
+            return index if len(index) else None
+        except Exception as e:
+            print(f"Error loading ANN index: {e}")
+            return None
+
+    def load_quantized_index(self, store):
+        """Загрузить сжатый индекс с переранжированием по хранилищу эмбеддингов"""
+        path = settings.QUANTIZED_INDEX_PATH
+        if not QuantizedIndex.exists(path):
+            print(f"Quantized index not found at {path}, using exact search")
+            return None
+
+        try:
+            index = QuantizedIndex.load(path, store=store, rerank_depth=settings.RERANK_DEPTH)
+            print(f"Quantized index loaded: {len(index)} papers, codec={index.codec.name}")
+            return index if len(index) else None
+        except Exception as e:
+            print(f"Error loading quantized index: {e}")
+            return None
+
+    def get_bm25_index(self):
+        """Получить лексический индекс: загрузить с диска и дополнить новыми статьями из Neo4j"""
+        if self.bm25_index is not None:
+            return self.bm25_index
+
+        with self._index_lock:
+            if self.bm25_index is None:
+                self.bm25_index = self._load_bm25_index()
+        return self.bm25_index
+
+    def _load_bm25_index(self):
+        path = settings.BM25_INDEX_PATH
+        try:
+            if path and os.path.exists(path):
+                index = BM25Index.load(path)
+            else:
+                index = BM25Index(k1=settings.BM25_K1, b=settings.BM25_B)
+
+            updated = index.sync_with_neo4j(self.neo4j_client)
+            if updated:
+                self.save_bm25_index(index)
+            print(f"BM25 index loaded: {len(index)} papers ({updated} added, updated or removed)")
+        except Exception as e:
+            print(f"Error loading BM25 index: {e}")
+            return None
+
+        return index if len(index) else None
+
+    def save_bm25_index(self, index):
+        path = settings.BM25_INDEX_PATH
+        if not path:
+            return
+        try:
+            index.save(path)
+        except Exception as e:
+            print(f"Error saving BM25 index: {e}")
+
+    def load_embedding_store(self, rebuild: bool = False):
+        """Открыть хранилище эмбеддингов на диске; построить его из Neo4j, если файла нет"""
+        path = settings.EMBEDDING_STORE_PATH
+        if not path:
+            return None
+
+        try:
+            if rebuild or not EmbeddingStore.exists(path):
+                return EmbeddingStore.build(self.neo4j_client, path)
+            return EmbeddingStore.open(path)
+        except Exception as e:
+            print(f"Error opening embedding store: {e}")
+            return None
+
+    @metrics.timed("search", mode="vector")
+    def vector_search(self, query: str, top_k: int = 10, filters: dict = None):
+        """Векторный поиск по косинусной схожести (filters - см. Neo4jClient.find_similar_papers)"""
         try:
             # Получаем эмбеддинг запроса
             query_embedding = get_embeddings(query)
 
-            # Используем Python implementation для надежности
-            results = self.neo4j_client.find_similar_papers(query_embedding, top_k)
+            # Результаты близкого по смыслу запроса, если он уже выполнялся
+            query_cache = get_query_cache()
+            cached = query_cache.get(query_embedding, top_k, filters) if query_cache else None
+            if cached is not None:
+                return self.results_from_cache(cached, query, query_embedding)
 
-            # Добавляем анализ схожести и краткое описание
-            enhanced_results = []
-            for result in results:
-                enhanced_result = self.enhance_result_with_analysis(result, query)
-                enhanced_results.append(enhanced_result)
+            # Векторный индекс в памяти; без него - поиск через Cypher
+            results = self.neo4j_client.find_similar_papers(
+                query_embedding, top_k, index=self.get_vector_index(), filters=filters
+            )
 
-            return enhanced_results
+            # Добавляем анализ схожести и краткое описание
+            self.attach_connections(results)
+            results = self.enhance_results(results, query, query_embedding)
+            # Заглушки описаний не кэшируем: иначе сбой LLM повторялся бы для близких запросов весь TTL
+            if query_cache is not None and not any(self.is_degraded(result) for result in results):
+                query_cache.put(query_embedding, top_k, filters, results)
+            return results
         except Exception as e:
             print(f"Error in vector search: {e}")
             return []
 
-    def enhance_result_with_analysis(self, result: dict, query: str) -> dict:
-        """Добавить анализ схожести и краткое описание к результату"""
+    def results_from_cache(self, cached: list, query: str, query_embedding: list) -> list:
+        """Результаты близкого запроса: ранжирование сохраняется, схожесть пересчитывается для текущего"""
+        cached = self.rescore_cached(cached, query_embedding)
+        if not settings.QUERY_CACHE_REUSE_SUMMARIES or any('summary' not in result for result in cached):
+            return self.enhance_results(cached, query, query_embedding)
+        return cached
+
+    def rescore_cached(self, cached: list, query_embedding: list) -> list:
+        vector_index = self.get_vector_index()
+        paper_ids = [result['paper_id'] for result in cached]
+        similarities = vector_index.similarity_for(query_embedding, paper_ids) if vector_index else {}
+
+        for result in cached:
+            result['similarity'] = similarities.get(result['paper_id'], result.get('similarity', 0))
+            if not settings.QUERY_CACHE_REUSE_SUMMARIES:
+                result.pop('summary', None)
+                result.pop('key_points', None)
+        return self.annotate_similarity(cached)
+
+    def annotate_similarity(self, results: list) -> list:
+        """Уровень и процент схожести без краткого описания"""
+        for result in results:
+            similarity_score = result.get('similarity', 0)
+            result['similarity_analysis'] = self.analyze_similarity_level(similarity_score)
+            result['similarity_percentage'] = f"{similarity_score * 100:.1f}%"
+        return results
+
+    @metrics.timed("batch_search")
+    def batch_search(self, queries: list, top_k: int = 10, summarize: bool = False) -> list:
+        """Пакетный поиск для офлайн-задач: список результатов для каждого запроса.
+
+        Эмбеддинги запрашиваются пачками, оценка - одним поблочным умножением матриц.
+        Краткие описания по умолчанию не генерируются.
+        """
+        if not queries:
+            return []
+
+        query_embeddings = get_embeddings_batch(queries)
+        vector_index = self.get_vector_index()
+
+        if vector_index is not None:
+            hits = vector_index.search_batch(
+                query_embeddings, top_k,
+                block_rows=settings.BATCH_SEARCH_BLOCK_ROWS,
+                query_block=settings.BATCH_SEARCH_QUERY_BLOCK
+            )
+            paper_ids = list({paper_id for query_hits in hits for paper_id, _ in query_hits})
+            papers = self.neo4j_client.get_papers_by_ids(paper_ids)
+            all_results = [
+                [dict(papers[paper_id], similarity=similarity)
+                 for paper_id, similarity in query_hits if paper_id in papers]
+                for query_hits in hits
+            ]
+        else:
+            all_results = [
+                self.neo4j_client.find_similar_papers(embedding, top_k) if embedding is not None else []
+                for embedding in query_embeddings
+            ]
+
+        if summarize:
+            return [
+                self.enhance_results(results, query, embedding)
+                for results, query, embedding in zip(all_results, queries, query_embeddings)
+            ]
+
+        for results in all_results:
+            self.annotate_similarity(results)
+        return all_results
+
+    @metrics.timed("summaries")
+    def enhance_results(self, results: list, query: str, query_embedding: list = None) -> list:
+        """Обогатить результаты, сохраняя порядок.
+
+        В режиме batch описания всех статей запрашиваются одним обращением к LLM;
+        статьи, которых нет в ответе, обрабатываются параллельно по одной,
+        и медленный результат не задерживает остальные.
+        """
+        if not results:
+            return []
+
+        analyses = {}
+        if settings.SUMMARY_MODE == "batch":
+            analyses = analyze_papers_batch(results, query, query_embedding, timeout=settings.SUMMARY_BATCH_TIMEOUT,
+                                            deadline=time.monotonic() + settings.SUMMARY_BATCH_TIMEOUT)
+
+        enhanced_results = [None] * len(results)
+        pending = []
+        for i, result in enumerate(results):
+            analysis = analyses.get(result.get('paper_id'))
+            if analysis is not None:
+                enhanced_results[i] = self.apply_analysis(dict(result), analysis)
+            else:
+                pending.append(i)
+
+        # Задачи ждут в очереди пула пачками по SUMMARY_CONCURRENCY - учитываем это в сроке каждой.
+        # Пул общий для всех запросов процесса, поэтому срок соблюдает и сама задача: обращение
+        # к LLM идёт без повторов и не дольше остатка, опоздавшая задача сразу отдаёт заглушку
+        started = time.monotonic()
+        workers = max(1, settings.SUMMARY_CONCURRENCY)
+        deadlines = [started + settings.SUMMARY_TIMEOUT * (wave // workers + 1) for wave in range(len(pending))]
+        executor = get_summary_executor()
+        futures = [
+            executor.submit(self.enhance_result_with_analysis, dict(results[i]), query, query_embedding, deadline)
+            for i, deadline in zip(pending, deadlines)
+        ]
+
+        for i, future, deadline in zip(pending, futures, deadlines):
+            try:
+                enhanced_results[i] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                future.cancel()
+                print(f"Summary for {results[i].get('paper_id')} not ready: {e!r}")
+                metrics.inc("fallbacks_total", {"kind": "summary_timeout"})
+                enhanced_results[i] = self.fallback_enhancement(results[i])
+
+        return enhanced_results
+
+    def apply_analysis(self, result: dict, analysis: dict) -> dict:
+        """Результат с описанием и ключевыми пунктами из пакетного анализа"""
+        similarity_score = result.get('similarity', 0)
+        result['similarity_analysis'] = self.analyze_similarity_level(similarity_score)
+        result['summary'] = analysis['summary']
+        result['key_points'] = analysis['key_points']
+        result['similarity_percentage'] = f"{similarity_score * 100:.1f}%"
+        return result
+
+    def is_degraded(self, result: dict) -> bool:
+        """Результат с заглушкой вместо краткого описания"""
+        summary = result.get('summary')
+        return summary == SUMMARY_UNAVAILABLE or is_fallback_summary(summary)
+
+    def fallback_enhancement(self, result: dict) -> dict:
+        """Результат без краткого описания (ошибка или превышение времени ожидания)"""
+        result = dict(result)
+        similarity_score = result.get('similarity', 0)
+        result['similarity_analysis'] = self.analyze_similarity_level(similarity_score)
+        result['summary'] = SUMMARY_UNAVAILABLE
+        result['similarity_percentage'] = f"{similarity_score * 100:.1f}%"
+        return result
+
+    def enhance_result_with_analysis(self, result: dict, query: str, query_embedding: list = None,
+                                     deadline: float = None) -> dict:
+        """Добавить анализ схожести и краткое описание к результату (deadline - по time.monotonic())"""
         try:
             # Анализ уровня схожести
             similarity_score = result.get('similarity', 0)
             similarity_analysis = self.analyze_similarity_level(similarity_score)
 
             # Генерация краткого описания
-            summary = generate_summary(
-                title=result.get('title', ''),
-                bibtex=result.get('bibtex', ''),
-                year=result.get('year', ''),
-                query=query
+            summary = get_paper_summary(
+                result, query,
+                query_embedding=query_embedding,
+                timeout=settings.SUMMARY_TIMEOUT,
+                deadline=deadline
             )
 
             # Добавляем анализ в результат
@@ -55,7 +487,7 @@ class SearchService:
         except Exception as e:
             print(f"Error enhancing result: {e}")
             result['similarity_analysis'] = "Анализ недоступен"
-            result['summary'] = "Краткое описание недоступно"
+            result['summary'] = SUMMARY_UNAVAILABLE
             result['similarity_percentage'] = f"{result.get('similarity', 0) * 100:.1f}%"
             return result
 
@@ -72,27 +504,147 @@ class SearchService:
         else:
             return "🔍 Минимальная схожесть - слабая связь с запросом"
 
-    def hybrid_search(self, query: str, top_k: int = 10):
-        """Гибридный поиск (векторный + ключевые слова)"""
-        return self.vector_search(query, top_k)
+    @metrics.timed("search", mode="hybrid")
+    def hybrid_search(self, query: str, top_k: int = 10, filters: dict = None):
+        """Гибридный поиск (векторный + ключевые слова) с объединением через reciprocal rank fusion"""
+        bm25_index = self.get_bm25_index()
+        if bm25_index is None:
+            return self.vector_search(query, top_k, filters)
+
+        try:
+            query_embedding = get_embeddings(query)
+            results = self.hybrid_retrieve(bm25_index, query, query_embedding, top_k, filters)
+            self.attach_connections(results)
+            return self.enhance_results(results, query, query_embedding)
+        except Exception as e:
+            print(f"Error in hybrid search: {e}")
+            return []
+
+    def hybrid_retrieve(self, bm25_index, query: str, query_embedding: list, top_k: int, filters: dict = None) -> list:
+        """Кандидаты векторного и лексического поиска, объединённые через RRF (без описаний)"""
+        depth = max(top_k, settings.HYBRID_CANDIDATE_DEPTH)
+        vector_results = self.neo4j_client.find_similar_papers(
+            query_embedding, depth, index=self.get_vector_index(), filters=filters
+        )
+        lexical_hits = self.lexical_search(bm25_index, query, depth, filters)
+
+        fused = self.fuse_rankings(vector_results, lexical_hits, top_k)
+        papers = {r['paper_id']: r for r in vector_results}
+        lexical_only = [paper_id for paper_id, _ in fused if paper_id not in papers]
+        if lexical_only:
+            papers.update(self.neo4j_client.get_papers_by_ids(lexical_only))
+        return self.assemble_hybrid(fused, papers, lexical_only, lexical_hits, query_embedding)
+
+    def fuse_rankings(self, vector_results: list, lexical_hits: list, top_k: int) -> list:
+        return reciprocal_rank_fusion(
+            [[r['paper_id'] for r in vector_results], [paper_id for paper_id, _ in lexical_hits]],
+            weights=[settings.HYBRID_VECTOR_WEIGHT, settings.HYBRID_LEXICAL_WEIGHT],
+            k=settings.HYBRID_RRF_K
+        )[:top_k]
+
+    def assemble_hybrid(self, fused: list, papers: dict, lexical_only: list, lexical_hits: list,
+                        query_embedding: list) -> list:
+        """Результаты в порядке RRF; схожесть статей, найденных только лексически, - по индексу"""
+        vector_index = self.get_vector_index()
+        similarities = vector_index.similarity_for(query_embedding, lexical_only) if vector_index and lexical_only else {}
+        for paper_id in lexical_only:
+            if paper_id in papers:
+                papers[paper_id]['similarity'] = similarities.get(paper_id, 0.0)
+
+        lexical_scores = dict(lexical_hits)
+        results = []
+        for paper_id, fusion_score in fused:
+            if paper_id not in papers:
+                continue
+            result = papers[paper_id]
+            result['fusion_score'] = fusion_score
+            result['lexical_score'] = lexical_scores.get(paper_id, 0.0)
+            results.append(result)
+        return results
+
+    @metrics.timed("rank")
+    def rank(self, query: str, top_k: int = 10, filters: dict = None, hybrid: bool = False):
+        """Ранжированный список без кратких описаний для постепенного вывода: (результаты, эмбеддинг запроса).
+
+        Описания затем запрашиваются по одному через stream_paper_summary;
+        результаты из кэша близких запросов возвращаются уже с описаниями.
+        """
+        try:
+            query_embedding = get_embeddings(query)
+            bm25_index = self.get_bm25_index() if hybrid else None
+
+            if bm25_index is not None:
+                results = self.hybrid_retrieve(bm25_index, query, query_embedding, top_k, filters)
+                self.attach_connections(results)
+                return self.annotate_similarity(results), query_embedding
+
+            query_cache = get_query_cache()
+            cached = query_cache.get(query_embedding, top_k, filters) if query_cache else None
+            if cached is not None:
+                return self.rescore_cached(cached, query_embedding), query_embedding
+
+            results = self.neo4j_client.find_similar_papers(
+                query_embedding, top_k, index=self.get_vector_index(), filters=filters
+            )
+            self.attach_connections(results)
+            results = self.annotate_similarity(results)
+            if query_cache is not None:
+                query_cache.put(query_embedding, top_k, filters, results)
+            return results, query_embedding
+        except Exception as e:
+            print(f"Error ranking results: {e}")
+            return [], None
+
+    @metrics.timed("lexical_search")
+    def lexical_search(self, bm25_index, query: str, depth: int, filters: dict = None) -> list:
+        """BM25-кандидаты с учётом фильтров по метаданным"""
+        if not filters:
+            return bm25_index.search(query, depth)
+
+        attributes = self.vector_index.attributes if self.vector_index is not None else None
+        if attributes is None:
+            # Проверить фильтры негде - остаются только векторные кандидаты (отфильтрованные в Cypher)
+            return []
+
+        hits = bm25_index.search(query, depth * 4)
+        return [(paper_id, score) for paper_id, score in hits if attributes.matches(paper_id, filters)][:depth]
 
     def get_paper_connections(self, paper_id: str):
         """Получить связанные статьи из графа"""
         try:
-            connections = self.neo4j_client.get_connected_papers(paper_id)
-            # Добавляем анализ для связанных статей
-            enhanced_connections = []
-            for connection in connections:
-                enhanced_conn = connection.copy()
-                enhanced_conn['connection_type'] = self.get_connection_type(
-                    connection.get('relationship_type', '')
-                )
-                enhanced_connections.append(enhanced_conn)
-            return enhanced_connections
+            connections = self.graph_expander.expand([paper_id]).get(paper_id, [])
+            return self.enhance_connections(connections)
         except Exception as e:
             print(f"Error getting connections: {e}")
             return []
 
+    @metrics.timed("graph_expansion")
+    def attach_connections(self, results: list):
+        """Добавить к результатам связанные статьи (одна выборка из графа на все результаты)"""
+        if not settings.GRAPH_EXPANSION_ENABLED or not results:
+            return
+
+        try:
+            expanded = self.graph_expander.expand([r['paper_id'] for r in results if r.get('paper_id')])
+        except Exception as e:
+            print(f"Error expanding graph: {e}")
+            return
+
+        for result in results:
+            if result.get('paper_id') in expanded:
+                result['connections'] = self.enhance_connections(expanded[result['paper_id']])
+
+    def enhance_connections(self, connections: list) -> list:
+        """Добавить описание типа связи"""
+        enhanced_connections = []
+        for connection in connections:
+            enhanced_conn = connection.copy()
+            enhanced_conn['connection_type'] = self.get_connection_type(
+                connection.get('relationship_type', '')
+            )
+            enhanced_connections.append(enhanced_conn)
+        return enhanced_connections
+
     def get_connection_type(self, relationship: str) -> str:
         """Определить тип связи между статьями"""
         relationship_map = {
@@ -103,6 +655,17 @@ class SearchService:
         }
         return relationship_map.get(relationship, '🔗 Связана')
 
+    def close(self):
+        """Освободить ресурсы: синхронизацию индекса, процессы шардов, пул потоков описаний и соединения с Neo4j"""
+        if self.index_syncer is not None:
+            self.index_syncer.stop()
+            self.index_syncer = None
+        if self.vector_index is not None:
+            close_index(self.vector_index)
+            self.vector_index = None
+        shutdown_summary_executor()
+        self.neo4j_client.close()
+
     def get_database_stats(self):
         """Получить статистику базы данных"""
         try:
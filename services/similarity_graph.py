@@ -0,0 +1,199 @@
+# services/similarity_graph.py
+import argparse
+import tempfile
+import time
+import numpy as np
+from database.neo4j_client import Neo4jClient
+from models.embedding_store import EmbeddingStore
+from models.similarity import normalize_rows, blocked_top_k
+from config.settings import settings
+
+
+class SimilarityCorpus:
+    """Актуальные векторы корпуса: хранилище эмбеддингов и изменения из Neo4j после его метки.
+
+    Матрица хранилища не копируется (np.memmap); если часть её строк устарела,
+    в память копируются только актуальные строки. Изменённые статьи - второй сегмент.
+    """
+
+    def __init__(self, store, changes: dict):
+        changed = {paper["paper_id"]: paper["embedding"] for paper in changes["changed"] if any(paper["embedding"])}
+        removed = set(changed) | {record["paper_id"] for record in changes["deleted"]}
+
+        base_ids, base_matrix = store.paper_ids, store.matrix
+        stale = [row for row, paper_id in enumerate(base_ids) if paper_id in removed]
+        if stale:
+            keep = np.setdiff1d(np.arange(len(base_ids)), stale)
+            base_ids = [base_ids[row] for row in keep]
+            base_matrix = np.asarray(base_matrix[keep])
+
+        self.segments = [(base_ids, base_matrix)]
+        if changed:
+            changed_ids = list(changed)
+            self.segments.append((changed_ids, normalize_rows([changed[paper_id] for paper_id in changed_ids])))
+        self.paper_ids = [paper_id for ids, _ in self.segments for paper_id in ids]
+        self.rows = {paper_id: row for row, paper_id in enumerate(self.paper_ids)}
+        self.dim = base_matrix.shape[1]
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def vectors(self, rows) -> np.ndarray:
+        """Нормализованные векторы строк корпуса (в порядке rows)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        result = np.empty((len(rows), self.dim), dtype=np.float32)
+        offset = 0
+        for ids, matrix in self.segments:
+            mask = (rows >= offset) & (rows < offset + len(ids))
+            if mask.any():
+                result[mask] = matrix[rows[mask] - offset]
+            offset += len(ids)
+        return result
+
+    def knn(self, queries: np.ndarray, k: int) -> tuple:
+        """Top-k строк корпуса для каждого запроса поблочным умножением матриц: (индексы, оценки)"""
+        parts = []
+        offset = 0
+        for ids, matrix in self.segments:
+            if len(ids):
+                indices, scores = blocked_top_k(queries, matrix, k, settings.BATCH_SEARCH_BLOCK_ROWS,
+                                                settings.BATCH_SEARCH_QUERY_BLOCK)
+                parts.append((indices + offset, scores))
+            offset += len(ids)
+
+        indices = np.concatenate([indices for indices, _ in parts], axis=1)
+        scores = np.concatenate([scores for _, scores in parts], axis=1)
+        order = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def max_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Для каждой строки корпуса - наибольшая схожесть с запросами"""
+        result = np.full(len(self), -np.inf, dtype=np.float32)
+        block_rows, query_block = settings.BATCH_SEARCH_BLOCK_ROWS, settings.BATCH_SEARCH_QUERY_BLOCK
+        offset = 0
+        for ids, matrix in self.segments:
+            for start in range(0, len(ids), block_rows):
+                block = np.asarray(matrix[start:start + block_rows])
+                best = result[offset + start:offset + start + block.shape[0]]
+                for q_start in range(0, queries.shape[0], query_block):
+                    np.maximum(best, (block @ queries[q_start:q_start + query_block].T).max(axis=1), out=best)
+            offset += len(ids)
+        return result
+
+
+class SimilarityGraphBuilder:
+    """Офлайн-расчёт k ближайших соседей статей и запись их рёбрами SIMILAR со схожестью в score.
+
+    Полный расчёт обходит весь корпус. Инкрементальный - только новые и изменённые
+    статьи, а также уже рассчитанные статьи, в соседи которых новая статья проходит:
+    её схожесть выше схожести их k-го соседа (similar_min_score).
+    """
+
+    def __init__(self, neo4j_client: Neo4jClient = None, k: int = None, min_score: float = None,
+                 use_ann: bool = False):
+        self.neo4j_client = neo4j_client or Neo4jClient()
+        self.k = settings.SIMILAR_K if k is None else k
+        self.min_score = settings.SIMILAR_MIN_SCORE if min_score is None else min_score
+        self.use_ann = use_ann
+
+    def load_corpus(self, rebuild_store: bool = False) -> SimilarityCorpus:
+        path = settings.EMBEDDING_STORE_PATH or tempfile.mkdtemp(prefix="similarity-store-")
+        if rebuild_store or not EmbeddingStore.exists(path):
+            store = EmbeddingStore.build(self.neo4j_client, path)
+        else:
+            store = EmbeddingStore.open(path)
+        return SimilarityCorpus(store, self.neo4j_client.get_changes_since(store.watermark or 0))
+
+    def run(self, full: bool = False, rebuild_store: bool = False) -> dict:
+        started = time.perf_counter()
+        # Метка до чтения корпуса: статьи, изменённые позже, останутся в очереди на пересчёт
+        computed_at = self.neo4j_client.get_sync_watermark()
+        corpus = self.load_corpus(rebuild_store)
+        stats = {"papers": len(corpus), "pending": 0, "affected": 0, "written": 0}
+
+        if full:
+            targets = list(corpus.paper_ids)
+            stats["pending"] = len(targets)
+        else:
+            pending = [paper_id for paper_id in self.neo4j_client.get_similarity_pending_ids()
+                       if paper_id in corpus.rows]
+            affected = self.affected_papers(corpus, pending)
+            targets = pending + affected
+            stats.update(pending=len(pending), affected=len(affected))
+
+        ann_index = self.build_ann_index(corpus) if self.use_ann and targets else None
+        batch_size = max(1, settings.SIMILAR_WRITE_BATCH)
+        for start in range(0, len(targets), batch_size):
+            batch = targets[start:start + batch_size]
+            rows = self.neighbor_rows(corpus, batch, ann_index)
+            stats["written"] += self.neo4j_client.write_similar_edges(rows, computed_at)
+            print(f"SIMILAR edges: {stats['written']}/{len(targets)} papers")
+
+        stats["seconds"] = round(time.perf_counter() - started, 1)
+        return stats
+
+    def affected_papers(self, corpus: SimilarityCorpus, pending: list) -> list:
+        """Рассчитанные ранее статьи, у которых новая статья вытесняет k-го соседа"""
+        if not pending:
+            return []
+        thresholds = self.neo4j_client.get_similarity_thresholds()
+        pending_set = set(pending)
+        candidates = [paper_id for paper_id in thresholds if paper_id in corpus.rows and paper_id not in pending_set]
+        if not candidates:
+            return []
+
+        best = corpus.max_scores(corpus.vectors([corpus.rows[paper_id] for paper_id in pending]))
+        return [paper_id for paper_id in candidates if best[corpus.rows[paper_id]] > thresholds[paper_id]]
+
+    def build_ann_index(self, corpus: SimilarityCorpus):
+        """IVF-индекс по корпусу для больших N (соседи приближённые)"""
+        from models.ann_index import IVFIndex
+
+        matrix = corpus.segments[0][1] if len(corpus.segments) == 1 else corpus.vectors(np.arange(len(corpus)))
+        return IVFIndex.build(corpus.paper_ids, matrix, nlist=settings.ANN_NLIST, nprobe=settings.ANN_NPROBE)
+
+    def neighbor_rows(self, corpus: SimilarityCorpus, paper_ids: list, ann_index=None) -> list:
+        """Строки для Neo4jClient.write_similar_edges: соседи без самой статьи и ниже min_score"""
+        queries = corpus.vectors([corpus.rows[paper_id] for paper_id in paper_ids])
+        if ann_index is not None:
+            hits = [ann_index.search(query, self.k + 1) for query in queries]
+        else:
+            indices, scores = corpus.knn(queries, self.k + 1)
+            hits = [
+                [(corpus.paper_ids[index], float(score)) for index, score in zip(row_indices, row_scores)]
+                for row_indices, row_scores in zip(indices, scores)
+            ]
+
+        rows = []
+        for paper_id, paper_hits in zip(paper_ids, hits):
+            neighbors = [
+                {"paper_id": neighbor_id, "score": round(score, 6)}
+                for neighbor_id, score in paper_hits
+                if neighbor_id != paper_id and score >= self.min_score
+            ][:self.k]
+            # Новая статья войдёт в соседи, только если схожа сильнее текущего k-го соседа
+            min_score = neighbors[-1]["score"] if len(neighbors) == self.k else self.min_score
+            rows.append({"paper_id": paper_id, "min_score": min_score, "neighbors": neighbors})
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Расчёт k ближайших соседей статей и запись рёбер SIMILAR в Neo4j")
+    parser.add_argument("--full", action="store_true", help="Пересчитать соседей всех статей")
+    parser.add_argument("--k", type=int, default=settings.SIMILAR_K)
+    parser.add_argument("--min-score", type=float, default=settings.SIMILAR_MIN_SCORE)
+    parser.add_argument("--ann", action="store_true", help="Соседи через IVF-индекс (приближённо, для больших корпусов)")
+    parser.add_argument("--rebuild-store", action="store_true", help="Заново выгрузить эмбеддинги из Neo4j")
+    args = parser.parse_args()
+
+    builder = SimilarityGraphBuilder(k=args.k, min_score=args.min_score, use_ann=args.ann)
+    try:
+        builder.neo4j_client.ensure_schema()
+        stats = builder.run(full=args.full, rebuild_store=args.rebuild_store)
+    finally:
+        builder.neo4j_client.close()
+    print(f"Similarity graph done: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# utils/async_http_client.py
+import asyncio
+import time
+import aiohttp
+from utils.http_client import RETRY_STATUSES, parse_retry_after, clip_timeout, MistralClient
+from utils.metrics import metrics
+from config.settings import settings
+
+
+class AsyncTokenBucket:
+    """Token bucket для цикла событий: ожидание токена не блокирует другие задачи"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    async def acquire(self, deadline: float = None):
+        """Дождаться свободного токена; TimeoutError, если токен не освободится до deadline (time.monotonic())"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                raise TimeoutError("Mistral request deadline has passed in the rate limiter")
+            await asyncio.sleep(wait)
+
+
+class AsyncMistralClient:
+    """Асинхронный клиент Mistral API: общий пул соединений aiohttp, таймауты, повторы и лимит частоты"""
+
+    def __init__(self):
+        self.base_url = settings.MISTRAL_API_BASE.rstrip("/")
+        self.rate_limiter = AsyncTokenBucket(settings.MISTRAL_RATE_LIMIT, settings.MISTRAL_RATE_BURST)
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессия привязана к циклу событий, поэтому создаётся при первом запросе
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.MISTRAL_POOL_SIZE)
+            )
+        return self._session
+
+    async def post_json(self, path: str, payload: dict, api_key: str, timeout: float = None,
+                        deadline: float = None) -> dict:
+        """POST-запрос с повторами на 429/5xx и сетевых ошибках (как MistralClient.post, в том числе deadline)"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        connect_timeout, read_timeout = settings.MISTRAL_CONNECT_TIMEOUT, timeout or settings.MISTRAL_READ_TIMEOUT
+        max_retries = settings.MISTRAL_MAX_RETRIES if deadline is None else 0
+
+        endpoint = path.strip("/")
+
+        attempt = 0
+        with metrics.timed("mistral_request", endpoint=endpoint):
+            while True:
+                await self.rate_limiter.acquire(deadline)
+                # Оставшееся время считается после ожидания в ограничителе
+                sock_connect, sock_read = clip_timeout((connect_timeout, read_timeout), deadline)
+                request_timeout = aiohttp.ClientTimeout(
+                    total=None if deadline is None else deadline - time.monotonic(),
+                    sock_connect=sock_connect,
+                    sock_read=sock_read
+                )
+                retry_after = None
+                try:
+                    async with self._get_session().post(url, headers=headers, json=payload,
+                                                        timeout=request_timeout) as response:
+                        if response.status not in RETRY_STATUSES or attempt >= max_retries:
+                            response.raise_for_status()
+                            return await response.json(content_type=None)
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        reason = str(response.status)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt >= max_retries:
+                        raise
+                    reason = "network"
+
+                metrics.inc("mistral_retries_total", {"endpoint": endpoint, "reason": reason})
+                await asyncio.sleep(MistralClient._backoff(attempt, retry_after))
+                attempt += 1
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,127 @@
+# utils/async_llm.py
+import asyncio
+from utils.async_http_client import AsyncMistralClient
+from utils.single_flight import SingleFlight
+from utils.metrics import metrics
+from utils.embedding_cache import get_embedding_cache, make_cache_key
+from utils.embeddings import EMBEDDING_MODEL, EMBEDDING_DIM
+from utils.summary_cache import make_query_key, QueryKey
+from utils.summarizer import (
+    completion_payload, build_summary_prompt, fallback_summary, NO_API_KEY_SUMMARY, ready_summary, cache_summary,
+    build_batch_analysis_prompt, batch_analysis_max_tokens, batch_chunks, cached_analyses, store_analyses
+)
+from config.settings import settings
+
+
+class AsyncLLM:
+    """Эмбеддинги и описания для асинхронного сервера.
+
+    Одинаковые запросы, выполняющиеся одновременно (один и тот же текст или
+    одна и та же пара статья-запрос), объединяются в один вызов API.
+    Кэши те же, что у синхронного пути; обращения к SQLite идут в пуле потоков.
+    """
+
+    def __init__(self, client: AsyncMistralClient = None):
+        self.client = client or AsyncMistralClient()
+        self.flights = SingleFlight()
+
+    async def embed(self, text: str) -> list:
+        """Эмбеддинг текста (нулевой вектор при ошибке, как get_embeddings)"""
+        api_key = settings.MISTRAL_API_KEY
+        if not api_key:
+            raise ValueError("MISTRAL_API_KEY not found in environment variables")
+
+        cache = get_embedding_cache()
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, text, EMBEDDING_MODEL)
+            if cached is not None:
+                return cached
+
+        try:
+            return await self.flights.do(
+                ("embed", make_cache_key(text, EMBEDDING_MODEL)),
+                lambda: self._request_embedding(text, api_key)
+            )
+        except Exception as e:
+            print(f"Error getting embeddings: {e}")
+            metrics.inc("fallbacks_total", {"kind": "zero_embedding"})
+            return [0.0] * EMBEDDING_DIM
+
+    async def _request_embedding(self, text: str, api_key: str) -> list:
+        result = await self.client.post_json("/embeddings", {"model": EMBEDDING_MODEL, "input": [text]}, api_key)
+        embedding = result["data"][0]["embedding"]
+
+        cache = get_embedding_cache()
+        if cache is not None:
+            await asyncio.to_thread(cache.put, text, EMBEDDING_MODEL, embedding)
+        return embedding
+
+    async def paper_summary(self, paper: dict, query: str, query_embedding: list = None,
+                            timeout: float = None, deadline: float = None) -> str:
+        """Краткое описание статьи: кэш -> базовое описание -> LLM (как get_paper_summary)"""
+        query_key = make_query_key(query, query_embedding)
+        summary = await asyncio.to_thread(ready_summary, paper, query_key)
+        if summary is not None:
+            return summary
+
+        api_key = settings.MISTRAL_API_KEY
+        if not api_key:
+            return NO_API_KEY_SUMMARY
+
+        try:
+            return await self.flights.do(
+                ("summary", paper.get('paper_id'), query_key),
+                lambda: self._request_summary(paper, query, query_key, api_key, timeout, deadline)
+            )
+        except Exception as e:
+            print(f"Error generating summary: {e}")
+            metrics.inc("fallbacks_total", {"kind": "summary"})
+            return fallback_summary(paper.get('title', ''), paper.get('year', ''))
+
+    async def _request_summary(self, paper: dict, query: str, query_key: QueryKey, api_key: str, timeout: float,
+                               deadline: float = None):
+        prompt = build_summary_prompt(paper.get('title', ''), paper.get('bibtex', ''), paper.get('year', ''), query)
+        result = await self.client.post_json("/chat/completions", completion_payload(prompt), api_key, timeout,
+                                             deadline=deadline)
+        summary = result["choices"][0]["message"]["content"].strip()
+        await asyncio.to_thread(cache_summary, paper, query_key, summary)
+        return summary
+
+    async def analyze_papers(self, papers: list, query: str, query_embedding: list = None,
+                             timeout: float = None, deadline: float = None) -> dict:
+        """Описания и ключевые пункты всех статей одним запросом (как analyze_papers_batch)"""
+        query_key = make_query_key(query, query_embedding)
+        analyses, pending = await asyncio.to_thread(cached_analyses, papers, query_key)
+        api_key = settings.MISTRAL_API_KEY
+        if not pending or not api_key:
+            return analyses
+
+        for chunk_analyses in await asyncio.gather(*(
+            self._analyze_chunk(chunk, query, query_key, api_key, timeout, deadline) for chunk in batch_chunks(pending)
+        )):
+            analyses.update(chunk_analyses)
+        return analyses
+
+    async def _analyze_chunk(self, pending: list, query: str, query_key: QueryKey, api_key: str, timeout: float,
+                             deadline: float = None) -> dict:
+        key = ("analysis", query_key, tuple(paper['paper_id'] for paper in pending))
+        try:
+            return await self.flights.do(
+                key, lambda: self._request_analysis(pending, query, query_key, api_key, timeout, deadline)
+            )
+        except Exception as e:
+            print(f"Error in batch analysis: {e}")
+            return {}
+
+    async def _request_analysis(self, pending: list, query: str, query_key: QueryKey, api_key: str, timeout: float,
+                                deadline: float = None):
+        payload = completion_payload(
+            build_batch_analysis_prompt(pending, query),
+            max_tokens=batch_analysis_max_tokens(len(pending)), json_mode=True
+        )
+        result = await self.client.post_json("/chat/completions", payload, api_key, timeout, deadline=deadline)
+        content = result["choices"][0]["message"]["content"].strip()
+        return await asyncio.to_thread(store_analyses, pending, content, query_key)
+
+    async def close(self):
+        await self.client.close()
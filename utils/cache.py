@@ -0,0 +1,65 @@
+# utils/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Ограниченный по размеру потокобезопасный LRU-кэш в памяти (ttl - срок жизни записи в секундах)"""
+
+    def __init__(self, max_items: int = 1024, ttl: float = None):
+        self.max_items = max_items
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._items = OrderedDict()
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            if self.ttl is not None and self._expires[key] <= time.monotonic():
+                del self._items[key]
+                del self._expires[key]
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            while len(self._items) > self.max_items:
+                evicted, _ = self._items.popitem(last=False)
+                self._expires.pop(evicted, None)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self._expires.pop(key, None)
+            return self._items.pop(key, default)
+
+    def remove_if(self, predicate) -> int:
+        """Удалить записи, для которых predicate(key, value) истинно; вернуть их число"""
+        with self._lock:
+            keys = [key for key, value in self._items.items() if predicate(key, value)]
+            for key in keys:
+                del self._items[key]
+                self._expires.pop(key, None)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._expires.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
@@ -0,0 +1,182 @@
+# utils/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from utils.cache import LRUCache
+from utils.metrics import metrics
+from config.settings import settings
+
+
+def normalize_text(text: str) -> str:
+    """Нормализовать текст запроса для ключа кэша (Unicode NFC, схлопнутые пробелы)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_cache_key(text: str, model: str) -> str:
+    """Ключ кэша: хэш модели и нормализованного текста"""
+    payload = f"{model}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class DiskEmbeddingCache:
+    """Постоянный кэш эмбеддингов в SQLite: векторы float32 в BLOB, вытеснение по размеру"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def put(self, key: str, embedding: list):
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time())
+            )
+            self._total_bytes += len(blob) - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Удалить давно не использованные векторы, пока кэш превышает лимит"""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._total_bytes -= size
+
+
+class EmbeddingCache:
+    """Двухуровневый кэш эмбеддингов: LRU в памяти процесса и SQLite на диске"""
+
+    def __init__(self, max_items: int, disk_path: str = None, max_disk_bytes: int = 0):
+        self.memory = LRUCache(max_items)
+        self.disk = None
+        if disk_path and max_disk_bytes > 0:
+            try:
+                self.disk = DiskEmbeddingCache(disk_path, max_disk_bytes)
+            except Exception as e:
+                print(f"Error opening embedding disk cache: {e}")
+
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def get(self, text: str, model: str):
+        key = make_cache_key(text, model)
+
+        embedding = self.memory.get(key)
+        if embedding is not None:
+            self._count("hits_memory")
+            return embedding
+
+        if self.disk is not None:
+            try:
+                embedding = self.disk.get(key)
+            except Exception as e:
+                print(f"Error reading embedding disk cache: {e}")
+                embedding = None
+            if embedding is not None:
+                self.memory.put(key, embedding)
+                self._count("hits_disk")
+                return embedding
+
+        self._count("misses")
+        return None
+
+    def put(self, text: str, model: str, embedding: list):
+        key = make_cache_key(text, model)
+        self.memory.put(key, embedding)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, embedding)
+            except Exception as e:
+                print(f"Error writing embedding disk cache: {e}")
+
+    def _count(self, counter: str):
+        metrics.inc("cache_requests_total", {"cache": "embedding", "result": counter})
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов"""
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            total = hits + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_items": len(self.memory)
+            }
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Общий для процесса кэш эмбеддингов (None, если кэширование отключено)"""
+    global _embedding_cache
+    if settings.EMBEDDING_CACHE_SIZE <= 0 and not settings.EMBEDDING_CACHE_PATH:
+        return None
+
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                max_items=settings.EMBEDDING_CACHE_SIZE,
+                disk_path=settings.EMBEDDING_CACHE_PATH,
+                max_disk_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+            )
+        return _embedding_cache
@@ -1,44 +1,122 @@
 # utils/embeddings.py
-import requests
-import os
-from dotenv import load_dotenv
+from utils.embedding_cache import get_embedding_cache
+from utils.http_client import get_mistral_client
+from utils.metrics import metrics
+from config.settings import settings
 
-load_dotenv()
+
+EMBEDDING_MODEL = "mistral-embed"
+EMBEDDING_DIM = 1024
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов текста (без токенизатора)"""
+    return len(text) // 3 + 1
+
+
+def _request_embeddings(inputs: list, api_key: str) -> list:
+    """Запросить эмбеддинги для списка текстов одним вызовом API"""
+    data = {
+        "model": EMBEDDING_MODEL,
+        "input": inputs
+    }
+
+    embeddings_data = get_mistral_client().post_json("/embeddings", data, api_key)["data"]
+    return [item["embedding"] for item in sorted(embeddings_data, key=lambda item: item["index"])]
 
 
 def get_embeddings(text: str) -> list:
     """Получить эмбеддинги текста через Mistral API"""
-    api_key = os.getenv("MISTRAL_API_KEY")
+    api_key = settings.MISTRAL_API_KEY
 
     if not api_key:
         raise ValueError("MISTRAL_API_KEY not found in environment variables")
 
-    url = "https://api.mistral.ai/v1/embeddings"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": "mistral-embed",
-        "input": text
-    }
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(text, EMBEDDING_MODEL)
+        if cached is not None:
+            return cached
 
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-
-        embeddings_data = response.json()
-        return embeddings_data["data"][0]["embedding"]
+        with metrics.timed("embed"):
+            embedding = _request_embeddings([text], api_key)[0]
 
     except Exception as e:
         print(f"Error getting embeddings: {e}")
-        # Возвращаем нулевой вектор в случае ошибки
-        return [0.0] * 1024
+        metrics.inc("fallbacks_total", {"kind": "zero_embedding"})
+        # Возвращаем нулевой вектор в случае ошибки (в кэш не попадает)
+        return [0.0] * EMBEDDING_DIM
+
+    if cache is not None:
+        cache.put(text, EMBEDDING_MODEL, embedding)
+    return embedding
+
+
+def chunk_by_token_budget(texts: list, max_tokens: int, max_items: int) -> list:
+    """Разбить индексы текстов на пачки, укладывающиеся в бюджет токенов и число элементов"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def get_embeddings_batch(texts: list, use_cache: bool = True) -> list:
+    """Получить эмбеддинги списка текстов пачками по бюджету токенов.
+
+    Для текстов, пачка которых завершилась ошибкой, возвращается None (не нулевой вектор),
+    чтобы вызывающий код мог их пропустить или повторить.
+    """
+    api_key = settings.MISTRAL_API_KEY
+
+    if not api_key:
+        raise ValueError("MISTRAL_API_KEY not found in environment variables")
+
+    results = [None] * len(texts)
+    cache = get_embedding_cache() if use_cache else None
+
+    pending = []
+    for i, text in enumerate(texts):
+        cached = cache.get(text, EMBEDDING_MODEL) if cache is not None else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    pending_texts = [texts[i] for i in pending]
+    for chunk in chunk_by_token_budget(pending_texts,
+                                       settings.EMBEDDING_BATCH_MAX_TOKENS,
+                                       settings.EMBEDDING_BATCH_MAX_ITEMS):
+        chunk_texts = [pending_texts[j] for j in chunk]
+        try:
+            with metrics.timed("embed_batch"):
+                embeddings = _request_embeddings(chunk_texts, api_key)
+        except Exception as e:
+            print(f"Error getting batch embeddings ({len(chunk_texts)} texts): {e}")
+            metrics.inc("fallbacks_total", {"kind": "failed_embedding"}, value=len(chunk_texts))
+            continue
+
+        for j, embedding in zip(chunk, embeddings):
+            results[pending[j]] = embedding
+            if cache is not None:
+                cache.put(pending_texts[j], EMBEDDING_MODEL, embedding)
+
+    return results
 
 
 def analyze_semantic_similarity(query: str, paper_data: dict) -> dict:
     """Анализировать семантическую схожесть с помощью LLM"""
-    api_key = os.getenv("MISTRAL_API_KEY")
+    api_key = settings.MISTRAL_API_KEY
 
     if not api_key:
         return {"analysis": "Анализ недоступен", "key_points": []}
@@ -62,11 +140,6 @@ def analyze_semantic_similarity(query: str, paper_data: dict) -> dict:
     """
 
     try:
-        url = "https://api.mistral.ai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
         data = {
             "model": "mistral-small-latest",
             "messages": [
@@ -83,10 +156,7 @@ def analyze_semantic_similarity(query: str, paper_data: dict) -> dict:
             "temperature": 0.4
         }
 
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-
-        result = response.json()
+        result = get_mistral_client().post_json("/chat/completions", data, api_key)
         analysis = result["choices"][0]["message"]["content"].strip()
 
         return {
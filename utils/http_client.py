@@ -0,0 +1,163 @@
+# utils/http_client.py
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from utils.metrics import metrics
+from config.settings import settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Клиентский ограничитель частоты запросов (token bucket)"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float = None):
+        """Дождаться свободного токена; TimeoutError, если токен не освободится до deadline (time.monotonic())"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    raise TimeoutError("Mistral request deadline has passed in the rate limiter")
+            time.sleep(wait)
+
+
+def parse_retry_after(value: str):
+    """Значение заголовка Retry-After в секундах (число или HTTP-дата)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def clip_timeout(request_timeout: tuple, deadline: float = None) -> tuple:
+    """Таймауты запроса, не превышающие время до deadline (считается после ожидания в ограничителе)"""
+    if deadline is None:
+        return request_timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Mistral request deadline has passed")
+    return tuple(min(value, remaining) for value in request_timeout)
+
+
+class MistralClient:
+    """Общий HTTP-клиент Mistral API: пул соединений, таймауты, повторы с backoff и лимит частоты"""
+
+    def __init__(self):
+        self.base_url = settings.MISTRAL_API_BASE.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.MISTRAL_POOL_SIZE,
+            pool_maxsize=settings.MISTRAL_POOL_SIZE
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.rate_limiter = TokenBucket(settings.MISTRAL_RATE_LIMIT, settings.MISTRAL_RATE_BURST)
+
+    def post(self, path: str, payload: dict, api_key: str, timeout: float = None,
+             stream: bool = False, deadline: float = None) -> requests.Response:
+        """POST-запрос с повторами на 429/5xx и сетевых ошибках.
+
+        deadline (по time.monotonic()) - крайний срок интерактивного запроса: таймауты
+        не превышают оставшееся время, повторов нет (ответ после срока уже никто не ждёт).
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        request_timeout = (settings.MISTRAL_CONNECT_TIMEOUT, timeout or settings.MISTRAL_READ_TIMEOUT)
+        max_retries = settings.MISTRAL_MAX_RETRIES if deadline is None else 0
+        endpoint = path.strip("/")
+
+        attempt = 0
+        with metrics.timed("mistral_request", endpoint=endpoint):
+            while True:
+                self.rate_limiter.acquire(deadline)
+                retry_after = None
+                try:
+                    response = self.session.post(url, headers=headers, json=payload,
+                                                 timeout=clip_timeout(request_timeout, deadline), stream=stream)
+                    if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                        response.raise_for_status()
+                        return response
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    reason = str(response.status_code)
+                    response.close()
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt >= max_retries:
+                        raise
+                    reason = "network"
+
+                metrics.inc("mistral_retries_total", {"endpoint": endpoint, "reason": reason})
+                time.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+
+    def post_json(self, path: str, payload: dict, api_key: str, timeout: float = None,
+                  deadline: float = None) -> dict:
+        return self.post(path, payload, api_key, timeout=timeout, deadline=deadline).json()
+
+    def post_stream(self, path: str, payload: dict, api_key: str, timeout: float = None):
+        """POST в потоковом режиме (server-sent events): генератор JSON-событий до [DONE].
+
+        Повторы возможны только до начала ответа; timeout - ожидание каждой порции.
+        """
+        response = self.post(path, dict(payload, stream=True), api_key, timeout=timeout, stream=True)
+        try:
+            for line in response.iter_lines():
+                # Кодировку задаём сами: для text/event-stream requests по умолчанию берёт latin-1
+                line = line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                yield json.loads(data)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: float = None) -> float:
+        """Экспоненциальная задержка с полным джиттером; Retry-After от сервера имеет приоритет"""
+        if retry_after is not None:
+            return min(retry_after, settings.MISTRAL_BACKOFF_MAX)
+        ceiling = min(settings.MISTRAL_BACKOFF_MAX, settings.MISTRAL_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_mistral_client() -> MistralClient:
+    """Общий для процесса клиент Mistral API"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MistralClient()
+        return _client
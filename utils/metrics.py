@@ -0,0 +1,153 @@
+# utils/metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм задержки в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DESCRIPTIONS = {
+    "stage_duration_seconds": "Duration of pipeline stages and external calls",
+    "stage_errors_total": "Stages that ended with an exception",
+    "cache_requests_total": "Cache lookups by cache and result",
+    "fallbacks_total": "Degraded results: zero-vector embeddings, placeholder summaries, Cypher scans",
+    "mistral_retries_total": "Retried Mistral API requests by reason",
+    "shard_restarts_total": "Search shard worker processes restarted after a crash",
+}
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (накопительные счётчики в формате Prometheus)"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по корзинам (верхняя граница корзины, в которую он попадает)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Счётчики и гистограммы задержек процесса с выводом в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, labels: dict = None, value: float = 1.0):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timed(self, stage: str, **labels):
+        """Замер этапа: длительность в stage_duration_seconds, исключения - в stage_errors_total"""
+        labels = dict(labels, stage=stage)
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("stage_errors_total", labels)
+            raise
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - started, labels)
+
+    def summary(self) -> dict:
+        """Сводка по этапам: {stage: {"count", "p50", "p95", "p99", "errors"}}"""
+        with self._lock:
+            stages = {}
+            for key, histogram in self._histograms.get("stage_duration_seconds", {}).items():
+                labels = dict(key)
+                name = labels.pop("stage")
+                if labels:
+                    name += "[" + ",".join(f"{k}={v}" for k, v in labels.items()) + "]"
+                errors = self._counters.get("stage_errors_total", {}).get(key, 0)
+                stages[name] = {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                    "errors": int(errors)
+                }
+            return stages
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {
+                name: {_format_labels(key): value for key, value in series.items()}
+                for name, series in self._counters.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Все метрики в текстовом формате экспозиции Prometheus"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in DESCRIPTIONS:
+                    lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in DESCRIPTIONS:
+                    lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,144 @@
+# utils/query_cache.py
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from models.similarity import normalize_vector
+from utils.metrics import metrics
+from config.settings import settings
+
+
+def make_scope_key(filters: dict = None) -> str:
+    """Ключ фильтров: результаты переиспользуются только при тех же фильтрах"""
+    return json.dumps(filters or {}, sort_keys=True, default=str)
+
+
+class QueryResultCache:
+    """Кэш результатов поиска по эмбеддингу запроса.
+
+    Запрос, эмбеддинг которого ближе порога к закэшированному, получает его
+    ранжированные результаты. Эмбеддинги хранятся в слотах общей матрицы,
+    поэтому поиск соседа - одно умножение матрицы на вектор.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        # slot -> (scope, top_k, created_at, results); порядок - от давно использованных к недавним
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._hit_similarity = 0.0
+
+    def get(self, query_embedding, top_k: int, filters: dict = None):
+        """Результаты ближайшего закэшированного запроса или None"""
+        if query_embedding is None or not any(query_embedding):
+            return None
+        query = normalize_vector(query_embedding)
+        scope = make_scope_key(filters)
+        now = time.time()
+
+        with self._lock:
+            if self._matrix is None or not self._entries or len(query) != self._matrix.shape[1]:
+                self.misses += 1
+                metrics.inc("cache_requests_total", {"cache": "query", "result": "miss"})
+                return None
+
+            scores = self._matrix @ query
+            scores[~self._valid] = -np.inf
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                slot = int(slot)
+                entry_scope, entry_top_k, created_at, results = self._entries[slot]
+                if now - created_at >= self.ttl:
+                    self._remove(slot)
+                    continue
+                if entry_scope != scope or entry_top_k < top_k:
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                metrics.inc("cache_requests_total", {"cache": "query", "result": "hit"})
+                self._hit_similarity += float(scores[slot])
+                return copy.deepcopy(results[:top_k])
+
+            self.misses += 1
+            metrics.inc("cache_requests_total", {"cache": "query", "result": "miss"})
+            return None
+
+    def put(self, query_embedding, top_k: int, filters: dict, results: list):
+        if self.max_entries <= 0 or query_embedding is None or not any(query_embedding) or not results:
+            return
+        query = normalize_vector(query_embedding)
+        entry = (make_scope_key(filters), top_k, time.time(), copy.deepcopy(results))
+
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != len(query):
+                self._matrix = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+                self._valid[:] = False
+                self._entries.clear()
+
+            free = np.flatnonzero(~self._valid)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+
+            self._matrix[slot] = query
+            self._valid[slot] = True
+            self._entries[slot] = entry
+            self._entries.move_to_end(slot)
+
+    def _remove(self, slot: int):
+        self._entries.pop(slot, None)
+        self._valid[slot] = False
+
+    def invalidate(self):
+        """Сбросить кэш (корпус изменился)"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._valid[:] = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "mean_hit_similarity": self._hit_similarity / self.hits if self.hits else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "threshold": self.threshold
+            }
+
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache():
+    """Общий для процесса кэш результатов поиска (None, если отключён)"""
+    global _query_cache
+    if settings.QUERY_CACHE_SIZE <= 0:
+        return None
+
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = QueryResultCache(
+                settings.QUERY_CACHE_SIZE,
+                ttl=settings.QUERY_CACHE_TTL,
+                threshold=settings.QUERY_CACHE_THRESHOLD
+            )
+        return _query_cache
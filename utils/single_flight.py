@@ -0,0 +1,29 @@
+# utils/single_flight.py
+import asyncio
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов: пока запрос с ключом выполняется,
+    остальные вызовы с тем же ключом ждут его результата, а не повторяют его"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, factory):
+        """Результат factory() для ключа; factory - функция без аргументов, возвращающая корутину"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            # shield: отмена одного ожидающего не отменяет общий запрос
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(factory())
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "inflight": len(self._inflight)}
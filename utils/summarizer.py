@@ -1,66 +1,408 @@
 # utils/summarizer.py
-import requests
-import os
-from dotenv import load_dotenv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from utils.http_client import get_mistral_client
+from utils.metrics import metrics
+from utils.summary_cache import get_summary_cache, make_query_key, QueryKey
+from config.settings import settings
 
-load_dotenv()
 
+_summary_executor = None
+_summary_executor_lock = threading.Lock()
 
-def generate_summary(title: str, bibtex: str, year: str, query: str) -> str:
-    """Сгенерировать краткое описание статьи с помощью Mistral AI"""
-    api_key = os.getenv("MISTRAL_API_KEY")
 
-    if not api_key:
-        return "❌ API ключ не настроен"
+def get_summary_executor() -> ThreadPoolExecutor:
+    """Общий для процесса пул запросов описаний (SUMMARY_CONCURRENCY потоков)"""
+    global _summary_executor
+    with _summary_executor_lock:
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.SUMMARY_CONCURRENCY),
+                thread_name_prefix="summary"
+            )
+        return _summary_executor
+
+
+def shutdown_summary_executor():
+    global _summary_executor
+    with _summary_executor_lock:
+        if _summary_executor is not None:
+            _summary_executor.shutdown(wait=False, cancel_futures=True)
+            _summary_executor = None
+
+
+SUMMARY_SYSTEM_PROMPT = "Ты помощник для анализа научных статей. Ты создаешь краткие и информативные описания."
+
+
+def completion_payload(prompt: str, max_tokens: int = 300, json_mode: bool = False) -> dict:
+    data = {
+        "model": "mistral-small-latest",
+        "messages": [
+            {
+                "role": "system",
+                "content": SUMMARY_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.3
+    }
+    if json_mode:
+        data["response_format"] = {"type": "json_object"}
+    return data
+
+
+def _request_completion(prompt: str, api_key: str, timeout: float = None,
+                        max_tokens: int = 300, json_mode: bool = False, deadline: float = None) -> str:
+    """Запросить краткое описание у Mistral AI (исключение при ошибке); deadline - см. MistralClient.post"""
+    data = completion_payload(prompt, max_tokens, json_mode)
+    result = get_mistral_client().post_json("/chat/completions", data, api_key, timeout=timeout, deadline=deadline)
+    return result["choices"][0]["message"]["content"].strip()
+
+
+def _stream_completion(prompt: str, api_key: str, timeout: float = None):
+    """Краткое описание от Mistral AI по частям по мере генерации (исключение при ошибке)"""
+    events = get_mistral_client().post_stream("/chat/completions", completion_payload(prompt), api_key, timeout)
+    for event in events:
+        choices = event.get("choices") or []
+        content = choices[0].get("delta", {}).get("content") if choices else None
+        if content:
+            yield content
 
-    # Формируем промпт для генерации описания
-    prompt = f"""
+
+def build_summary_prompt(title: str, bibtex: str, year: str, query: str = None) -> str:
+    """Промпт краткого описания; без query - базовое описание статьи, не зависящее от запроса"""
+    query_block = f"\n    Запрос пользователя: {query}\n" if query else ""
+    aims = ["Объясняет, о чем эта статья"]
+    if query:
+        aims.append("Показывает, как она связана с запросом пользователя")
+    aims.append("Выделяет ключевые аспекты")
+    aims_block = "\n".join(f"    {number}. {aim}" for number, aim in enumerate(aims, 1))
+    return f"""
     Сгенерируй краткое описание научной статьи на основе следующей информации:
 
     Заголовок: {title}
     Год: {year}
     Библиографическая ссылка: {bibtex}
-
-    Запрос пользователя: {query}
-
+{query_block}
     Создай краткое описание (2-3 предложения), которое:
-    1. Объясняет, о чем эта статья
-    2. Показывает, как она связана с запросом пользователя
-    3. Выделяет ключевые аспекты
+{aims_block}
 
     Ответ должен быть на русском языке, информативным и лаконичным.
     """
 
+
+FALLBACK_SUMMARY_NOTE = "Связь с запросом требует дополнительного анализа."
+NO_API_KEY_SUMMARY = "❌ API ключ не настроен"
+
+
+def fallback_summary(title: str, year: str) -> str:
+    return f"📄 Статья: {title} ({year}). {FALLBACK_SUMMARY_NOTE}"
+
+
+def is_fallback_summary(summary) -> bool:
+    """Заглушка вместо описания (ошибка LLM, нет ключа API) - такие описания не кэшируются"""
+    return not summary or summary.endswith(FALLBACK_SUMMARY_NOTE) or summary == NO_API_KEY_SUMMARY
+
+
+def generate_summary(title: str, bibtex: str, year: str, query: str, timeout: float = None) -> str:
+    """Сгенерировать краткое описание статьи с помощью Mistral AI"""
+    api_key = settings.MISTRAL_API_KEY
+
+    if not api_key:
+        return NO_API_KEY_SUMMARY
+
     try:
-        url = "https://api.mistral.ai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": "mistral-small-latest",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Ты помощник для анализа научных статей. Ты создаешь краткие и информативные описания."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 300,
-            "temperature": 0.3
-        }
+        return _request_completion(build_summary_prompt(title, bibtex, year, query), api_key, timeout)
+    except Exception as e:
+        print(f"Error generating summary: {e}")
+        metrics.inc("fallbacks_total", {"kind": "summary"})
+        return fallback_summary(title, year)
+
+
+def generate_base_summary(title: str, bibtex: str, year: str, timeout: float = None):
+    """Сгенерировать базовое (не зависящее от запроса) описание статьи; None при ошибке"""
+    api_key = settings.MISTRAL_API_KEY
 
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
+    if not api_key:
+        raise ValueError("MISTRAL_API_KEY not found in environment variables")
 
-        result = response.json()
-        summary = result["choices"][0]["message"]["content"].strip()
+    try:
+        return _request_completion(build_summary_prompt(title, bibtex, year), api_key, timeout)
+    except Exception as e:
+        print(f"Error generating base summary: {e}")
+        return None
 
+
+def get_paper_summary(paper: dict, query: str, query_embedding: list = None, timeout: float = None,
+                      deadline: float = None) -> str:
+    """Краткое описание статьи: кэш -> базовое описание из графа -> запрос к LLM (не позже deadline)"""
+    api_key = settings.MISTRAL_API_KEY
+    title = paper.get('title', '')
+    year = paper.get('year', '')
+
+    query_key = make_query_key(query, query_embedding)
+    summary = ready_summary(paper, query_key)
+    if summary is not None:
         return summary
 
+    if not api_key:
+        return NO_API_KEY_SUMMARY
+
+    try:
+        summary = _request_completion(
+            build_summary_prompt(title, paper.get('bibtex', ''), year, query), api_key, timeout, deadline=deadline
+        )
     except Exception as e:
         print(f"Error generating summary: {e}")
-        return f"📄 Статья: {title} ({year}). Связь с запросом требует дополнительного анализа."
\ No newline at end of file
+        metrics.inc("fallbacks_total", {"kind": "summary"})
+        return fallback_summary(title, year)
+
+    cache_summary(paper, query_key, summary)
+    return summary
+
+
+def ready_summary(paper: dict, query_key: QueryKey):
+    """Описание без обращения к LLM: из кэша или базовое из графа (None, если его нет)"""
+    cache = get_summary_cache()
+    paper_id = paper.get('paper_id')
+    if cache is not None and paper_id:
+        cached = cache.get(paper_id, query_key)
+        if cached is not None:
+            return cached
+
+    if settings.SUMMARY_PREFER_BASE_SUMMARY and paper.get('base_summary'):
+        return paper['base_summary']
+    return None
+
+
+def cache_summary(paper: dict, query_key: QueryKey, summary: str):
+    cache = get_summary_cache()
+    if cache is not None and paper.get('paper_id') and summary:
+        cache.put(paper['paper_id'], query_key, summary)
+
+
+def stream_paper_summary(paper: dict, query: str, query_embedding: list = None, timeout: float = None):
+    """То же, что get_paper_summary, но описание от LLM отдаётся частями по мере генерации"""
+    api_key = settings.MISTRAL_API_KEY
+    title = paper.get('title', '')
+    year = paper.get('year', '')
+
+    query_key = make_query_key(query, query_embedding)
+    summary = ready_summary(paper, query_key)
+    if summary is not None:
+        yield summary
+        return
+
+    if not api_key:
+        yield NO_API_KEY_SUMMARY
+        return
+
+    parts = []
+    started = time.perf_counter()
+    try:
+        for part in _stream_completion(build_summary_prompt(title, paper.get('bibtex', ''), year, query),
+                                       api_key, timeout):
+            if not parts:
+                metrics.observe("stage_duration_seconds", time.perf_counter() - started,
+                                {"stage": "summary_first_token"})
+            parts.append(part)
+            yield part
+    except Exception as e:
+        print(f"Error streaming summary: {e}")
+        # Оборванное описание не кэшируем; если ничего не пришло - показываем заглушку
+        if not parts:
+            metrics.inc("fallbacks_total", {"kind": "summary"})
+            yield fallback_summary(title, year)
+        return
+
+    cache_summary(paper, query_key, "".join(parts).strip())
+
+
+def build_batch_analysis_prompt(papers: list, query: str) -> str:
+    """Один запрос на все статьи: статьи нумеруются, ответ - JSON с теми же номерами"""
+    records = "\n".join(
+        f"[{number}] Заголовок: {paper.get('title', '')}; Год: {paper.get('year', '')}; "
+        f"Библиографическая ссылка: {paper.get('bibtex', '')}"
+        + (f"; Описание: {paper['base_summary']}" if paper.get('base_summary') else "")
+        for number, paper in enumerate(papers, 1)
+    )
+    return f"""
+    Запрос пользователя: {query}
+
+    Научные статьи:
+    {records}
+
+    Для каждой статьи создай краткое описание (2-3 предложения), которое объясняет, о чем статья
+    и как она связана с запросом, и выдели 2-4 ключевых пункта связи с запросом.
+
+    Верни только JSON вида:
+    {{"papers": [{{"id": 1, "summary": "...", "key_points": ["...", "..."]}}]}}
+    с одним элементом на каждую статью. Текст - на русском языке.
+    """
+
+
+def parse_batch_analysis(content: str, count: int) -> dict:
+    """Разобрать ответ пакетного анализа: {номер статьи (с 0): {"summary", "key_points"}}.
+
+    Некорректные элементы пропускаются - для них вызывающий код делает отдельный запрос.
+    """
+    data = None
+    # Модель могла обернуть JSON в текст - пробуем самый внешний массив или объект
+    for start, end in ((0, len(content)), (content.find("["), content.rfind("]") + 1),
+                       (content.find("{"), content.rfind("}") + 1)):
+        if 0 <= start < end:
+            try:
+                data = json.loads(content[start:end])
+                break
+            except ValueError:
+                continue
+
+    items = data.get("papers") if isinstance(data, dict) else data
+    if data is None:
+        items = salvage_batch_items(content)
+    if not isinstance(items, list):
+        return {}
+
+    analyses = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            position = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        summary = item.get("summary")
+        if not 0 <= position < count or position in analyses or not isinstance(summary, str) or not summary.strip():
+            continue
+        key_points = item.get("key_points")
+        if not isinstance(key_points, list):
+            key_points = []
+        analyses[position] = {
+            "summary": summary.strip(),
+            "key_points": [point.strip() for point in key_points if isinstance(point, str) and point.strip()][:5]
+        }
+    return analyses
+
+
+def salvage_batch_items(content: str) -> list:
+    """Полные элементы массива из ответа, обрезанного по max_tokens (недописанный хвост отбрасывается)"""
+    start = content.find("[")
+    if start < 0:
+        return []
+
+    decoder = json.JSONDecoder()
+    items = []
+    position = start + 1
+    while True:
+        while position < len(content) and content[position] in " \t\r\n,":
+            position += 1
+        try:
+            item, position = decoder.raw_decode(content, position)
+        except ValueError:
+            return items
+        items.append(item)
+
+
+def analyze_papers_batch(papers: list, query: str, query_embedding: list = None, timeout: float = None,
+                         deadline: float = None) -> dict:
+    """Описания и ключевые пункты для всех статей одним запросом к LLM: {paper_id: {"summary", "key_points"}}.
+
+    Статьи из кэша в запрос не попадают; статьи, которых нет в ответе, в результат не входят.
+    """
+    api_key = settings.MISTRAL_API_KEY
+    query_key = make_query_key(query, query_embedding)
+    analyses, pending = cached_analyses(papers, query_key)
+    if not pending or not api_key:
+        return analyses
+
+    chunks = batch_chunks(pending)
+    if len(chunks) == 1:
+        analyses.update(request_batch_analysis(chunks[0], query, query_key, api_key, timeout, deadline))
+        return analyses
+
+    # Пакеты идут через общий пул описаний: число одновременных обращений к LLM ограничено для всего процесса
+    executor = get_summary_executor()
+    futures = [
+        executor.submit(request_batch_analysis, chunk, query, query_key, api_key, timeout, deadline)
+        for chunk in chunks
+    ]
+    for future in futures:
+        try:
+            analyses.update(future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            # Статьи опоздавшего пакета запросят по одной
+            future.cancel()
+            print("Batch analysis chunk not ready before the deadline")
+    return analyses
+
+
+def request_batch_analysis(pending: list, query: str, query_key: QueryKey, api_key: str, timeout: float = None,
+                           deadline: float = None) -> dict:
+    """Один пакетный запрос к LLM; при ошибке - пустой результат (статьи запросят по одной)"""
+    try:
+        content = _request_completion(
+            build_batch_analysis_prompt(pending, query), api_key, timeout,
+            max_tokens=batch_analysis_max_tokens(len(pending)), json_mode=True, deadline=deadline
+        )
+    except Exception as e:
+        print(f"Error in batch analysis: {e}")
+        return {}
+    return store_analyses(pending, content, query_key)
+
+
+def batch_chunks(papers: list) -> list:
+    """Пакеты по SUMMARY_BATCH_SIZE статей: короткий ответ реже обрезается по max_tokens"""
+    size = max(1, settings.SUMMARY_BATCH_SIZE)
+    return [papers[start:start + size] for start in range(0, len(papers), size)]
+
+
+def batch_analysis_max_tokens(count: int) -> int:
+    # Русский текст заметно дороже английского в токенах: 2-3 предложения и 2-4 пункта в JSON
+    return min(settings.SUMMARY_BATCH_MAX_TOKENS, 200 + settings.SUMMARY_BATCH_TOKENS_PER_PAPER * count)
+
+
+def cached_analyses(papers: list, query_key: QueryKey):
+    """Анализы статей без обращения к LLM (как ready_summary: кэш или базовое описание)
+    и список статей, которые нужно запросить у LLM"""
+    cache = get_summary_cache()
+    points_key = query_key.with_kind("points")
+
+    analyses = {}
+    pending = []
+    for paper in papers:
+        paper_id = paper.get('paper_id')
+        if not paper_id:
+            continue
+        summary = ready_summary(paper, query_key)
+        if summary is not None:
+            key_points = cache.get(paper_id, points_key) if cache is not None else None
+            analyses[paper_id] = {"summary": summary, "key_points": json.loads(key_points) if key_points else []}
+            continue
+        pending.append(paper)
+    return analyses, pending
+
+
+def store_analyses(pending: list, content: str, query_key: QueryKey) -> dict:
+    """Разобрать ответ пакетного анализа для статей pending и сохранить результаты в кэш"""
+    cache = get_summary_cache()
+    points_key = query_key.with_kind("points")
+
+    parsed = parse_batch_analysis(content, len(pending))
+    if len(parsed) < len(pending):
+        print(f"Batch analysis returned {len(parsed)} of {len(pending)} papers")
+        metrics.inc("fallbacks_total", {"kind": "batch_analysis_missing"}, value=len(pending) - len(parsed))
+
+    analyses = {}
+    for position, analysis in parsed.items():
+        paper_id = pending[position]['paper_id']
+        analyses[paper_id] = analysis
+        if cache is not None:
+            cache.put(paper_id, query_key, analysis["summary"])
+            cache.put(paper_id, points_key, json.dumps(analysis["key_points"], ensure_ascii=False))
+    return analyses
@@ -0,0 +1,217 @@
+# utils/summary_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from utils.cache import LRUCache
+from utils.metrics import metrics
+from utils.embedding_cache import normalize_text
+from models.similarity import lsh_bucket, normalize_vector
+from config.settings import settings
+
+
+class QueryKey(namedtuple("QueryKey", ["text", "bucket", "vector", "kind"], defaults=(None, None, "summary"))):
+    """Ключ запроса в кэше описаний: хэш нормализованного текста, LSH-корзина и эмбеддинг (float16).
+
+    Точное совпадение - по тексту; близкий запрос находится среди записей своей и соседних
+    (отличающихся одним битом) корзин и принимается, только если косинус эмбеддингов
+    не ниже SUMMARY_CACHE_QUERY_THRESHOLD.
+    """
+    __slots__ = ()
+
+    def with_kind(self, kind: str) -> "QueryKey":
+        return self._replace(kind=kind)
+
+    @property
+    def storage_key(self) -> str:
+        return f"{self.kind}:{self.text}"
+
+
+def make_query_key(query: str, query_embedding: list = None) -> QueryKey:
+    """Ключ запроса; без эмбеддинга близкие запросы не ищутся, совпадение только по тексту"""
+    text = hashlib.sha256(normalize_text(query).lower().encode("utf-8")).hexdigest()[:32]
+    if query_embedding is None or not any(query_embedding):
+        return QueryKey(text)
+    vector = normalize_vector(query_embedding)
+    bucket = int(lsh_bucket(vector, settings.SUMMARY_CACHE_LSH_BITS), 16)
+    return QueryKey(text, bucket, vector.astype(np.float16).tobytes())
+
+
+def neighbor_buckets(bucket: int, bits: int) -> list:
+    """Корзина и все корзины на расстоянии одного бита: перефразировка могла пересечь одну гиперплоскость"""
+    return [bucket] + [bucket ^ (1 << bit) for bit in range(bits)]
+
+
+class SummaryCache:
+    """Постоянный кэш кратких описаний по (paper_id, запрос) с TTL и LRU-вытеснением"""
+
+    def __init__(self, path: str, ttl: float, max_entries: int, memory_items: int = 1024, threshold: float = 0.95):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.memory = LRUCache(memory_items)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(summaries)")}
+        if columns and "query_vector" not in columns:
+            # Записи старого формата - по одной LSH-корзине без проверки: их нельзя проверить, сбрасываем
+            self._conn.execute("DROP TABLE summaries")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                paper_id TEXT NOT NULL,
+                query_key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                bucket INTEGER,
+                query_vector BLOB,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (paper_id, query_key)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS summaries_last_access ON summaries(last_access)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS summaries_bucket ON summaries(paper_id, kind, bucket)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def get(self, paper_id: str, query_key: QueryKey):
+        key = (paper_id, query_key.storage_key)
+        now = time.time()
+
+        entry = self.memory.get(key)
+        if entry is not None and now - entry[1] < self.ttl:
+            self._record(hit=True)
+            return entry[0]
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, created_at, query_key FROM summaries WHERE paper_id = ? AND query_key = ?", key
+            ).fetchone()
+            if (row is None or now - row[1] >= self.ttl) and query_key.vector is not None:
+                row = self._nearest(paper_id, query_key, now)
+            if row is not None and now - row[1] < self.ttl:
+                self._conn.execute(
+                    "UPDATE summaries SET last_access = ? WHERE paper_id = ? AND query_key = ?",
+                    (now, paper_id, row[2])
+                )
+                self._conn.commit()
+
+        if row is None or now - row[1] >= self.ttl:
+            self.memory.pop(key)
+            self._record(hit=False)
+            return None
+
+        self.memory.put(key, (row[0], row[1]))
+        self._record(hit=True)
+        return row[0]
+
+    def _nearest(self, paper_id: str, query_key: QueryKey, now: float):
+        """Описание для самого близкого запроса из соседних корзин, если косинус не ниже порога"""
+        buckets = neighbor_buckets(query_key.bucket, settings.SUMMARY_CACHE_LSH_BITS)
+        rows = self._conn.execute(
+            f"SELECT summary, created_at, query_key, query_vector FROM summaries "
+            f"WHERE paper_id = ? AND kind = ? AND bucket IN ({', '.join('?' * len(buckets))}) AND created_at > ?",
+            (paper_id, query_key.kind, *buckets, now - self.ttl)
+        ).fetchall()
+        query = np.frombuffer(query_key.vector, dtype=np.float16).astype(np.float32)
+        best, best_score = None, self.threshold
+        for row in rows:
+            vector = np.frombuffer(row[3], dtype=np.float16)
+            if vector.shape != query.shape:
+                continue
+            score = float(vector.astype(np.float32) @ query)
+            if score >= best_score:
+                best, best_score = row[:3], score
+        return best
+
+    def put(self, paper_id: str, query_key: QueryKey, summary: str):
+        now = time.time()
+        storage_key = query_key.storage_key
+        self.memory.put((paper_id, storage_key), (summary, now))
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM summaries WHERE paper_id = ? AND query_key = ?", (paper_id, storage_key)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries "
+                "(paper_id, query_key, kind, bucket, query_vector, summary, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (paper_id, storage_key, query_key.kind, query_key.bucket, query_key.vector, summary, now, now)
+            )
+            if not exists:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Удалить устаревшие записи, затем наименее используемые сверх лимита"""
+        self._conn.execute("DELETE FROM summaries WHERE created_at <= ?", (now - self.ttl,))
+        self._count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess > 0:
+            self._conn.execute("""
+                DELETE FROM summaries WHERE rowid IN (
+                    SELECT rowid FROM summaries ORDER BY last_access LIMIT ?
+                )
+            """, (excess,))
+            self._count -= excess
+
+    def _record(self, hit: bool):
+        metrics.inc("cache_requests_total", {"cache": "summary", "result": "hit" if hit else "miss"})
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": self._count
+            }
+
+
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """Общий для процесса кэш описаний (None, если отключён)"""
+    global _summary_cache
+    if not settings.SUMMARY_CACHE_PATH:
+        return None
+
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            try:
+                _summary_cache = SummaryCache(
+                    settings.SUMMARY_CACHE_PATH,
+                    ttl=settings.SUMMARY_CACHE_TTL,
+                    max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+                    memory_items=settings.SUMMARY_CACHE_MEMORY_SIZE,
+                    threshold=settings.SUMMARY_CACHE_QUERY_THRESHOLD
+                )
+            except Exception as e:
+                print(f"Error opening summary cache: {e}")
+                return None
+        return _summary_cache